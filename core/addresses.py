@@ -0,0 +1,143 @@
+import hashlib
+import re
+import unicodedata
+
+from django.db import IntegrityError, transaction
+
+from .models import Address, Contractor, Contact
+
+KEY_FIELDS = ("zipcode", "country", "region", "city", "street")
+OWNERS = (Contractor, Contact)
+
+SPACES_RE = re.compile(r"\s+", re.UNICODE)
+DIGITS_RE = re.compile(r"\D+")
+
+
+def normalize_zipcode(value):
+    """
+    Digits of a postal code as an int, None when there are none.
+    """
+    if value in (None, ""):
+        return None
+    digits = DIGITS_RE.sub("", str(value))
+    return int(digits) if digits else None
+
+
+def normalize(value):
+    if value in (None, ""):
+        return ""
+    value = unicodedata.normalize("NFKC", str(value)).casefold().replace("ё", "е")
+    return SPACES_RE.sub(" ", value).strip(" ,.;")
+
+
+def canonical(values):
+    """
+    Canonical form of the address in the ``values`` mapping: case and
+    whitespace folded, the postal code reduced to its digits.
+    """
+    zipcode = normalize_zipcode(values.get("zipcode"))
+    parts = ["" if zipcode is None else str(zipcode)]
+    parts += [normalize(values.get(name)) for name in KEY_FIELDS[1:]]
+    return "\x1f".join(parts)
+
+
+def address_key(values):
+    return hashlib.sha1(canonical(values).encode("utf-8")).hexdigest()
+
+
+def instance_values(address):
+    return dict((name, getattr(address, name)) for name in KEY_FIELDS)
+
+
+def merge(target, duplicates):
+    """
+    Repoints every contractor and contact link from the ``duplicates`` pks
+    to the ``target`` address pk and deletes the duplicates.
+    """
+    duplicates = [pk for pk in duplicates if pk != target]
+    if not duplicates:
+        return
+    with transaction.atomic():
+        for model in OWNERS:
+            field = model._meta.get_field("addresses")
+            through = field.remote_field.through._default_manager
+            owner = field.m2m_field_name() + "_id"
+            address = field.m2m_reverse_field_name() + "_id"
+            for duplicate in duplicates:
+                through.filter(**{address: duplicate}).exclude(
+                    **{owner + "__in": through.filter(**{address: target}).values(owner)}
+                ).update(**{address: target})
+                through.filter(**{address: duplicate}).delete()
+            model._default_manager.filter(primary_address_id__in=duplicates).update(primary_address_id=target)
+        Address.objects.filter(pk__in=duplicates).delete()
+
+
+def resolve(address):
+    """
+    Lookup-or-create for saves: stamps ``address`` with its key and, when
+    an equal address is already stored, turns the save into an update of
+    that row, merging ``address`` into it if it was stored separately.
+    Returns True in that case.
+    """
+    address.key = address_key(instance_values(address))
+    existing = Address.objects.filter(key=address.key).exclude(pk=address.pk).values(
+        "pk", "created_by_id", "created_at"
+    ).first()
+    if existing is None:
+        return False
+    if address.pk is not None:
+        merge(existing["pk"], [address.pk])
+    address.pk = existing["pk"]
+    address.created_by_id = existing["created_by_id"]
+    address.created_at = existing["created_at"]
+    return True
+
+
+def store(address, save, *args, **kwargs):
+    """
+    Saves ``address`` with the model ``save``, as an update of the equal
+    address stored already if there is one. An equal address inserted
+    concurrently fails the insert on the unique key; it is looked up
+    again then.
+    """
+    if resolve(address):
+        kwargs["force_insert"] = False
+        save(*args, **kwargs)
+        return
+    try:
+        with transaction.atomic():
+            save(*args, **kwargs)
+        return
+    except IntegrityError:
+        if not resolve(address):
+            raise
+    kwargs["force_insert"] = False
+    save(*args, **kwargs)
+
+
+def dedupe(batch_size=1000, report=None):
+    """
+    Recomputes the key of every address in primary-key batches, merging
+    rows whose key is already taken into the row holding it.
+    """
+    merged = 0
+    last_pk = 0
+    while True:
+        batch = list(Address.objects.filter(pk__gt=last_pk).order_by("pk").values("pk", "key", *KEY_FIELDS)[:batch_size])
+        if not batch:
+            break
+        with transaction.atomic():
+            for values in batch:
+                key = address_key(values)
+                if key == values["key"]:
+                    continue
+                holder = Address.objects.filter(key=key).values_list("pk", flat=True).first()
+                if holder is None:
+                    Address.objects.filter(pk=values["pk"]).update(key=key)
+                else:
+                    merge(holder, [values["pk"]])
+                    merged += 1
+        last_pk = batch[-1]["pk"]
+        if report:
+            report("{} addresses checked, {} merged".format(last_pk, merged))
+    return merged
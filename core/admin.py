@@ -1,8 +1,31 @@
-from django.contrib import admin
+import os
+from datetime import timedelta
+
+from django.conf.urls import url
+from django.contrib import admin, messages
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList, ORDER_VAR
+from django.contrib.auth.models import User
+from django.core.exceptions import FieldDoesNotExist, PermissionDenied
+from django.core.paginator import InvalidPage, Paginator
 from .models import Contractor, EmailToContractor, Address, Contact, PreliminaryContact, MarketingCampaign, Deal,\
-    Circulation, PhoneCall, Meeting, Task, Note, Document, Project
+    Circulation, PhoneCall, Meeting, Task, Note, Document, Project, DealSummary, UploadSession, DocumentRevision,\
+    ChangeLogEntry,\
+    STAGE, CURRENCY
+from django.core.urlresolvers import reverse
+from django.db.models import Sum
 from django.forms import ModelForm
+from django.http import FileResponse, Http404, HttpResponseNotModified, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.utils.formats import localize
+from django.utils.html import format_html, format_html_join
 from django.utils.translation import ugettext_lazy as _
+from . import search, facets, uploads, downloads, revisions, previews, intervals, timeline, keyset, counts, audit, bulk, replicas
+from .export import export_csv, export_jsonl, export_response
+from .storage import attachment_storage, digest_of
 
 PROTOFIELDS = ("created_by", "created_at", "updated_by", "updated_at")
 
@@ -24,17 +47,724 @@ RESPONSIBLE_FIELDSET = (
     }
 )
 
+def related_list_view(name, description):
+    def view(self, obj):
+        return ", ".join(map(str, getattr(obj, name).all()))
+    view.short_description = description
+    return view
+
+
+AFTER_VAR = "after"
+BEFORE_VAR = "before"
+EXACT_VAR = "exact"
+
+
+class CountedPaginator(Paginator):
+    """
+    Paginator over a number of rows known beforehand.
+    """
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super(CountedPaginator, self).__init__(object_list, per_page, **kwargs)
+        self._count = count
+
+
+class PrototypeChangeList(ChangeList):
+    keyset = False
+    next_url = previous_url = first_url = None
+    result_count_exact = True
+    exact_count_url = None
+
+    def get_queryset(self, request):
+        qs = super(PrototypeChangeList, self).get_queryset(request)
+        list_prefetch_related = self.model_admin.get_list_prefetch_related(request)
+        if list_prefetch_related:
+            qs = qs.prefetch_related(*list_prefetch_related)
+        return qs
+
+    def get_keyset_ordering(self, request):
+        """
+        The keyset_ordering of the model admin when it applies: the user
+        did not sort by a column, search, ask for all rows or edit the list.
+        """
+        ordering = self.model_admin.get_keyset_ordering(request)
+        if not ordering or ORDER_VAR in self.params or self.query or self.show_all or self.list_editable:
+            return None
+        return ordering
+
+    def get_ordering(self, request, queryset):
+        ordering = self.get_keyset_ordering(request)
+        if ordering:
+            return list(ordering)
+        return super(PrototypeChangeList, self).get_ordering(request, queryset)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super(PrototypeChangeList, self).get_filters_params(params)
+        for name in (AFTER_VAR, BEFORE_VAR, EXACT_VAR):
+            lookup_params.pop(name, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        """
+        Drops the cursor from links to other filters or orderings, which
+        would start past rows of the list they lead to.
+        """
+        remove = list(remove or [])
+        remove.extend(name for name in (AFTER_VAR, BEFORE_VAR) if name not in (new_params or {}))
+        return super(PrototypeChangeList, self).get_query_string(new_params, remove)
+
+    def get_results(self, request):
+        ordering = self.get_keyset_ordering(request)
+        if ordering is not None:
+            self.page_num = 0
+        if self.model_admin.estimated_counts:
+            self.get_counted_results(request)
+        else:
+            super(PrototypeChangeList, self).get_results(request)
+        if ordering is not None:
+            self.get_keyset_results(request, ordering)
+
+    def get_counted_results(self, request):
+        """
+        ChangeList.get_results without COUNT(*) queries on every view: the
+        total comes from the count kept by signals, filtered counts are
+        estimated unless the exact one is asked for, see core.counts.
+        """
+        full_result_count = counts.total(self.model)
+        if not (self.get_filters_params() or self.query):
+            result_count = full_result_count
+        elif EXACT_VAR in self.params:
+            result_count = counts.exact(self.queryset)
+        else:
+            result_count, self.result_count_exact = counts.estimate(self.queryset, full_result_count)
+            if not self.result_count_exact and not self.show_all:
+                result_count = self.fit_estimate(result_count)
+            if not self.result_count_exact:
+                self.exact_count_url = self.get_query_string({EXACT_VAR: 1})
+        paginator = CountedPaginator(self.queryset, self.list_per_page, result_count)
+        can_show_all = result_count <= self.list_max_show_all
+        multi_page = result_count > self.list_per_page
+        if (self.show_all and can_show_all) or not multi_page:
+            result_list = self.queryset._clone()
+        else:
+            try:
+                result_list = paginator.page(self.page_num + 1).object_list
+            except InvalidPage:
+                raise IncorrectLookupParameters
+        self.result_count = result_count
+        self.show_full_result_count = self.model_admin.show_full_result_count
+        self.show_admin_actions = not self.show_full_result_count or bool(full_result_count)
+        self.full_result_count = full_result_count if self.show_full_result_count else None
+        self.result_list = result_list
+        self.can_show_all = can_show_all
+        self.multi_page = multi_page
+        self.paginator = paginator
+
+    def fit_estimate(self, estimate):
+        """
+        Reconciles an ``estimate`` of the rows with the rows found at the
+        page asked for, so that the paginator can serve it: past the end
+        of the list the count is exact and the last page is shown, on the
+        last page the count is known, and before it the page links reach
+        at least the next page.
+        """
+        offset = self.page_num * self.list_per_page
+        found = len(self.queryset.order_by().values_list("pk", flat=True)[offset:offset + self.list_per_page + 1])
+        if not found and offset:
+            self.result_count_exact = True
+            result_count = counts.exact(self.queryset)
+            self.page_num = max(0, result_count - 1) // self.list_per_page
+            return result_count
+        if found <= self.list_per_page:
+            self.result_count_exact = True
+            return offset + found
+        return max(estimate, offset + found)
+
+    def get_keyset_results(self, request, ordering):
+        """
+        Pages by cursor: the page after the ``after`` row or before the
+        ``before`` row, found with a seek on the indexed ordering rather
+        than an OFFSET, so that any page costs as much as the first and
+        rows inserted meanwhile do not shift the pages.
+        """
+        after, before = self.params.get(AFTER_VAR), self.params.get(BEFORE_VAR)
+        cursor = before if before is not None else after
+        values = None
+        if cursor is not None:
+            values = keyset.decode(self.model, ordering, cursor)
+            if values is None:
+                raise IncorrectLookupParameters
+        queryset = self.queryset
+        if before is not None:
+            rows = list(queryset.filter(keyset.seek(self.model, ordering, values, backwards=True)).reverse()[
+                :self.list_per_page + 1
+            ])
+            has_previous, has_next = len(rows) > self.list_per_page, True
+            rows = rows[:self.list_per_page][::-1]
+        else:
+            if values is not None:
+                queryset = queryset.filter(keyset.seek(self.model, ordering, values))
+            rows = list(queryset[:self.list_per_page + 1])
+            has_previous, has_next = values is not None, len(rows) > self.list_per_page
+            rows = rows[:self.list_per_page]
+        self.keyset = True
+        self.result_list = rows
+        if cursor is not None:
+            self.first_url = self.get_query_string()
+        if rows and has_previous:
+            self.previous_url = self.get_query_string({BEFORE_VAR: keyset.encode(rows[0], ordering)})
+        if rows and has_next:
+            self.next_url = self.get_query_string({AFTER_VAR: keyset.encode(rows[-1], ordering)})
+
+
+class ExportChangeList(PrototypeChangeList):
+    """
+    The filtered and searched queryset of the changelist, without the
+    counts and the page rows a changelist view fetches.
+    """
+
+    def get_results(self, request):
+        pass
+
+
 class PrototypeAdmin(admin.ModelAdmin):
     readonly_fields = PROTOFIELDS
+    list_prefetch_related = ()
+    actions = (export_csv, export_jsonl)
+    cached_facets = ()
+    # Non-null fields ending with the pk, with an index on them, to page
+    # the changelist by cursor instead of OFFSET, see PrototypeChangeList.
+    keyset_ordering = ()
+    # Counts from core.counts rather than COUNT(*) on every changelist view.
+    estimated_counts = False
+    # Field-level change log written in the background, see core.audit.
+    audited = True
+    changes_per_page = 100
+
+    def __init__(self, model, admin_site):
+        super(PrototypeAdmin, self).__init__(model, admin_site)
+        if self.cached_facets:
+            facets.register(model, self.cached_facets)
+        if self.estimated_counts:
+            counts.register(model)
+        if self.audited:
+            audit.register(model)
+
+    def get_changelist(self, request, **kwargs):
+        return PrototypeChangeList
+
+    def get_list_select_related(self, request):
+        """
+        Unless set explicitly, joins every foreign key the changelist renders,
+        nullable ones included, which the admin default leaves out.
+        """
+        if self.list_select_related is not False:
+            return self.list_select_related
+        related = []
+        for name in self.get_list_display(request):
+            try:
+                field = self.model._meta.get_field(name)
+            except FieldDoesNotExist:
+                continue
+            if field.many_to_one:
+                related.append(name)
+        return tuple(related)
+
+    def get_list_prefetch_related(self, request):
+        return self.list_prefetch_related
+
+    def get_keyset_ordering(self, request):
+        return self.keyset_ordering
+
+    def get_actions(self, request):
+        """
+        Adds a set-based bulk update action for each of bulk.BULK_FIELDS
+        the model has.
+        """
+        actions = super(PrototypeAdmin, self).get_actions(request)
+        if self.actions is None or not self.has_change_permission(request):
+            return actions
+        for field in bulk.fields(self.model):
+            action = bulk.action(field)
+            actions[action.__name__] = (action, action.__name__, action.short_description)
+        return actions
+
+    def get_list_filter(self, request):
+        """
+        Serves the list filters named in ``cached_facets`` from FacetCount.
+        """
+        return [
+            (name, facets.CachedFacetFilter) if name in self.cached_facets else name
+            for name in self.list_filter
+        ]
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Serves the search box from the full-text index when the model has
+        one, ordering by relevance unless the user picked a column.
+        """
+        results = search.search(queryset, search_term) if search_term else None
+        if results is None:
+            return super(PrototypeAdmin, self).get_search_results(request, queryset, search_term)
+        if ORDER_VAR not in request.GET:
+            results = results.order_by("search_rank", "-pk")
+        return results, False
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            url(
+                r'^export/(?P<format>csv|jsonl)/$',
+                self.admin_site.admin_view(self.export_view),
+                name='%s_%s_export' % info
+            ),
+            url(
+                r'^(?P<object_id>\d+)/changes/$',
+                self.admin_site.admin_view(self.changes_view),
+                name='%s_%s_changes' % info
+            ),
+        ] + super(PrototypeAdmin, self).get_urls()
+
+    def get_changelist_queryset(self, request):
+        """
+        The queryset the changelist shows for ``request``, with its filters
+        and search applied. Paging parameters are ignored.
+        """
+        list_display = self.get_list_display(request)
+        cl = ExportChangeList(
+            request, self.model, list_display,
+            self.get_list_display_links(request, list_display),
+            self.get_list_filter(request), self.date_hierarchy,
+            self.get_search_fields(request), self.get_list_select_related(request),
+            self.list_per_page, self.list_max_show_all, self.list_editable, self
+        )
+        return cl.get_queryset(request)
+
+    @method_decorator(replicas.reads)
+    def changelist_view(self, request, extra_context=None):
+        return super(PrototypeAdmin, self).changelist_view(request, extra_context)
+
+    def export_view(self, request, format):
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        with replicas.reading(request) as alias:
+            try:
+                queryset = self.get_changelist_queryset(request)
+            except IncorrectLookupParameters:
+                raise Http404
+        # The rows are read while the response streams, after the view.
+        return export_response(queryset.using(alias), format)
 
     def save_model(self, request, obj, form, change):
         if getattr(obj, 'id', None) is None:
             obj.created_by = request.user
         obj.updated_by = request.user
+        if change and self.audited:
+            obj._audit_changes = audit.form_changes(form)
         obj.save()
 
+    def changes_view(self, request, object_id):
+        """
+        Field changes of the object, newest first, paged by a cursor on the
+        (model, object_id, changed_at, id) index.
+        """
+        obj = self.get_object(request, object_id)
+        if obj is None:
+            raise Http404
+        if not self.has_change_permission(request, obj):
+            raise PermissionDenied
+        ordering = ("-changed_at", "-id")
+        entries = ChangeLogEntry.objects.filter(
+            model=audit.label(self.model._meta.concrete_model), object_id=obj.pk
+        ).select_related("user").order_by(*ordering)
+        cursor = request.GET.get(AFTER_VAR)
+        if cursor is not None:
+            values = keyset.decode(ChangeLogEntry, ordering, cursor)
+            if values is None:
+                raise Http404
+            entries = entries.filter(keyset.seek(ChangeLogEntry, ordering, values))
+        entries = list(entries[:self.changes_per_page + 1])
+        fields = dict((field.name, field.verbose_name) for field in self.model._meta.get_fields() if field.concrete)
+        context = dict(
+            self.admin_site.each_context(request),
+            title=_("Изменения: {}").format(obj),
+            opts=self.model._meta,
+            original=obj,
+            rows=[(entry, fields.get(entry.field, entry.field)) for entry in entries[:self.changes_per_page]],
+            next_cursor=(
+                keyset.encode(entries[self.changes_per_page - 1], ordering)
+                if len(entries) > self.changes_per_page else None
+            ),
+        )
+        return TemplateResponse(request, "admin/core/changes.html", context)
+
+
+class ChunkedUploadAdminMixin(object):
+    """
+    Uploads the file fields named in ``chunked_upload_fields`` in chunks
+    ahead of the form submit, so that large files survive dropped
+    connections: the widget asks ``upload/<id>/`` for the received offset
+    and carries on from there.
+    """
+    chunked_upload_fields = ()
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            url(r'^upload/$', self.admin_site.admin_view(self.upload_start_view), name='%s_%s_upload' % info),
+            url(
+                r'^upload/(?P<session_id>[0-9a-f]{32})/$',
+                self.admin_site.admin_view(self.upload_chunk_view),
+                name='%s_%s_upload_chunk' % info
+            ),
+            url(
+                r'^upload/(?P<session_id>[0-9a-f]{32})/finish/$',
+                self.admin_site.admin_view(self.upload_finish_view),
+                name='%s_%s_upload_finish' % info
+            ),
+        ] + super(ChunkedUploadAdminMixin, self).get_urls()
+
+    def formfield_for_dbfield(self, db_field, **kwargs):
+        if db_field.name in self.chunked_upload_fields:
+            request = kwargs.pop("request", None)
+            info = self.admin_site.name, self.model._meta.app_label, self.model._meta.model_name
+            kwargs["form_class"] = uploads.ChunkedFileField
+            kwargs["user"] = getattr(request, "user", None)
+            kwargs["widget"] = uploads.ChunkedFileInput(reverse("%s:%s_%s_upload" % info))
+            return db_field.formfield(**kwargs)
+        return super(ChunkedUploadAdminMixin, self).formfield_for_dbfield(db_field, **kwargs)
+
+    def get_upload_session(self, request, session_id):
+        if not (self.has_add_permission(request) or self.has_change_permission(request)):
+            raise PermissionDenied
+        return get_object_or_404(UploadSession, pk=session_id, created_by=request.user)
+
+    def upload_start_view(self, request):
+        if request.method != "POST":
+            return JsonResponse({"error": "POST required"}, status=405)
+        if not (self.has_add_permission(request) or self.has_change_permission(request)):
+            raise PermissionDenied
+        try:
+            size = int(request.POST["size"])
+            filename = request.POST["filename"]
+        except (KeyError, ValueError):
+            return JsonResponse({"error": "filename and size required"}, status=400)
+        if size < 0 or not filename:
+            return JsonResponse({"error": "filename and size required"}, status=400)
+        try:
+            session = uploads.start(request.user, filename, size, self.get_upload_max_length())
+        except uploads.UploadError as e:
+            return JsonResponse({"error": str(e)}, status=e.status)
+        return JsonResponse(uploads.state(session), status=201)
+
+    def get_upload_max_length(self):
+        """
+        The shortest max_length of the chunked upload fields, which the
+        name of any upload has to fit.
+        """
+        lengths = [self.model._meta.get_field(name).max_length for name in self.chunked_upload_fields]
+        return min(lengths) if lengths else None
+
+    def upload_chunk_view(self, request, session_id):
+        session = self.get_upload_session(request, session_id)
+        if request.method == "PUT":
+            try:
+                uploads.write_chunk(
+                    session, request, request.META.get("HTTP_CONTENT_RANGE"),
+                    request.META.get("HTTP_X_CONTENT_SHA256")
+                )
+            except uploads.UploadError as e:
+                return JsonResponse(dict(uploads.state(session), error=str(e)), status=e.status)
+        elif request.method != "GET":
+            return JsonResponse({"error": "GET or PUT required"}, status=405)
+        return JsonResponse(uploads.state(session))
+
+    def upload_finish_view(self, request, session_id):
+        session = self.get_upload_session(request, session_id)
+        if request.method != "POST":
+            return JsonResponse({"error": "POST required"}, status=405)
+        try:
+            uploads.finish(session)
+        except uploads.UploadError as e:
+            return JsonResponse(dict(uploads.state(session), error=str(e)), status=e.status)
+        return JsonResponse(uploads.state(session))
+
+
+class AttachmentDownloadAdminMixin(object):
+    """
+    Serves the file fields named in ``download_fields`` through a download
+    view checking the change permission, see core.downloads.
+    """
+    download_fields = ()
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            url(
+                r'^(?P<object_id>\d+)/download/(?P<field_name>\w+)/$',
+                self.admin_site.admin_view(self.download_view),
+                name='%s_%s_download' % info
+            ),
+        ] + super(AttachmentDownloadAdminMixin, self).get_urls()
 
-class ContractorAdmin(PrototypeAdmin):
+    def get_form(self, request, obj=None, **kwargs):
+        form = super(AttachmentDownloadAdminMixin, self).get_form(request, obj, **kwargs)
+        if obj is not None:
+            info = self.admin_site.name, self.model._meta.app_label, self.model._meta.model_name
+            for name in self.download_fields:
+                if name in form.base_fields:
+                    form.base_fields[name].widget.download_url = reverse(
+                        "%s:%s_%s_download" % info, args=(obj.pk, name)
+                    )
+        return form
+
+    def download_view(self, request, object_id, field_name):
+        if field_name not in self.download_fields:
+            raise Http404
+        obj = self.get_object(request, object_id)
+        if obj is None:
+            raise Http404
+        if not self.has_change_permission(request, obj):
+            raise PermissionDenied
+        field_file = getattr(obj, field_name)
+        if not field_file or not os.path.exists(field_file.path):
+            raise Http404
+        return downloads.serve(request, field_file)
+
+
+class AttachmentPreviewAdminMixin(object):
+    """
+    Shows the cached previews of ``preview_field``, see core.previews: a
+    thumbnail in the changelist as ``preview_view`` and the first page on
+    the change form as ``page_preview_view``. Rendering is left to the
+    render_previews command, so neither costs more than a stat() per file.
+    """
+    preview_field = "attach"
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            url(
+                r'^(?P<object_id>\d+)/preview/(?P<size>{})/$'.format("|".join(previews.SIZES)),
+                self.admin_site.admin_view(self.preview_file_view),
+                name='%s_%s_preview' % info
+            ),
+        ] + super(AttachmentPreviewAdminMixin, self).get_urls()
+
+    def preview_file_view(self, request, object_id, size):
+        obj = self.get_object(request, object_id)
+        if obj is None:
+            raise Http404
+        if not self.has_change_permission(request, obj):
+            raise PermissionDenied
+        digest = digest_of(getattr(obj, self.preview_field).name)
+        name = previews.find(digest, size) if digest is not None else None
+        if name is None:
+            raise Http404
+        tag = '"{}-{}"'.format(digest, size)
+        if request.META.get("HTTP_IF_NONE_MATCH") == tag:
+            response = HttpResponseNotModified()
+        else:
+            response = FileResponse(
+                open(attachment_storage.path(name), "rb"),
+                content_type=previews.CONTENT_TYPES[os.path.splitext(name)[1]]
+            )
+        response["ETag"] = tag
+        return response
+
+    def preview_html(self, obj, size):
+        if obj.pk is None:
+            return ""
+        digest = digest_of(getattr(obj, self.preview_field).name)
+        if digest is None or previews.find(digest, size) is None:
+            return ""
+        info = self.admin_site.name, self.model._meta.app_label, self.model._meta.model_name
+        return format_html(
+            '<img src="{}" alt="" style="max-width: {}px">',
+            reverse("%s:%s_%s_preview" % info, args=(obj.pk, size)), previews.SIZES[size]
+        )
+
+    def preview_view(self, obj):
+        return self.preview_html(obj, "thumb")
+    preview_view.short_description = _("превью")
+
+    def page_preview_view(self, obj):
+        return self.preview_html(obj, "page")
+    page_preview_view.short_description = _("первая страница")
+
+
+class CalendarAdminMixin(object):
+    """
+    Week calendar and free/busy view of the responsibles of phone calls,
+    meetings and tasks, read from BusyInterval, see core.intervals. Saving
+    an activity that overlaps another of its responsible warns about it.
+    """
+    change_list_template = "admin/core/calendar_change_list.html"
+    calendar_days = 7
+    max_free_busy_days = 92
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            url(r'^calendar/$', self.admin_site.admin_view(self.calendar_view), name='%s_%s_calendar' % info),
+            url(r'^freebusy/$', self.admin_site.admin_view(self.free_busy_view), name='%s_%s_freebusy' % info),
+        ] + super(CalendarAdminMixin, self).get_urls()
+
+    def interval_url(self, interval):
+        app_label, model_name = interval.model.split(".")
+        return reverse(
+            "%s:%s_%s_change" % (self.admin_site.name, app_label, model_name), args=(interval.object_id, )
+        )
+
+    def save_model(self, request, obj, form, change):
+        super(CalendarAdminMixin, self).save_model(request, obj, form, change)
+        overlaps = intervals.conflicts(obj)
+        if overlaps:
+            self.message_user(request, format_html(
+                "{} {}", _("Ответственный в это время уже занят:"), format_html_join(
+                    ", ", '<a href="{}">{}</a> ({} – {})', (
+                        (
+                            self.interval_url(interval), interval.name,
+                            localize(timezone.localtime(interval.start)),
+                            localize(timezone.localtime(interval.finish))
+                        )
+                        for interval in overlaps
+                    )
+                )
+            ), messages.WARNING)
+
+    def requested_users(self, request):
+        return [int(pk) for pk in request.GET.getlist("user") if pk.isdigit()]
+
+    def calendar_view(self, request):
+        """
+        Activities of the chosen users over a week, overlapping ones marked.
+        """
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        week = intervals.moment(request.GET.get("week")) or timezone.now()
+        week = timezone.localtime(week).date()
+        week -= timedelta(days=week.weekday())
+        days = [week + timedelta(days=number) for number in range(self.calendar_days)]
+        starts = [intervals.day_start(day) for day in days]
+        starts.append(intervals.day_start(days[-1] + timedelta(days=1)))
+        users = self.requested_users(request) or [request.user.pk]
+        schedule = intervals.free_busy(users, starts[0], starts[-1])
+        usernames = dict(User.objects.filter(pk__in=users).values_list("pk", "username"))
+        rows = []
+        for user in users:
+            if user not in usernames:
+                continue
+            entry = schedule[user]
+            conflicting = set(interval.pk for pair in entry["conflicts"] for interval in pair)
+            rows.append((usernames[user], [
+                [
+                    (interval, self.interval_url(interval), interval.pk in conflicting)
+                    for interval in entry["intervals"] if interval.start < finish and interval.finish > start
+                ]
+                for start, finish in zip(starts, starts[1:])
+            ]))
+        context = dict(
+            self.admin_site.each_context(request),
+            title=_("Календарь"),
+            opts=self.model._meta,
+            days=days,
+            rows=rows,
+            users=User.objects.filter(is_active=True).values_list("pk", "username").order_by("username"),
+            selected=users,
+            previous_week=week - timedelta(days=7),
+            next_week=week + timedelta(days=7),
+        )
+        return TemplateResponse(request, "admin/core/calendar.html", context)
+
+    def free_busy_view(self, request):
+        """
+        Busy and free periods and conflicts of the ``user`` ids between
+        ``start`` and ``finish``, ISO dates or datetimes.
+        """
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        users = self.requested_users(request)
+        start, finish = intervals.moment(request.GET.get("start")), intervals.moment(request.GET.get("finish"))
+        if not users or start is None or finish is None or start >= finish:
+            return JsonResponse({"error": "user, start and finish required"}, status=400)
+        if finish - start > timedelta(days=self.max_free_busy_days):
+            return JsonResponse({"error": "at most {} days".format(self.max_free_busy_days)}, status=400)
+
+        def item(interval):
+            return dict(
+                model=interval.model, id=interval.object_id, name=interval.name,
+                start=interval.start, finish=interval.finish
+            )
+
+        return JsonResponse({"users": dict(
+            (
+                str(user),
+                dict(
+                    busy=entry["busy"],
+                    free=entry["free"],
+                    intervals=[item(interval) for interval in entry["intervals"]],
+                    conflicts=[[item(a), item(b)] for a, b in entry["conflicts"]],
+                )
+            )
+            for user, entry in intervals.free_busy(users, start, finish).items()
+        )})
+
+
+class TimelineAdminMixin(object):
+    """
+    History page merging the calls, meetings, tasks, notes, deals and
+    circulations of the object, newest first, see core.timeline.
+    """
+    change_form_template = "admin/core/timeline_change_form.html"
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            url(
+                r'^(?P<object_id>\d+)/timeline/$',
+                self.admin_site.admin_view(self.timeline_view),
+                name='%s_%s_timeline' % info
+            ),
+        ] + super(TimelineAdminMixin, self).get_urls()
+
+    def timeline_view(self, request, object_id):
+        obj = self.get_object(request, object_id)
+        if obj is None:
+            raise Http404
+        if not self.has_change_permission(request, obj):
+            raise PermissionDenied
+        entries, next_cursor = timeline.page(obj, timeline.parse_cursor(request.GET.get("before")))
+        rows = [
+            (
+                entry.timestamp,
+                entry.obj._meta.verbose_name,
+                reverse(
+                    "%s:%s_%s_change" % (self.admin_site.name, entry.obj._meta.app_label, entry.obj._meta.model_name),
+                    args=(entry.pk, )
+                ),
+                entry.obj,
+                getattr(entry.obj, "contact", None),
+            )
+            for entry in entries
+        ]
+        context = dict(
+            self.admin_site.each_context(request),
+            title=_("История: {}").format(obj),
+            opts=self.model._meta,
+            original=obj,
+            rows=rows,
+            next_cursor=next_cursor,
+        )
+        return TemplateResponse(request, "admin/core/timeline.html", context)
+
+
+class ContractorAdmin(TimelineAdminMixin, PrototypeAdmin):
+    emails_view = related_list_view("emails", _("эл. адреса"))
+    list_display = ("name", "phone", "primary_email", "emails_view", "primary_address", "parent", "responsible")
+    list_select_related = ("primary_email", "primary_address", "parent", "responsible")
+    list_prefetch_related = ("emails", )
+    search_fields = ("name", "phone")
     fieldsets = (
         (
             None,
@@ -66,6 +796,7 @@ class AddressAdmin(PrototypeAdmin):
     search_fields = params
     list_display = ("address_view", "country", "region", "city")
     list_filter = ("country", "region", "city")
+    cached_facets = list_filter
     def address_view(self, obj):
         return obj
 
@@ -84,12 +815,14 @@ class EmailToContractorAdmin(PrototypeAdmin):
     pass
 
 
-class ContactAdmin(PrototypeAdmin):
+class ContactAdmin(TimelineAdminMixin, PrototypeAdmin):
     def contact_view(self, obj):
         return obj.get_fullname()
     params = ("department", "position", "phone_work", "phone_mobile", "skype")
-    list_display = ("contact_view", ) + params
+    list_display = ("contact_view", ) + params + ("contractor", "primary_email", "responsible")
+    list_select_related = ("contractor", "primary_email", "responsible")
     search_fields = ("first_name", "last_name",) + params
+    keyset_ordering = ("-updated_at", "-id")
     fieldsets = (
         (
             _("личные данные"),
@@ -147,28 +880,88 @@ class MarketingCampaignAdmin(PrototypeAdmin):
 
 
 class DealAdmin(PrototypeAdmin):
-    pass
+    list_display = ("name", "contractor", "stage", "amount", "currency", "closing_date", )
+    search_fields = ("name", "desc", "next_step")
+    list_filter = ("stage", "responsible")
+    ordering = ("-closing_date", )
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            url(
+                r'^report/$',
+                self.admin_site.admin_view(replicas.reads(self.report_view)),
+                name='%s_%s_report' % info
+            ),
+        ] + super(DealAdmin, self).get_urls()
+
+    def report_view(self, request):
+        """
+        Pipeline by closing month and stage, read from DealSummary only.
+        """
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        summary = DealSummary.objects.all()
+        currency = request.GET.get("currency")
+        responsible = request.GET.get("responsible")
+        if currency:
+            summary = summary.filter(currency=currency)
+        if responsible:
+            summary = summary.filter(responsible_id=responsible)
+        cells = {}
+        for row in summary.values("month", "stage").annotate(amount=Sum("amount"), count=Sum("count")).order_by():
+            cells[row["month"], row["stage"]] = row
+        stages = [(stage, label) for stage, label in STAGE if any(key[1] == stage for key in cells)]
+        months = sorted(set(key[0] for key in cells), reverse=True)
+        table = [
+            (
+                month,
+                [cells.get((month, stage)) for stage, label in stages],
+                sum(row["amount"] for key, row in cells.items() if key[0] == month)
+            )
+            for month in months
+        ]
+        responsibles = DealSummary.objects.exclude(responsible=None).values_list(
+            "responsible_id", "responsible__username"
+        ).distinct().order_by("responsible__username")
+        context = dict(
+            self.admin_site.each_context(request),
+            title=_("Воронка продаж"),
+            opts=self.model._meta,
+            stages=[label for stage, label in stages],
+            table=table,
+            currencies=CURRENCY,
+            currency=currency,
+            responsibles=responsibles,
+            responsible=responsible,
+        )
+        return TemplateResponse(request, "admin/core/deal/report.html", context)
 
 
 class CirculationAdmin(PrototypeAdmin):
-    pass
+    list_display = ("name", "contractor", "kind", "priority", "status", )
+    search_fields = ("name", "desc")
+    list_filter = ("status", "priority")
+    ordering = ("-priority", )
 
 
-class PhoneCallAdmin(PrototypeAdmin):
-    pass
+class PhoneCallAdmin(CalendarAdminMixin, PrototypeAdmin):
+    estimated_counts = True
 
 
-class MeetingAdmin(PrototypeAdmin):
+class MeetingAdmin(CalendarAdminMixin, PrototypeAdmin):
     list_display = ("name", "place", "status", "starting_datetime", "finishing_datetime", )
     search_fields = ("name", "desc", "place")
     list_filter = ("status", "responsible")
+    cached_facets = list_filter
+    ordering = ("-starting_datetime", )
 
     fieldsets = (
         (
             None,
             {
                 "fields": (
-                    "name", "desc", "status", "place",
+                    "name", "desc", "status", "place", "contact",
                     "starting_datetime", "finishing_datetime",
                 )
             }
@@ -178,16 +971,98 @@ class MeetingAdmin(PrototypeAdmin):
     )
 
 
-class TaskAdmin(PrototypeAdmin):
-    pass
+class TaskAdmin(CalendarAdminMixin, PrototypeAdmin):
+    list_display = ("name", "contact", "priority", "status", "starting_datetime", "finishing_datetime", )
+    search_fields = ("name", "desc")
+    list_filter = ("status", "responsible")
+    ordering = ("-starting_datetime", )
+    keyset_ordering = ("-starting_datetime", "-id")
+    estimated_counts = True
 
 
-class NoteAdmin(PrototypeAdmin):
-    pass
+class NoteAdmin(AttachmentPreviewAdminMixin, AttachmentDownloadAdminMixin, ChunkedUploadAdminMixin, PrototypeAdmin):
+    chunked_upload_fields = ("attach", )
+    download_fields = ("attach", )
+    search_fields = ("name", "desc")
+    list_display = ("__str__", "preview_view")
+    readonly_fields = PROTOFIELDS + ("page_preview_view", )
 
 
-class DocumentAdmin(PrototypeAdmin):
-    pass
+class DocumentRevisionInline(admin.TabularInline):
+    model = DocumentRevision
+    fields = ("number", "download_view", "kind", "size", "stored_size", "created_at")
+    readonly_fields = fields
+    ordering = ("-number", )
+    extra = 0
+    max_num = 0
+    can_delete = False
+
+    def download_view(self, obj):
+        if obj.pk is None:
+            return ""
+        info = self.admin_site.name, Document._meta.app_label, Document._meta.model_name
+        return format_html(
+            '<a href="{}">{}</a>',
+            reverse("%s:%s_%s_revision" % info, args=(obj.document_id, obj.number)), obj.filename
+        )
+    download_view.short_description = _("файл")
+
+
+class DocumentAdmin(AttachmentPreviewAdminMixin, AttachmentDownloadAdminMixin, ChunkedUploadAdminMixin, PrototypeAdmin):
+    chunked_upload_fields = ("attach", )
+    download_fields = ("attach", )
+    search_fields = ("name", "desc")
+    list_display = ("__str__", "preview_view")
+    readonly_fields = PROTOFIELDS + ("page_preview_view", "cluster_view")
+    inlines = (DocumentRevisionInline, )
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            url(
+                r'^(?P<object_id>\d+)/revisions/(?P<number>\d+)/$',
+                self.admin_site.admin_view(self.revision_view),
+                name='%s_%s_revision' % info
+            ),
+        ] + super(DocumentAdmin, self).get_urls()
+
+    def revision_view(self, request, object_id, number):
+        """
+        Downloads version ``number`` of the attachment, rebuilt from its
+        deltas while it is sent; not found when they cannot rebuild it.
+        """
+        obj = self.get_object(request, object_id)
+        if obj is None:
+            raise Http404
+        if not self.has_change_permission(request, obj):
+            raise PermissionDenied
+        revision = get_object_or_404(DocumentRevision, document=obj, number=number)
+        tag = '"{}"'.format(revision.digest)
+        if request.META.get("HTTP_IF_NONE_MATCH") == tag:
+            response = HttpResponseNotModified()
+        else:
+            try:
+                content = revisions.open_revision(revision)
+            except revisions.CorruptRevision:
+                raise Http404
+            response = FileResponse(content, content_type="application/octet-stream")
+            response["Content-Length"] = revision.size
+            response["Content-Disposition"] = downloads.disposition(revision.filename)
+        response["ETag"] = tag
+        return response
+
+    def cluster_view(self, obj):
+        """
+        Every document linked to ``obj`` at any distance.
+        """
+        if obj.pk is None:
+            return ""
+        info = self.admin_site.name, self.model._meta.app_label, self.model._meta.model_name
+        return format_html_join(", ", '<a href="{}">{}</a>', (
+            (reverse("%s:%s_%s_change" % info, args=(document.pk, )), document.name)
+            for document in Document.objects.cluster(obj, include_self=False).only("name").order_by("name")
+        ))
+    cluster_view.short_description = _("все связанные документы")
 
 
 class ProjectAdmin(PrototypeAdmin):
@@ -207,4 +1082,5 @@ admin.site.register(Meeting, MeetingAdmin)
 admin.site.register(Task, TaskAdmin)
 admin.site.register(Note, NoteAdmin)
 admin.site.register(Document, DocumentAdmin)
-admin.site.register(Project, ProjectAdmin)
\ No newline at end of file
+admin.site.register(Project, ProjectAdmin)
+admin.site.index_template = "admin/core/index.html"
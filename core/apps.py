@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
-    verbose_name = 'ядро'
\ No newline at end of file
+    verbose_name = 'ядро'
+
+    def ready(self):
+        from . import signals  # noqa
@@ -0,0 +1,273 @@
+import atexit
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.db.models.fields.files import FieldFile
+from django.utils import timezone
+from django.utils.encoding import smart_text
+
+from . import stored
+from .models import ChangeLogEntry
+
+logger = logging.getLogger(__name__)
+
+AUDITED = set()
+IGNORED_FIELDS = ("created_by", "created_at", "updated_by", "updated_at")
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 1.0
+
+
+def register(model):
+    AUDITED.add(model)
+
+
+def label(model):
+    return model._meta.label_lower
+
+
+def text(value):
+    if value is None:
+        return None
+    if isinstance(value, FieldFile):
+        return value.name or None
+    if isinstance(value, (list, tuple, set)):
+        return ", ".join(sorted(smart_text(item) for item in value))
+    return smart_text(value)
+
+
+def tracked(model):
+    return [
+        field for field in model._meta.concrete_fields
+        if not field.primary_key and field.name not in IGNORED_FIELDS
+    ]
+
+
+def stash(instance):
+    """
+    Remembers the stored values of ``instance`` unless the admin already
+    gave its changes, see form_changes().
+    """
+    if instance.pk is None or hasattr(instance, "_audit_changes"):
+        return
+    instance._audit_previous = stored.row(instance)
+
+
+def form_changes(form):
+    """
+    (field, old, new) of the fields ``form`` changed, from the initial
+    values the admin form was built with, which spares reading the stored
+    row unless another subsystem needs it.
+    """
+    changes = []
+    for name in form.changed_data:
+        try:
+            field = form.instance._meta.get_field(name)
+        except FieldDoesNotExist:
+            continue
+        if field.name in IGNORED_FIELDS:
+            continue
+        if field.many_to_many:
+            new = [obj.pk for obj in form.cleaned_data.get(name) or ()]
+        else:
+            new = field.value_from_object(form.instance)
+        changes.append((field.name, text(form.initial.get(name)), text(new)))
+    return changes
+
+
+def changes(instance):
+    previous = instance.__dict__.pop("_audit_previous", None)
+    if previous is None:
+        return []
+    result = []
+    for field in tracked(instance._meta.concrete_model):
+        old, new = text(previous[field.attname]), text(field.value_from_object(instance))
+        if old != new:
+            result.append((field.name, old, new))
+    return result
+
+
+def entries(instance, action, field_changes=((None, None, None), )):
+    now = timezone.now()
+    return [
+        ChangeLogEntry(
+            model=label(instance._meta.concrete_model), object_id=instance.pk, action=action,
+            field=name or "", old=old, new=new, user_id=getattr(instance, "updated_by_id", None), changed_at=now
+        )
+        for name, old, new in field_changes
+    ]
+
+
+def saved(instance, created):
+    if created:
+        record(entries(instance, "create"))
+        return
+    field_changes = instance.__dict__.pop("_audit_changes", None)
+    if field_changes is None:
+        field_changes = changes(instance)
+    if field_changes:
+        record(entries(instance, "change", field_changes))
+
+
+def deleted(instance):
+    record(entries(instance, "delete"))
+
+
+def updated(model, name, previous, value, user):
+    """
+    Records the change of ``name`` to ``value`` on the rows of ``model``
+    whose values ``previous`` maps their pks to.
+    """
+    now = timezone.now()
+    record([
+        ChangeLogEntry(
+            model=label(model), object_id=pk, action="change",
+            field=name, old=text(old), new=text(value), user=user, changed_at=now
+        )
+        for pk, old in previous.items()
+    ])
+
+
+def record(items):
+    """
+    Queues ``items`` for the writer once the transaction saving them
+    commits, so that rolled back changes leave no trace.
+    """
+    transaction.on_commit(lambda: writer.put(items))
+
+
+def write(items):
+    """
+    Writes ``items`` in one bulk insert, retried once on a fresh
+    connection. When that fails too they are inserted one by one, so that
+    an entry the database refuses costs only itself.
+    """
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                ChangeLogEntry.objects.bulk_create(items, batch_size=BATCH_SIZE)
+            return
+        except DatabaseError:
+            logger.warning("could not write %d change log entries at once", len(items), exc_info=True)
+            if not connection.in_atomic_block:
+                connection.close_if_unusable_or_obsolete()
+    lost = 0
+    for item in items:
+        try:
+            with transaction.atomic():
+                item.save(force_insert=True)
+        except DatabaseError:
+            logger.exception("could not write change log entry %s %s", item.model, item.object_id)
+            lost += 1
+    if lost:
+        logger.error("lost %d of %d change log entries", lost, len(items))
+
+
+class Writer(object):
+    """
+    Background thread writing queued entries in batches of up to
+    BATCH_SIZE, at most FLUSH_INTERVAL seconds after they were queued.
+    The queue holds at most CORE_AUDIT_QUEUE_SIZE entries: past that, the
+    saving thread writes its entries itself rather than growing memory
+    or dropping them. Whatever is left is written at interpreter exit.
+    """
+
+    def __init__(self):
+        self.queue = None
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.queue = queue.Queue(getattr(settings, "CORE_AUDIT_QUEUE_SIZE", 10000))
+                self.thread = threading.Thread(target=self.run, name="core.audit", daemon=True)
+                self.thread.start()
+
+    def put(self, items):
+        # SQLite takes one write lock for the whole file, which the thread
+        # would only contend for with the requests.
+        if not getattr(settings, "CORE_AUDIT_ASYNC", True) or connection.vendor == "sqlite":
+            write(items)
+            return
+        self.start()
+        for number, item in enumerate(items):
+            try:
+                self.queue.put_nowait(item)
+            except queue.Full:
+                write(items[number:])
+                return
+
+    def take(self, timeout):
+        """
+        Up to BATCH_SIZE queued entries, waiting ``timeout`` seconds for
+        the first one. None stands for the stop request.
+        """
+        try:
+            batch = [self.queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while batch[-1] is not None and len(batch) < BATCH_SIZE:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        running = True
+        try:
+            while running:
+                batch = self.take(FLUSH_INTERVAL)
+                if batch and batch[-1] is None:
+                    batch.pop()
+                    running = False
+                if batch:
+                    write(batch)
+                    close_old_connections()
+        finally:
+            connection.close()
+
+    def flush(self):
+        """
+        Writes the queued entries from the calling thread.
+        """
+        if self.queue is None:
+            return
+        batch = []
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                batch.append(item)
+        if batch:
+            write(batch)
+
+    def stop(self, timeout=10):
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is None:
+            return
+        try:
+            self.queue.put(None, timeout=timeout)
+            thread.join(timeout)
+        except queue.Full:
+            pass
+        self.flush()
+
+
+writer = Writer()
+atexit.register(writer.stop)
+
+
+def flush():
+    """
+    Stops the writer once the queued entries are written. It starts again
+    with the next change.
+    """
+    writer.stop()
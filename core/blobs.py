@@ -0,0 +1,112 @@
+import datetime
+import os
+
+from django.db import models, transaction
+from django.utils import timezone
+
+from . import stored
+from .models import Blob, UploadSession
+from .storage import attachment_storage, blob_name, digest_of
+
+ATTACHMENT_FIELDS = ("attach", )
+
+
+def touch(digest, size):
+    """
+    Registers a freshly written blob, restarting its grace period so that
+    gc_blobs leaves it alone until the attachment referring to it is saved.
+    """
+    now = timezone.now()
+    Blob.objects.get_or_create(digest=digest, defaults={"size": size, "touched_at": now})
+    Blob.objects.filter(digest=digest).update(touched_at=now)
+
+
+def acquire(name):
+    digest = digest_of(name)
+    if digest is not None:
+        Blob.objects.filter(digest=digest).update(refcount=models.F("refcount") + 1)
+
+
+def release(name):
+    digest = digest_of(name)
+    if digest is not None:
+        Blob.objects.filter(digest=digest).update(refcount=models.F("refcount") - 1, touched_at=timezone.now())
+
+
+def names(values):
+    return [values[name] or "" for name in ATTACHMENT_FIELDS]
+
+
+def stash(instance):
+    previous = stored.row(instance)
+    instance._blobs_previous = names(previous) if previous is not None else ["" for name in ATTACHMENT_FIELDS]
+
+
+def saved(instance):
+    previous = getattr(instance, "_blobs_previous", None)
+    if previous is None:
+        return
+    current = [getattr(instance, name).name or "" for name in ATTACHMENT_FIELDS]
+    with transaction.atomic():
+        for old, new in zip(previous, current):
+            if old != new:
+                release(old)
+                acquire(new)
+
+
+def deleted(instance):
+    for name in ATTACHMENT_FIELDS:
+        release(getattr(instance, name).name)
+
+
+def bury(digest, cutoff, storage=attachment_storage):
+    """
+    Deletes the blob of ``digest`` unless it was referred to or touched
+    since ``cutoff``. The file is moved aside before the row goes, so that
+    a concurrent store() of the same content finds it missing and links
+    its own copy rather than register a file about to be removed.
+    """
+    path = storage.path(blob_name(digest))
+    tombstone = storage.path(os.path.join("blobs", "tmp", "gc-{}".format(digest)))
+    os.makedirs(os.path.dirname(tombstone), exist_ok=True)
+    try:
+        os.replace(path, tombstone)
+    except FileNotFoundError:
+        tombstone = None
+    deleted = 0
+    try:
+        deleted = Blob.objects.filter(digest=digest, refcount__lte=0, touched_at__lt=cutoff).delete()[0]
+    finally:
+        if tombstone is not None:
+            if not deleted:
+                try:
+                    os.link(tombstone, path)
+                except FileExistsError:
+                    pass
+            os.remove(tombstone)
+    return bool(deleted)
+
+
+def collect(grace=datetime.timedelta(hours=24), storage=attachment_storage):
+    """
+    Deletes the blobs no attachment has referred to for ``grace`` and the
+    temporary files and sessions of uploads abandoned as long ago. Returns
+    the number of blobs and bytes freed.
+    """
+    cutoff = timezone.now() - grace
+    freed = size = 0
+    for digest, blob_size in Blob.objects.filter(refcount__lte=0, touched_at__lt=cutoff).values_list(
+            "digest", "size").iterator():
+        if bury(digest, cutoff, storage):
+            freed += 1
+            size += blob_size
+    tmp_dir = storage.path(os.path.join("blobs", "tmp"))
+    if os.path.isdir(tmp_dir):
+        for entry in os.listdir(tmp_dir):
+            path = os.path.join(tmp_dir, entry)
+            if timezone.make_aware(datetime.datetime.utcfromtimestamp(os.path.getmtime(path)),
+                                   timezone.utc) < cutoff:
+                os.remove(path)
+    UploadSession.objects.filter(updated_at__lt=cutoff).delete()
+    return freed, size
+
@@ -0,0 +1,137 @@
+from django import forms
+from django.contrib import messages
+from django.contrib.admin import helpers
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+from django.template.response import TemplateResponse
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+
+from . import facets, summary, intervals, audit, dashboard
+from .models import Deal
+
+BULK_FIELDS = ("responsible", "status", "stage", "priority", "marketing_campaign")
+CHUNK_SIZE = 1000
+
+
+def fields(model):
+    """
+    The BULK_FIELDS of ``model``.
+    """
+    result = []
+    for name in BULK_FIELDS:
+        try:
+            result.append(model._meta.get_field(name))
+        except FieldDoesNotExist:
+            continue
+    return result
+
+
+def raw(field, value):
+    return value.pk if field.is_relation and value is not None else value
+
+
+def changing(queryset, field, value):
+    """
+    Rows of ``queryset`` whose ``field`` is not ``value`` yet.
+    """
+    if value is None:
+        return queryset.exclude(**{field.name + "__isnull": True})
+    return queryset.exclude(**{field.name: value})
+
+
+def apply(model, pks, field, value, user):
+    """
+    Sets ``field`` to ``value`` on the rows of ``model`` with ``pks`` in
+    one UPDATE, and brings what signals would maintain up to date.
+    """
+    previous = dict(model._default_manager.filter(pk__in=pks).values_list("pk", field.attname))
+    deals = summary.snapshots(pks) if model is Deal and field.attname in summary.KEY_FIELDS else None
+    users = None
+    if model in dashboard.WATCHED:
+        users = set(model._default_manager.filter(pk__in=pks).values_list("responsible_id", flat=True))
+    count = model._default_manager.filter(pk__in=pks).update(**{
+        field.name: value,
+        "updated_by": user,
+        "updated_at": timezone.now(),
+    })
+    if field.name in facets.FACETS.get(model, ()):
+        facets.moved(model, field.name, list(previous.values()), raw(field, value))
+    if deals is not None:
+        summary.moved(deals, field.attname, raw(field, value))
+    if model in intervals.MODELS:
+        intervals.refreshed(model, pks)
+    if model in audit.AUDITED:
+        audit.updated(model, field.name, previous, raw(field, value), user)
+    if users is not None:
+        dashboard.invalidate(users | set(previous.values()) if field.name == "responsible" else users)
+    return count
+
+
+def update(queryset, field, value, user):
+    """
+    Sets ``field`` to ``value`` on the rows of ``queryset`` that differ,
+    CHUNK_SIZE rows per transaction, walking them by primary key. Returns
+    the number of rows changed.
+    """
+    model = queryset.model._meta.concrete_model
+    rows = changing(queryset, field, value).order_by("pk").values_list("pk", flat=True)
+    count, last_pk = 0, None
+    while True:
+        chunk = rows if last_pk is None else rows.filter(pk__gt=last_pk)
+        pks = list(chunk[:CHUNK_SIZE])
+        if pks:
+            with transaction.atomic():
+                count += apply(model, pks, field, value, user)
+        if len(pks) < CHUNK_SIZE:
+            return count
+        last_pk = pks[-1]
+
+
+class ValueForm(forms.Form):
+    def __init__(self, field, *args, **kwargs):
+        super(ValueForm, self).__init__(*args, **kwargs)
+        self.fields["value"] = field.formfield()
+
+
+def update_view(modeladmin, request, queryset, field):
+    """
+    Intermediate page of a bulk update: the new value is checked first,
+    which counts the rows it would change, then applied.
+    """
+    opts = modeladmin.model._meta
+    form = ValueForm(field, request.POST if "value" in request.POST else None)
+    context = dict(
+        modeladmin.admin_site.each_context(request),
+        title=_("Изменить: {}").format(field.verbose_name),
+        opts=opts,
+        form=form,
+        action=request.POST.get("action"),
+        select_across=request.POST.get("select_across", "0"),
+        action_checkbox_name=helpers.ACTION_CHECKBOX_NAME,
+        selected=request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+    )
+    if form.is_bound and form.is_valid():
+        value = form.cleaned_data["value"]
+        if "apply" in request.POST and request.POST.get("checked") == request.POST.get("value"):
+            count = update(queryset, field, value, request.user)
+            modeladmin.message_user(request, _("Изменено записей: {}").format(count), messages.SUCCESS)
+            return None
+        context.update(
+            dry_run=True,
+            checked=request.POST.get("value"),
+            selected_count=queryset.count(),
+            changed_count=changing(queryset, field, value).count(),
+        )
+    return TemplateResponse(request, "admin/core/bulk_update.html", context)
+
+
+def action(field):
+    """
+    Admin action running update_view() for ``field``.
+    """
+    def bulk_update(modeladmin, request, queryset):
+        return update_view(modeladmin, request, queryset, field)
+    bulk_update.__name__ = "bulk_update_{}".format(field.name)
+    bulk_update.short_description = _("Изменить у выбранных: {}").format(field.verbose_name)
+    return bulk_update
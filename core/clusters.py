@@ -0,0 +1,100 @@
+from django.db import models, transaction
+
+from .models import Document, DocumentComponent
+
+FIELD = Document._meta.get_field("related_documents")
+THROUGH = FIELD.remote_field.through
+SOURCE = FIELD.m2m_field_name() + "_id"
+TARGET = FIELD.m2m_reverse_field_name() + "_id"
+BATCH_SIZE = 500
+
+
+def components(nodes, edges):
+    """
+    Maps each of ``nodes`` to the smallest node of its connected component
+    in the graph of ``edges`` pairs.
+    """
+    parent = dict((node, node) for node in nodes)
+
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for a, b in edges:
+        a, b = find(a), find(b)
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+    return dict((node, find(node)) for node in nodes)
+
+
+def linked(a, b):
+    """
+    Whether documents ``a`` and ``b``, instances or pks, are linked at any
+    distance: both have a component and it is the same.
+    """
+    a, b = getattr(a, "pk", a), getattr(b, "pk", b)
+    roots = dict(DocumentComponent.objects.filter(document__in=[a, b]).values_list("document_id", "root"))
+    return a in roots and b in roots and roots[a] == roots[b]
+
+
+def relabel(mapping):
+    by_root = {}
+    for node, root in mapping.items():
+        by_root.setdefault(root, []).append(node)
+    for root, nodes in by_root.items():
+        for start in range(0, len(nodes), BATCH_SIZE):
+            DocumentComponent.objects.filter(document__in=nodes[start:start + BATCH_SIZE]).exclude(
+                root=root
+            ).update(root=root)
+
+
+def created(document):
+    DocumentComponent.objects.create(document=document, root=document.pk)
+
+
+def joined(pks):
+    """
+    Merges the components of the ``pks`` documents just linked, relabelling
+    all but the largest of them.
+    """
+    sizes = list(
+        DocumentComponent.objects.filter(
+            root__in=DocumentComponent.objects.filter(document__in=pks).values("root")
+        ).values_list("root").annotate(size=models.Count("pk")).order_by("-size", "root")
+    )
+    if len(sizes) < 2:
+        return
+    DocumentComponent.objects.filter(root__in=[root for root, size in sizes[1:]]).update(root=sizes[0][0])
+
+
+def split(roots):
+    """
+    Recomputes the components labelled ``roots`` after links between their
+    documents were removed, from their links only.
+    """
+    members = DocumentComponent.objects.filter(root__in=roots).values("document_id")
+    with transaction.atomic():
+        nodes = [values["document_id"] for values in members]
+        edges = THROUGH._default_manager.filter(**{SOURCE + "__in": members}).values_list(SOURCE, TARGET)
+        relabel(components(nodes, edges))
+
+
+def roots(pks):
+    return list(DocumentComponent.objects.filter(document__in=pks).values_list("root", flat=True).distinct())
+
+
+def rebuild():
+    """
+    Recomputes the components of all documents from their links.
+    """
+    with transaction.atomic():
+        mapping = components(
+            Document.objects.values_list("pk", flat=True), THROUGH._default_manager.values_list(SOURCE, TARGET)
+        )
+        DocumentComponent.objects.all().delete()
+        DocumentComponent.objects.bulk_create(
+            (DocumentComponent(document_id=node, root=root) for node, root in mapping.items()),
+            batch_size=BATCH_SIZE
+        )
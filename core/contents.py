@@ -0,0 +1,29 @@
+from . import search
+from .extraction import extract_job
+from .models import AttachmentText
+from .queues import ATTACHMENT_MODELS, DigestQueue
+
+
+def reindex(digest):
+    """
+    Re-indexes the attachments with the content ``digest``.
+    """
+    for model in ATTACHMENT_MODELS:
+        index = search.indexed(model)
+        if index is not None:
+            instances = model._default_manager.filter(attach__startswith="cas/{}/".format(digest))
+            search.get_backend().update(index, instances)
+
+
+def store(digest, text, error):
+    if error is not None:
+        AttachmentText.objects.filter(digest=digest).update(status="failed", text="", error=error)
+        return
+    AttachmentText.objects.filter(digest=digest).update(status="done", text=text or "", error="")
+    if text:
+        reindex(digest)
+
+
+# Texts of the queued contents, extracted by the extract_attachments
+# command and indexed with the attachments having them.
+queue = DigestQueue(AttachmentText, extract_job, store)
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import random
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, models, transaction
+from django.db.models import Max, Min, Q
+from django.db.models.sql.datastructures import EmptyResultSet
+
+from .models import RowCount
+
+COUNTED = set()
+EXACT_BELOW = 10000
+SAMPLE_WINDOWS = 8
+SAMPLE_SIZE = 500
+
+
+def register(model):
+    COUNTED.add(model)
+
+
+def label(model):
+    return model._meta.label_lower
+
+
+def counted(instance):
+    return [model for model in COUNTED if isinstance(instance, model)]
+
+
+def add(model, delta):
+    RowCount.objects.filter(model=label(model)).update(count=models.F("count") + delta)
+
+
+def total(model):
+    """
+    Number of rows of ``model``, kept up to date by signals. Counted once
+    when it is first asked for.
+    """
+    count = RowCount.objects.filter(model=label(model)).values_list("count", flat=True).first()
+    if count is None:
+        with transaction.atomic():
+            count = RowCount.objects.get_or_create(
+                model=label(model), defaults={"count": model._default_manager.count()}
+            )[0].count
+    return count
+
+
+def rebuild(model):
+    RowCount.objects.update_or_create(model=label(model), defaults={"count": model._default_manager.count()})
+
+
+def cache_key(kind, queryset):
+    sql, params = queryset.query.sql_with_params()
+    return "core.counts.{}.{}".format(kind, hashlib.md5(
+        "{}\n{}\n{}".format(queryset.db, sql, params).encode("utf-8")
+    ).hexdigest())
+
+
+def cached(kind, queryset, compute):
+    try:
+        key = cache_key(kind, queryset)
+    except EmptyResultSet:
+        return 0
+    count = cache.get(key)
+    if count is None:
+        count = compute(queryset)
+        cache.set(key, count, getattr(settings, "CORE_COUNT_CACHE_TIMEOUT", 300))
+    return count
+
+
+def planned(queryset):
+    """
+    Row estimate of the PostgreSQL planner for ``queryset``.
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+        plan = cursor.fetchone()[0]
+    if not isinstance(plan, list):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def sampled(queryset, count):
+    """
+    ``count`` rows scaled by the share of ``queryset`` among the rows of a
+    few pk ranges picked at random, about SAMPLE_SIZE rows each. The
+    ranges depend on the query only, so paging through a list shows the
+    same estimate.
+    """
+    manager = queryset.model._default_manager
+    bounds = manager.aggregate(low=Min("pk"), high=Max("pk"))
+    if bounds["low"] is None:
+        return 0
+    low, high = bounds["low"], bounds["high"]
+    width = max(1, (high - low + 1) * SAMPLE_SIZE // max(count, 1))
+    generator = random.Random(str(queryset.query))
+    ranges = reduce(or_, [
+        Q(pk__gte=start, pk__lt=start + width)
+        for start in (generator.randint(low, max(low, high - width + 1)) for window in range(SAMPLE_WINDOWS))
+    ])
+    scanned = manager.filter(ranges).count()
+    if not scanned:
+        return 0
+    return int(round(count * queryset.filter(ranges).order_by().count() / float(scanned)))
+
+
+def exact(queryset):
+    """
+    Number of rows of ``queryset``, counted each time: it is shown as
+    exact, which a cached count stopped being at the next save.
+    """
+    return queryset.order_by().count()
+
+
+def estimate(queryset, count):
+    """
+    (rows, exact) of the filtered ``queryset`` of a model with ``count``
+    rows: counted when that is cheap, else estimated by the planner on
+    PostgreSQL and by sampling elsewhere.
+    """
+    queryset = queryset.order_by()
+    if count <= EXACT_BELOW or not isinstance(queryset.model._meta.pk, models.AutoField):
+        return exact(queryset), True
+    if connections[queryset.db].vendor == "postgresql":
+        return cached("planned", queryset, planned), False
+    return cached("sampled", queryset, lambda queryset: sampled(queryset, count)), False
@@ -0,0 +1,145 @@
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils.encoding import force_text
+
+from . import stored
+from .models import Task, Meeting, PhoneCall, Deal, Circulation, PreliminaryContact, Contact
+
+LIMIT = 20
+
+Source = namedtuple("Source", "model open date status")
+
+SOURCES = (
+    Source(Task, ~Q(status__in=("Completed", "Deferred")), "finishing_datetime", "status"),
+    Source(Meeting, Q(status="planned"), "starting_datetime", "status"),
+    Source(PhoneCall, Q(status="planned"), "starting_datetime", "status"),
+    Source(Deal, ~Q(stage__in=("Closed Won", "Closed Lost")), "closing_date", "stage"),
+    Source(Circulation, Q(status__startswith="Open_"), "created_at", "status"),
+    Source(PreliminaryContact, ~Q(status__in=("Converted", "Dead")) | Q(status=None), "created_at", "status"),
+)
+MODELS = tuple(source.model for source in SOURCES)
+# PreliminaryContact keeps its responsible in the Contact table, which
+# contacts saved through ContactAdmin change too.
+WATCHED = MODELS + (Contact, )
+
+
+def generation_key(user_id):
+    return "core.dashboard.generation.{}".format(user_id)
+
+
+def generation(user_id):
+    """
+    Generation of the dashboard of the user, which invalidate() bumps.
+    A lost generation starts again from the clock, past the numbers the
+    entries still cached were stored under.
+    """
+    key = generation_key(user_id)
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, int(time.time() * 1000), None)
+        value = cache.get(key)
+    return value
+
+
+def cache_key(user_id, number):
+    return "core.dashboard.{}.{}".format(user_id, number)
+
+
+def collect(source, user_id):
+    """
+    Count and first LIMIT rows of the open work of ``source`` for the
+    user, as plain values so that they cache cheaply.
+    """
+    model = source.model
+    queryset = model._default_manager.filter(source.open, responsible_id=user_id)
+    status = model._meta.get_field(source.status)
+    rows = [
+        dict(
+            pk=obj.pk,
+            name=force_text(obj),
+            date=getattr(obj, source.date),
+            status=force_text(dict(status.flatchoices).get(getattr(obj, source.status), "")),
+        )
+        for obj in queryset.order_by(source.date, "pk")[:LIMIT]
+    ]
+    count = len(rows) if len(rows) < LIMIT else queryset.count()
+    return dict(
+        model=model._meta.model_name,
+        title=force_text(model._meta.verbose_name_plural),
+        count=count,
+        rows=rows,
+    )
+
+
+def collected(source, user_id):
+    """
+    collect() from a worker thread, which closes the connection it opened.
+    """
+    try:
+        return collect(source, user_id)
+    finally:
+        connection.close()
+
+
+def build(user_id):
+    """
+    The sections of the dashboard of the user, one per source, queried
+    by CORE_DASHBOARD_WORKERS threads at once.
+    """
+    workers = getattr(settings, "CORE_DASHBOARD_WORKERS", 6)
+    if workers <= 1:
+        return [collect(source, user_id) for source in SOURCES]
+    with ThreadPoolExecutor(max_workers=min(workers, len(SOURCES))) as executor:
+        return list(executor.map(lambda source: collected(source, user_id), SOURCES))
+
+
+def sections(user_id):
+    """
+    The cached dashboard of the user, built on a miss. It stays cached
+    until a row whose responsible is the user changes.
+    """
+    key = cache_key(user_id, generation(user_id))
+    result = cache.get(key)
+    if result is None:
+        result = build(user_id)
+        cache.set(key, result, getattr(settings, "CORE_DASHBOARD_CACHE_TIMEOUT", 3600))
+    return result
+
+
+def bump(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # No generation, so nothing cached under it either.
+            pass
+
+
+def invalidate(user_ids):
+    """
+    Moves the dashboards of ``user_ids`` to a new generation once the
+    transaction commits. A dashboard built meanwhile from the rows as
+    they were before is cached under the old one, which nobody reads.
+    """
+    keys = [generation_key(user_id) for user_id in set(user_ids) if user_id is not None]
+    if keys:
+        transaction.on_commit(lambda: bump(keys))
+
+
+def stash(instance):
+    row = stored.row(instance)
+    instance._dashboard_previous = row["responsible_id"] if row is not None else None
+
+
+def saved(instance):
+    invalidate([instance.__dict__.pop("_dashboard_previous", None), instance.responsible_id])
+
+
+def deleted(instance):
+    invalidate([instance.responsible_id])
@@ -0,0 +1,132 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.encoding import escape_uri_path
+from django.utils.http import http_date
+
+from .storage import digest_of
+
+RANGE_RE = re.compile(r"^bytes=(?P<start>\d*)-(?P<end>\d*)$")
+CHUNK_SIZE = 64 * 1024
+
+
+class RangeFile(object):
+    """
+    File-like view of ``length`` bytes of ``file`` from ``start``. It has
+    no fileno(), so WSGI servers read it instead of sending the whole file.
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.file.seek(start)
+        self.remaining = length
+
+    def read(self, size=CHUNK_SIZE):
+        data = self.file.read(min(size, self.remaining))
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def etag(name, path):
+    """
+    The content digest of content-addressed files, the size and
+    modification time of others.
+    """
+    digest = digest_of(name)
+    if digest is not None:
+        return '"{}"'.format(digest)
+    stat = os.stat(path)
+    return 'W/"{:x}-{:x}"'.format(stat.st_size, int(stat.st_mtime))
+
+
+def parse_range(header, size):
+    """
+    (start, end) of a single byte range, None for a missing or multiple
+    range, which is answered with the whole file, and False when the
+    range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header or "")
+    if match is None:
+        return None
+    start, end = match.group("start"), match.group("end")
+    if not start:
+        if not end or not int(end):
+            return False
+        return max(size - int(end), 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start > end:
+        return False
+    return start, end
+
+
+def disposition(name):
+    filename = os.path.basename(name)
+    return "attachment; filename=\"{}\"; filename*=UTF-8''{}".format(
+        filename.encode("ascii", "replace").decode("ascii").replace('"', ""), escape_uri_path(filename)
+    )
+
+
+def offload(response, path):
+    """
+    Hands the transfer to the front-end server when CORE_SENDFILE_HEADER is
+    set: X-Sendfile takes the file path, X-Accel-Redirect the path below
+    CORE_SENDFILE_URL, an internal location of nginx mapped to MEDIA_ROOT.
+    """
+    header = getattr(settings, "CORE_SENDFILE_HEADER", None)
+    if header == "X-Accel-Redirect":
+        relative = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, "/")
+        response[header] = escape_uri_path(settings.CORE_SENDFILE_URL + relative)
+    else:
+        response[header] = path
+    return response
+
+
+def serve(request, field_file):
+    """
+    Response downloading ``field_file``. Conditional and range requests are
+    answered here; the bytes are sent by the front-end server if it is
+    configured to, otherwise by FileResponse, which lets the WSGI server
+    use sendfile() for whole files.
+    """
+    path = field_file.path
+    stat = os.stat(path)
+    tag = etag(field_file.name, path)
+    if tag in [value.strip() for value in request.META.get("HTTP_IF_NONE_MATCH", "").split(",")]:
+        response = HttpResponseNotModified()
+        response["ETag"] = tag
+        return response
+    content_type, encoding = mimetypes.guess_type(field_file.name)
+    if content_type is None or encoding is not None:
+        content_type = "application/octet-stream"
+    if getattr(settings, "CORE_SENDFILE_HEADER", None):
+        response = offload(HttpResponse(content_type=content_type), path)
+    else:
+        byte_range = None
+        if request.META.get("HTTP_IF_RANGE", tag) == tag:
+            byte_range = parse_range(request.META.get("HTTP_RANGE"), stat.st_size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = "bytes */{}".format(stat.st_size)
+            return response
+        file = open(path, "rb")
+        if byte_range is None:
+            response = FileResponse(file, content_type=content_type)
+            response["Content-Length"] = stat.st_size
+        else:
+            start, end = byte_range
+            response = FileResponse(RangeFile(file, start, end - start + 1), status=206, content_type=content_type)
+            response["Content-Length"] = end - start + 1
+            response["Content-Range"] = "bytes {}-{}/{}".format(start, end, stat.st_size)
+        response["Accept-Ranges"] = "bytes"
+    response["ETag"] = tag
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    response["Content-Disposition"] = disposition(field_file.name)
+    response["Cache-Control"] = "private"
+    return response
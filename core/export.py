@@ -0,0 +1,97 @@
+import csv
+import json
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils.encoding import force_text
+from django.utils.translation import ugettext_lazy as _
+
+from . import replicas
+
+CHUNK_SIZE = 2000
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+}
+
+
+class Echo(object):
+    def write(self, value):
+        return value
+
+
+def export_fields(model):
+    return [field for field in model._meta.concrete_fields if not (field.primary_key and field.is_relation)]
+
+
+def render(field, obj):
+    """
+    Value of ``field`` as shown to people: labels for choices, the string
+    form of related objects.
+    """
+    if field.is_relation:
+        related = getattr(obj, field.name)
+        return None if related is None else force_text(related)
+    value = getattr(obj, field.attname)
+    if field.choices and value is not None:
+        return force_text(dict(field.flatchoices).get(value, value))
+    if isinstance(value, Decimal):
+        return "{:f}".format(value)
+    return value
+
+
+def iterate(queryset, chunk_size=CHUNK_SIZE):
+    """
+    Walks ``queryset`` by primary key in chunks of ``chunk_size`` rows, so
+    memory stays flat whether or not the backend streams cursors.
+    """
+    related = [field.name for field in export_fields(queryset.model) if field.many_to_one]
+    queryset = queryset.select_related(*related).order_by("pk")
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        chunk = list(chunk[:chunk_size])
+        for obj in chunk:
+            yield obj
+        if len(chunk) < chunk_size:
+            return
+        last_pk = chunk[-1].pk
+
+
+def csv_rows(queryset):
+    fields = export_fields(queryset.model)
+    writer = csv.writer(Echo())
+    yield writer.writerow([force_text(field.verbose_name) for field in fields])
+    for obj in iterate(queryset):
+        yield writer.writerow(["" if value is None else force_text(value) for value in
+                               (render(field, obj) for field in fields)])
+
+
+def jsonl_rows(queryset):
+    fields = export_fields(queryset.model)
+    for obj in iterate(queryset):
+        yield json.dumps(
+            dict((field.name, render(field, obj)) for field in fields),
+            cls=DjangoJSONEncoder, ensure_ascii=False
+        ) + "\n"
+
+
+def export_response(queryset, format):
+    rows = csv_rows(queryset) if format == "csv" else jsonl_rows(queryset)
+    response = StreamingHttpResponse(rows, content_type=CONTENT_TYPES[format])
+    response["Content-Disposition"] = 'attachment; filename="{}.{}"'.format(
+        queryset.model._meta.model_name, format
+    )
+    return response
+
+
+def export_csv(modeladmin, request, queryset):
+    return export_response(queryset.using(replicas.choose(request)), "csv")
+export_csv.short_description = _("Экспорт выбранных в CSV")
+
+
+def export_jsonl(modeladmin, request, queryset):
+    return export_response(queryset.using(replicas.choose(request)), "jsonl")
+export_jsonl.short_description = _("Экспорт выбранных в JSONL")
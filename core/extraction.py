@@ -0,0 +1,137 @@
+import os
+import re
+import zipfile
+import zlib
+from xml.etree import ElementTree
+
+try:
+    from pdfminer.high_level import extract_text as pdfminer_extract_text
+except ImportError:
+    pdfminer_extract_text = None
+
+MAX_TEXT_LENGTH = 1024 * 1024
+TEXT_ENCODINGS = ("utf-8", "cp1251", "latin-1")
+
+TEXT_EXTENSIONS = (".txt", ".csv", ".md", ".rtf", ".htm", ".html", ".xml")
+XML_MEMBERS = {
+    ".docx": ("word/document.xml", ),
+    ".odt": ("content.xml", ),
+    ".xlsx": ("xl/sharedStrings.xml", ),
+}
+
+TAG_RE = re.compile(r"<[^>]+>")
+SPACES_RE = re.compile(r"\s+", re.UNICODE)
+PDF_STREAM_RE = re.compile(rb"<<(.*?)>>\s*stream\r?\n(.*?)\r?\nendstream", re.DOTALL)
+PDF_STRING_RE = re.compile(rb"\((?:\\.|[^\\)])*\)\s*(?:Tj|'|\")|\[(?:[^\]\\]|\\.)*\]\s*TJ", re.DOTALL)
+PDF_LITERAL_RE = re.compile(rb"\(((?:\\.|[^\\)])*)\)", re.DOTALL)
+PDF_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f"}
+
+
+class ExtractionError(Exception):
+    pass
+
+
+def decode(data):
+    for encoding in TEXT_ENCODINGS:
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+
+
+def extract_plain(path):
+    with open(path, "rb") as source:
+        text = decode(source.read(MAX_TEXT_LENGTH * 4))
+    return TAG_RE.sub(" ", text) if path.lower().endswith((".htm", ".html", ".xml")) else text
+
+
+def extract_xml(path, members):
+    """
+    Text of the XML ``members`` of an office document archive.
+    """
+    parts = []
+    try:
+        with zipfile.ZipFile(path) as archive:
+            for member in members:
+                try:
+                    root = ElementTree.fromstring(archive.read(member))
+                except KeyError:
+                    continue
+                for paragraph in root.iter():
+                    if paragraph.text:
+                        parts.append(paragraph.text)
+                    if paragraph.tag.endswith(("}p", "}br", "}tab", "}si")):
+                        parts.append("\n")
+    except (zipfile.BadZipFile, ElementTree.ParseError) as e:
+        raise ExtractionError(str(e))
+    return "".join(parts)
+
+
+def pdf_unescape(literal):
+    def replace(match):
+        escaped = match.group(1)
+        if escaped[:1].isdigit():
+            return bytes((int(escaped, 8) & 0xff, ))
+        return PDF_ESCAPES.get(escaped, escaped)
+    return re.sub(rb"\\([0-7]{1,3}|.)", replace, literal, flags=re.DOTALL)
+
+
+def extract_pdf(path):
+    """
+    Text of a PDF through pdfminer when it is installed. Otherwise, the
+    string operands of the text operators of its plain and Flate-encoded
+    content streams, which covers PDFs produced by office suites with
+    standard fonts but not those with embedded font encodings.
+    """
+    if pdfminer_extract_text is not None:
+        try:
+            return pdfminer_extract_text(path)
+        except Exception as e:
+            raise ExtractionError(str(e))
+    with open(path, "rb") as source:
+        data = source.read()
+    parts = []
+    for dictionary, stream in PDF_STREAM_RE.findall(data):
+        if b"/FlateDecode" in dictionary:
+            try:
+                stream = zlib.decompress(stream)
+            except zlib.error:
+                continue
+        elif b"/Filter" in dictionary:
+            continue
+        for operation in PDF_STRING_RE.findall(stream):
+            parts.append(b"".join(pdf_unescape(literal) for literal in PDF_LITERAL_RE.findall(operation)))
+            parts.append(b" ")
+    return decode(b"".join(parts))
+
+
+def extract(path, filename=None):
+    """
+    Text of the file at ``path`` by the extension of ``filename``,
+    whitespace collapsed and cut at MAX_TEXT_LENGTH. Returns None for
+    formats it has no extractor for.
+    """
+    extension = os.path.splitext(filename or path)[1].lower()
+    if extension in TEXT_EXTENSIONS:
+        text = extract_plain(path)
+    elif extension in XML_MEMBERS:
+        text = extract_xml(path, XML_MEMBERS[extension])
+    elif extension == ".pdf":
+        text = extract_pdf(path)
+    else:
+        return None
+    return SPACES_RE.sub(" ", text or "").strip()[:MAX_TEXT_LENGTH]
+
+
+def extract_job(job):
+    """
+    Pool entry point: ``job`` is (digest, path, filename, media root), the
+    result (digest, text, error).
+    """
+    digest, path, filename, root = job
+    try:
+        return digest, extract(path, filename), None
+    except (ExtractionError, OSError) as e:
+        return digest, None, str(e) or e.__class__.__name__
+    except Exception as e:
+        return digest, None, "{}: {}".format(e.__class__.__name__, e)
@@ -0,0 +1,28 @@
+from django.db import DatabaseError, connections
+
+
+def check_connections(**kwargs):
+    """
+    Closes the persistent connections of the current thread the server
+    dropped while they sat idle, so that the request reconnects rather
+    than fail on its first query. Django only checks them after errors.
+    """
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        if connection.settings_dict.get("CONN_HEALTH_CHECKS") and not connection.is_usable():
+            connection.close()
+
+
+def unreachable():
+    """
+    Aliases of the databases that do not answer a query.
+    """
+    result = []
+    for alias in connections:
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute("SELECT 1")
+        except DatabaseError:
+            result.append(alias)
+    return result
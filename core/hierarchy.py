@@ -0,0 +1,105 @@
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.utils.translation import ugettext_lazy as _
+
+from . import stored
+from .models import Contractor, ContractorClosure
+
+TABLE = ContractorClosure._meta.db_table
+
+
+def stash(contractor):
+    """
+    Remembers the stored parent of ``contractor`` and refuses parents that
+    would close a cycle.
+    """
+    if contractor.pk is None:
+        return
+    row = stored.row(contractor)
+    parent_id = row["parent_id"] if row is not None else None
+    contractor._hierarchy_parent = parent_id
+    if contractor.parent_id is not None and contractor.parent_id != parent_id and (
+            contractor.parent_id == contractor.pk or
+            ContractorClosure.objects.filter(ancestor_id=contractor.pk, descendant_id=contractor.parent_id).exists()):
+        raise ValidationError(_("контрагент не может состоять в своём подразделении."))
+
+
+def attach(pk, parent_id):
+    """
+    Links every ancestor of ``parent_id`` to every node of the subtree
+    rooted at ``pk`` in a single INSERT ... SELECT.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO {table} (ancestor_id, descendant_id, depth)"
+            " SELECT a.ancestor_id, d.descendant_id, a.depth + d.depth + 1"
+            " FROM {table} a, {table} d WHERE a.descendant_id = %s AND d.ancestor_id = %s".format(table=TABLE),
+            [parent_id, pk]
+        )
+
+
+def detach(pk):
+    """
+    Drops the links between the subtree rooted at ``pk`` and the nodes
+    above it.
+    """
+    subtree = ContractorClosure.objects.filter(ancestor_id=pk).values("descendant_id")
+    ContractorClosure.objects.filter(descendant_id__in=subtree).exclude(ancestor_id__in=subtree).delete()
+
+
+def saved(contractor, created):
+    if created:
+        with transaction.atomic():
+            ContractorClosure.objects.create(ancestor_id=contractor.pk, descendant_id=contractor.pk, depth=0)
+            if contractor.parent_id is not None:
+                attach(contractor.pk, contractor.parent_id)
+        return
+    if contractor.parent_id == getattr(contractor, "_hierarchy_parent", contractor.parent_id):
+        return
+    with transaction.atomic():
+        detach(contractor.pk)
+        if contractor.parent_id is not None:
+            attach(contractor.pk, contractor.parent_id)
+
+
+def added(contractors):
+    """
+    Closure rows of ``contractors`` inserted without signals, such as by
+    bulk_create, parents listed before their children.
+    """
+    ContractorClosure.objects.bulk_create(
+        ContractorClosure(ancestor_id=contractor.pk, descendant_id=contractor.pk, depth=0)
+        for contractor in contractors
+    )
+    for contractor in contractors:
+        if contractor.parent_id is not None:
+            attach(contractor.pk, contractor.parent_id)
+
+
+def rebuild():
+    """
+    Recomputes the closure table from Contractor.parent level by level,
+    one INSERT ... SELECT per level of the hierarchy.
+    """
+    with transaction.atomic():
+        ContractorClosure.objects.all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO {table} (ancestor_id, descendant_id, depth) SELECT id, id, 0 FROM {contractor}".format(
+                    table=TABLE, contractor=Contractor._meta.db_table
+                )
+            )
+            depth = 0
+            while True:
+                cursor.execute(
+                    "INSERT INTO {table} (ancestor_id, descendant_id, depth)"
+                    " SELECT c.parent_id, l.descendant_id, l.depth + 1"
+                    " FROM {table} l JOIN {contractor} c ON c.id = l.ancestor_id"
+                    " WHERE l.depth = %s AND c.parent_id IS NOT NULL".format(
+                        table=TABLE, contractor=Contractor._meta.db_table
+                    ),
+                    [depth]
+                )
+                if not cursor.rowcount:
+                    break
+                depth += 1
@@ -0,0 +1,291 @@
+import collections
+import csv
+import json
+import time
+
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from . import search, counts, facets, hierarchy
+from .addresses import address_key, normalize_zipcode
+from .models import Contractor, Contact, EmailToContractor, Address, ImportBatch
+
+ADDRESS_FIELDS = ("zipcode", "country", "region", "city", "street")
+
+
+def read_records(stream, format):
+    """
+    Yields the records of a CSV or JSONL stream as dicts. CSV rows keep a
+    single address in ``address_<field>`` columns and ``;``-separated emails.
+    """
+    if format == "jsonl":
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+        return
+    for row in csv.DictReader(stream):
+        record = dict(row)
+        address = dict(
+            (name, record.pop("address_" + name, None)) for name in ADDRESS_FIELDS
+        )
+        record["addresses"] = [address] if any(address.values()) else []
+        yield record
+
+
+def split_emails(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(";")
+    return [email.strip() for email in value if email and email.strip()]
+
+
+def plain_fields(model):
+    skip = {"id", "created_by", "created_at", "updated_by", "updated_at", "primary_email", "primary_address"}
+    return dict(
+        (field.name, field) for field in model._meta.concrete_fields
+        if field.name not in skip and not field.is_relation
+    )
+
+
+def field_value(field, value):
+    if value in (None, ""):
+        return None if field.null else ""
+    return field.to_python(value)
+
+
+class Checkpoint(object):
+    """
+    Journal of committed batches under the name ``name``: the number of
+    records consumed so far and the legacy ids of the contractors created,
+    so that contacts imported after a restart still find their contractor.
+    Each batch is journaled in its own transaction, so a crash never
+    leaves a committed batch unrecorded.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.position = 0
+        self.contractors = {}
+        for position, contractors in ImportBatch.objects.filter(checkpoint=name).order_by(
+            "position"
+        ).values_list("position", "contractors").iterator():
+            self.position = position
+            self.contractors.update(json.loads(contractors))
+
+    def commit(self, position, contractors):
+        ImportBatch.objects.create(checkpoint=self.name, position=position, contractors=json.dumps(contractors))
+        self.position = position
+        self.contractors.update(contractors)
+
+
+class Ids(object):
+    """
+    Primary keys for new rows of ``model``. On PostgreSQL they are drawn
+    from its sequence ``block`` at a time, so that rows inserted meanwhile
+    by others, or after a crash, never collide with them. Elsewhere the
+    backend moves past explicit keys by itself and they follow MAX(pk),
+    read again by renew() in the transaction of each batch.
+    """
+
+    def __init__(self, model, block):
+        self.model = model
+        self.block = block
+        self.free = collections.deque()
+        self.start = None
+
+    def renew(self):
+        if connection.vendor != "postgresql":
+            self.free.clear()
+            self.start = None
+
+    def fetch(self):
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)",
+                    [self.model._meta.db_table, self.model._meta.pk.column, self.block]
+                )
+                return [row[0] for row in cursor.fetchall()]
+        if self.start is None:
+            self.start = (self.model.objects.aggregate(last=models.Max("pk"))["last"] or 0) + 1
+        self.start += self.block
+        return range(self.start - self.block, self.start)
+
+    def take(self):
+        if not self.free:
+            self.free.extend(self.fetch())
+        return self.free.popleft()
+
+
+class CrmImporter(object):
+    """
+    Loads contractors and contacts in ``bulk_create`` batches. Emails and
+    addresses are deduplicated against an in-memory map of the existing
+    rows, addresses by their canonical key. Django 1.9 does not return the
+    keys of bulk inserted rows, so the importer allocates them itself, see
+    Ids.
+    """
+
+    def __init__(self, user, checkpoint, batch_size=1000, report=None):
+        self.user = user
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+        self.report = report or (lambda message: None)
+        self.contractor_fields = plain_fields(Contractor)
+        self.contact_fields = plain_fields(Contact)
+        self.emails = dict(
+            (email.lower(), pk) for pk, email in EmailToContractor.objects.values_list("pk", "email").iterator()
+        )
+        self.addresses = dict(Address.objects.exclude(key=None).values_list("key", "pk").iterator())
+        self.ids = dict((model, Ids(model, batch_size)) for model in (EmailToContractor, Address, Contractor, Contact))
+
+    def run(self, records):
+        started = time.time()
+        resumed = self.checkpoint.position
+        position = 0
+        batch = []
+        for record in records:
+            position += 1
+            if position <= self.checkpoint.position:
+                continue
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                self.write(batch, position)
+                batch = []
+                self.progress(position, resumed, started)
+        if batch:
+            self.write(batch, position)
+            self.progress(position, resumed, started)
+        self.reset_sequences()
+        return position
+
+    def progress(self, position, resumed, started):
+        elapsed = max(time.time() - started, 1e-6)
+        self.report("{} records, {:.0f} rows/s".format(position, (position - resumed) / elapsed))
+
+    def stamp(self, obj, pk):
+        obj.pk = pk
+        obj.created_by = obj.updated_by = self.user
+        obj.created_at = obj.updated_at = self.now
+        return obj
+
+    def resolve_emails(self, values):
+        pks = []
+        for email in split_emails(values):
+            key = email.lower()
+            if key not in self.emails:
+                self.emails[key] = self.ids[EmailToContractor].take()
+                self.new_emails.append(self.stamp(EmailToContractor(email=email), self.emails[key]))
+            if self.emails[key] not in pks:
+                pks.append(self.emails[key])
+        return pks
+
+    def resolve_addresses(self, values):
+        pks = []
+        for address in values or ():
+            address = dict(address, zipcode=normalize_zipcode(address.get("zipcode")))
+            key = address_key(address)
+            if key not in self.addresses:
+                fields = dict(
+                    (name, field_value(Address._meta.get_field(name), address.get(name))) for name in ADDRESS_FIELDS
+                )
+                self.addresses[key] = self.ids[Address].take()
+                self.new_addresses.append(self.stamp(Address(key=key, **fields), self.addresses[key]))
+            if self.addresses[key] not in pks:
+                pks.append(self.addresses[key])
+        return pks
+
+    def build(self, model, fields, record, pk):
+        values = dict(
+            (name, field_value(field, record[name])) for name, field in fields.items() if name in record
+        )
+        obj = self.stamp(model(**values), pk)
+        emails = self.resolve_emails(record.get("emails"))
+        addresses = self.resolve_addresses(record.get("addresses"))
+        obj.primary_email_id = emails[0] if emails else None
+        obj.primary_address_id = addresses[0] if addresses else None
+        return obj, emails, addresses
+
+    def write(self, batch, position):
+        self.now = timezone.now()
+        self.new_emails, self.new_addresses = [], []
+        contractors, contacts = [], []
+        links = {Contractor: ([], []), Contact: ([], [])}
+        created = {}
+        with transaction.atomic():
+            for ids in self.ids.values():
+                ids.renew()
+            for record in batch:
+                if record.get("type") == "contractor":
+                    obj, emails, addresses = self.build(
+                        Contractor, self.contractor_fields, record, self.ids[Contractor].take()
+                    )
+                    obj.parent_id = self.contractor_id(record.get("parent"), created)
+                    if record.get("id"):
+                        created[str(record["id"])] = obj.pk
+                    contractors.append(obj)
+                else:
+                    obj, emails, addresses = self.build(Contact, self.contact_fields, record, self.ids[Contact].take())
+                    obj.contractor_id = self.contractor_id(record.get("contractor"), created)
+                    contacts.append(obj)
+                links[type(obj)][0].extend((obj.pk, pk) for pk in emails)
+                links[type(obj)][1].extend((obj.pk, pk) for pk in addresses)
+            EmailToContractor.objects.bulk_create(self.new_emails)
+            Address.objects.bulk_create(self.new_addresses)
+            Contractor.objects.bulk_create(contractors)
+            Contact.objects.bulk_create(contacts)
+            hierarchy.added(contractors)
+            counts.add(Contractor, len(contractors))
+            counts.add(Contact, len(contacts))
+            facets.added(Address, self.new_addresses)
+            facets.added(Contractor, contractors)
+            facets.added(Contact, contacts)
+            for model, (emails, addresses) in links.items():
+                self.link(model, "emails", emails)
+                self.link(model, "addresses", addresses)
+            self.index(Address, self.new_addresses)
+            self.index(Contractor, contractors)
+            self.index(Contact, contacts)
+            self.checkpoint.commit(position, created)
+
+    def contractor_id(self, legacy, created):
+        """
+        Key of the contractor imported with the legacy id ``legacy``, earlier
+        in this batch or in a committed one.
+        """
+        if not legacy:
+            return None
+        return created.get(str(legacy)) or self.checkpoint.contractors.get(str(legacy))
+
+    def link(self, model, name, pairs):
+        field = model._meta.get_field(name)
+        through = field.remote_field.through
+        through.objects.bulk_create([
+            through(**{field.m2m_field_name() + "_id": owner, field.m2m_reverse_field_name() + "_id": target})
+            for owner, target in pairs
+        ])
+
+    def index(self, model, objs):
+        index = search.indexed(model)
+        if index is None or not objs:
+            return
+        instances = model.objects.filter(pk__in=[obj.pk for obj in objs]).prefetch_related(*index.related)
+        search.get_backend().update(index, instances)
+
+    def reset_sequences(self):
+        """
+        Moves the sequences past the keys taken from MAX(pk), which only
+        backends that do not follow explicit keys need.
+        """
+        if connection.vendor == "postgresql":
+            return
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [EmailToContractor, Address, Contractor, Contact]
+        )
+        if statements:
+            with connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
@@ -0,0 +1,202 @@
+import heapq
+import math
+from datetime import datetime, time, timedelta
+from functools import reduce
+from itertools import groupby, islice
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import PhoneCall, Meeting, Task, BusyInterval
+
+MODELS = (PhoneCall, Meeting, Task)
+FREE_STATUSES = {
+    PhoneCall: ("not held", ),
+    Meeting: ("not held", ),
+    Task: ("Deferred", ),
+}
+SPAN_LEVELS = (3600, 24 * 3600, 7 * 24 * 3600)
+FIELDS = ("name", "responsible", "starting_datetime", "finishing_datetime", "status")
+BATCH_SIZE = 500
+
+
+def label(model):
+    return model._meta.label_lower
+
+
+def level(span):
+    """
+    Index of the first of SPAN_LEVELS ``span`` fits in, the number of them
+    for longer spans.
+    """
+    for number, bound in enumerate(SPAN_LEVELS):
+        if span <= bound:
+            return number
+    return len(SPAN_LEVELS)
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def moment(value):
+    """
+    Aware datetime of an ISO datetime or date, taken in the current time
+    zone unless it has an offset. None if ``value`` is neither.
+    """
+    try:
+        parsed = parse_datetime(value or "")
+        if parsed is None:
+            day = parse_date(value or "")
+            return day_start(day) if day is not None else None
+    except ValueError:
+        return None
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def busy(instance):
+    """
+    Whether ``instance`` takes the time of its responsible.
+    """
+    return (
+        instance.responsible_id is not None and
+        instance.finishing_datetime > instance.starting_datetime and
+        instance.status not in FREE_STATUSES[instance._meta.concrete_model]
+    )
+
+
+def values(instance):
+    span = int(math.ceil((instance.finishing_datetime - instance.starting_datetime).total_seconds()))
+    return dict(
+        user_id=instance.responsible_id,
+        name=instance.name,
+        start=instance.starting_datetime,
+        finish=instance.finishing_datetime,
+        span=span,
+        level=level(span),
+    )
+
+
+def saved(instance):
+    key = dict(model=label(instance._meta.concrete_model), object_id=instance.pk)
+    if busy(instance):
+        BusyInterval.objects.update_or_create(defaults=values(instance), **key)
+    else:
+        BusyInterval.objects.filter(**key).delete()
+
+
+def deleted(instance):
+    BusyInterval.objects.filter(model=label(instance._meta.concrete_model), object_id=instance.pk).delete()
+
+
+def create(model, instances):
+    """
+    Creates the intervals of the busy ones of ``instances``, BATCH_SIZE at
+    a time so no more than that are held in memory.
+    """
+    intervals = (
+        BusyInterval(model=label(model), object_id=instance.pk, **values(instance))
+        for instance in instances if busy(instance)
+    )
+    batch = list(islice(intervals, BATCH_SIZE))
+    while batch:
+        BusyInterval.objects.bulk_create(batch)
+        batch = list(islice(intervals, BATCH_SIZE))
+
+
+def refreshed(model, pks):
+    """
+    Recomputes the intervals of the rows of ``model`` with ``pks``, after
+    an UPDATE that sent no signals.
+    """
+    pks = list(pks)
+    with transaction.atomic():
+        for start in range(0, len(pks), BATCH_SIZE):
+            batch = pks[start:start + BATCH_SIZE]
+            BusyInterval.objects.filter(model=label(model), object_id__in=batch).delete()
+            create(model, model._default_manager.filter(pk__in=batch).only(*FIELDS).iterator())
+
+
+def overlapping(users, start, finish):
+    """
+    Intervals of ``users`` overlapping the period from ``start`` to
+    ``finish``. Each level is scanned from its longest span before
+    ``start``, so a few long tasks do not widen the scan of the short
+    calls and meetings that make up most of the table.
+    """
+    bounds = list(SPAN_LEVELS)
+    bounds.append(BusyInterval.objects.filter(level=len(SPAN_LEVELS)).aggregate(span=Max("span"))["span"])
+    ranges = [
+        Q(level=number, start__gte=start - timedelta(seconds=bound))
+        for number, bound in enumerate(bounds) if bound is not None
+    ]
+    return BusyInterval.objects.filter(
+        reduce(or_, ranges), user__in=users, start__lt=finish, finish__gt=start
+    )
+
+
+def conflicts(instance):
+    """
+    Intervals of the responsible of ``instance`` overlapping it.
+    """
+    if instance.pk is None or not busy(instance):
+        return BusyInterval.objects.none()
+    return overlapping(
+        [instance.responsible_id], instance.starting_datetime, instance.finishing_datetime
+    ).exclude(model=label(instance._meta.concrete_model), object_id=instance.pk).order_by("start")
+
+
+def sweep(intervals, start, finish):
+    """
+    Busy periods, free periods and overlapping pairs of ``intervals`` of
+    one user, sorted by start, within ``start`` and ``finish``. A heap of
+    the intervals still running holds the ones each next interval
+    overlaps.
+    """
+    busy_periods, free_periods, pairs = [], [], []
+    running = []
+    for number, interval in enumerate(intervals):
+        while running and running[0][0] <= interval.start:
+            heapq.heappop(running)
+        pairs.extend((other, interval) for finished, order, other in running)
+        heapq.heappush(running, (interval.finish, number, interval))
+        period_start, period_finish = max(interval.start, start), min(interval.finish, finish)
+        if busy_periods and period_start <= busy_periods[-1][1]:
+            busy_periods[-1][1] = max(busy_periods[-1][1], period_finish)
+        else:
+            busy_periods.append([period_start, period_finish])
+    cursor = start
+    for period_start, period_finish in busy_periods:
+        if period_start > cursor:
+            free_periods.append((cursor, period_start))
+        cursor = period_finish
+    if cursor < finish:
+        free_periods.append((cursor, finish))
+    return [tuple(period) for period in busy_periods], free_periods, pairs
+
+
+def free_busy(users, start, finish):
+    """
+    Maps each of ``users`` to its intervals, busy and free periods and
+    conflicting pairs of intervals between ``start`` and ``finish``, read
+    in one pass over a single query for all of them.
+    """
+    result = dict(
+        (user, dict(intervals=[], busy=[], free=[(start, finish)], conflicts=[])) for user in users
+    )
+    rows = overlapping(users, start, finish).order_by("user", "start", "finish")
+    for user, intervals in groupby(rows.iterator(), key=lambda interval: interval.user_id):
+        intervals = list(intervals)
+        busy_periods, free_periods, pairs = sweep(intervals, start, finish)
+        result[user] = dict(intervals=intervals, busy=busy_periods, free=free_periods, conflicts=pairs)
+    return result
+
+
+def rebuild():
+    with transaction.atomic():
+        BusyInterval.objects.all().delete()
+        for model in MODELS:
+            create(model, model._default_manager.only(*FIELDS).iterator())
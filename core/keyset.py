@@ -0,0 +1,61 @@
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+def fields(model, ordering):
+    """
+    (field, descending) pairs of the ``ordering`` of ``model``.
+    """
+    result = []
+    for name in ordering:
+        descending = name.startswith("-")
+        name = name.lstrip("-")
+        field = model._meta.pk if name == "pk" else model._meta.get_field(name)
+        result.append((field, descending))
+    return result
+
+
+def encode(obj, ordering):
+    """
+    Cursor of ``obj``: the values of its ``ordering`` fields.
+    """
+    return json.dumps([field.value_to_string(obj) for field, descending in fields(type(obj), ordering)])
+
+
+def decode(model, ordering, cursor):
+    """
+    Values of the ``ordering`` fields in ``cursor``, None if it is not a
+    cursor for them.
+    """
+    try:
+        values = json.loads(cursor)
+        pairs = fields(model, ordering)
+        if not isinstance(values, list) or len(values) != len(pairs):
+            return None
+        return [field.to_python(value) for (field, descending), value in zip(pairs, values)]
+    except (ValueError, TypeError, ValidationError):
+        return None
+
+
+def seek(model, ordering, values, backwards=False):
+    """
+    Condition selecting the rows after ``values`` in ``ordering``, or
+    before them if ``backwards``, which an index on the ordering fields
+    answers with a range scan whatever the position. The OR of the
+    tie-breaks alone is no range, so the first field is also bounded on
+    its own, which the database seeks to.
+    """
+    pairs = fields(model, ordering)
+    conditions = []
+    equal = Q()
+    for (field, descending), value in zip(pairs, values):
+        lookup = "__lt" if descending != backwards else "__gt"
+        conditions.append(equal & Q(**{field.name + lookup: value}))
+        equal &= Q(**{field.name: value})
+    (field, descending), value = pairs[0], values[0]
+    bound = Q(**{field.name + ("__lte" if descending != backwards else "__gte"): value})
+    return bound & reduce(or_, conditions)
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+
+class QueueCommand(BaseCommand):
+    """
+    Works through ``queue``, a core.queues.DigestQueue, once or polling it
+    with --watch. ``done`` describes what was done to the ``noun`` items.
+    Commands over another queue override process(), and backfill() unless
+    ``backfill_help`` is None.
+    """
+    queue = None
+    noun = "attachments"
+    done = "processed"
+    workers_help = "worker processes, one per CPU by default"
+    backfill_help = "first queue attachments stored before"
+
+    def add_arguments(self, parser):
+        if self.backfill_help is not None:
+            parser.add_argument("--backfill", action="store_true", help=self.backfill_help)
+        parser.add_argument("--workers", type=int, default=None, help=self.workers_help)
+        parser.add_argument("--batch-size", type=int, default=None, help="items per batch, the queue's by default")
+        parser.add_argument("--watch", type=float, default=0, help="keep polling the queue every this many seconds")
+
+    def process(self, workers, batch_size):
+        return self.queue.process(workers=workers, batch_size=batch_size)
+
+    def backfill(self):
+        return self.queue.backfill()
+
+    def handle(self, *args, **options):
+        if options.get("backfill"):
+            self.stdout.write("{} {} queued".format(self.backfill(), self.noun))
+        while True:
+            processed = self.process(options["workers"], options["batch_size"])
+            if processed or not options["watch"]:
+                self.stdout.write("{} {} {}".format(processed, self.noun, self.done))
+            if not options["watch"]:
+                return
+            close_old_connections()
+            time.sleep(options["watch"])
@@ -0,0 +1,147 @@
+import threading
+import time
+from importlib import import_module
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.core.urlresolvers import reverse
+from django.db import connections
+
+HOT_PATHS = (
+    "admin:core_contact_changelist",
+    "admin:core_task_changelist",
+    "admin:core_deal_changelist",
+    "admin:core_phonecall_changelist",
+    "admin:core_deal_report",
+    "core_my_work",
+)
+
+
+def numbers(value):
+    try:
+        return [int(item) for item in value.split(",")]
+    except ValueError:
+        raise CommandError("expected comma separated numbers, got {}".format(value))
+
+
+def host():
+    for name in settings.ALLOWED_HOSTS:
+        if name != "*":
+            return name.lstrip(".")
+    return "localhost"
+
+
+def session_cookie(user):
+    """
+    Cookie header of a new session logged in as ``user``.
+    """
+    session = import_module(settings.SESSION_ENGINE).SessionStore()
+    session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    return "{}={}".format(settings.SESSION_COOKIE_NAME, session.session_key)
+
+
+def get(handler, path, cookie):
+    """
+    Status code of a GET of ``path`` through ``handler`` as a WSGI server
+    makes it: request_started and request_finished fire, and with them
+    the connection handling of CONN_MAX_AGE.
+    """
+    environ = {"PATH_INFO": path, "HTTP_HOST": host(), "HTTP_COOKIE": cookie}
+    setup_testing_defaults(environ)
+    statuses = []
+    response = handler(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    try:
+        for chunk in response:
+            pass
+    finally:
+        response.close()
+    return int(statuses[0].split()[0])
+
+
+def percentile(timings, share):
+    return timings[int(share * (len(timings) - 1))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Times the admin hot paths through the WSGI handler for each connection lifetime and number of "
+        "concurrent clients, each thread keeping its own connection as in a threaded server. Run it once "
+        "per DATABASE_URL to compare backends."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--username", help="user to log in as, the first superuser by default")
+        parser.add_argument("--requests", type=int, default=20, help="requests per path and client")
+        parser.add_argument("--threads", type=numbers, default=[1, 4, 8], help="concurrent clients, e.g. 1,4,8")
+        parser.add_argument("--conn-max-age", type=numbers, default=[0, 60], help="CONN_MAX_AGE values, e.g. 0,60")
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(is_superuser=True).order_by("pk")
+        if options["username"]:
+            users = User.objects.filter(username=options["username"])
+        user = users.first()
+        if user is None:
+            raise CommandError("no such user")
+        paths = [reverse(name) for name in HOT_PATHS]
+        connection = connections["default"]
+        self.stdout.write("{} {}".format(connection.vendor, connection.settings_dict["NAME"]))
+        for conn_max_age in options["conn_max_age"]:
+            for threads in options["threads"]:
+                for alias in connections:
+                    connections[alias].settings_dict["CONN_MAX_AGE"] = conn_max_age
+                connections.close_all()
+                started = time.time()
+                timings = self.run(user, paths, threads, options["requests"])
+                elapsed = time.time() - started
+                self.stdout.write("conn_max_age={} threads={}: {:.1f} requests/s".format(
+                    conn_max_age, threads, sum(len(item) for item in timings.values()) / elapsed
+                ))
+                for path in paths:
+                    self.report(path, timings[path])
+
+    def run(self, user, paths, threads, requests):
+        """
+        Maps each of ``paths`` to the seconds its requests took, made by
+        ``threads`` clients at once.
+        """
+        timings = dict((path, []) for path in paths)
+        lock = threading.Lock()
+        errors = []
+        handler = WSGIHandler()
+        cookie = session_cookie(user)
+
+        def client():
+            try:
+                for number in range(requests):
+                    for path in paths:
+                        started = time.time()
+                        status = get(handler, path, cookie)
+                        seconds = time.time() - started
+                        if status != 200:
+                            errors.append("{}: {}".format(path, status))
+                        with lock:
+                            timings[path].append(seconds)
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=client) for number in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        if errors:
+            raise CommandError("failed requests: {}".format(", ".join(sorted(set(errors)))))
+        return timings
+
+    def report(self, path, timings):
+        timings.sort()
+        self.stdout.write("  {}: median {:.1f} ms, p95 {:.1f} ms".format(
+            path, 1000 * percentile(timings, 0.5), 1000 * percentile(timings, 0.95)
+        ))
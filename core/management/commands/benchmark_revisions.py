@@ -0,0 +1,99 @@
+import gzip
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Sum
+
+from core import revisions
+from core.models import DocumentRevision
+
+
+def size_text(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return "{:.1f} {}".format(size, unit)
+        size /= 1024.0
+    return "{:.1f} GB".format(size)
+
+
+class Command(BaseCommand):
+    help = (
+        "Reports the storage saved by delta-compressed document revisions and the time to rebuild them. "
+        "Given files, treats them as successive revisions of one document instead of reading the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("files", nargs="*", help="successive revisions of a document, oldest first")
+        parser.add_argument("--limit", type=int, default=50, help="stored revisions to rebuild")
+
+    def handle(self, *args, **options):
+        if options["files"]:
+            self.benchmark_files(options["files"])
+        else:
+            self.benchmark_stored(options["limit"])
+
+    def report(self, full, stored, timings):
+        self.stdout.write("full copies: {}, stored: {}, saved: {:.1f}%".format(
+            size_text(full), size_text(stored), 100.0 * (full - stored) / full if full else 0
+        ))
+        if timings:
+            timings.sort()
+            self.stdout.write("rebuild of {} revisions: median {:.1f} ms, max {:.1f} ms".format(
+                len(timings), 1000 * timings[len(timings) // 2], 1000 * timings[-1]
+            ))
+
+    def benchmark_stored(self, limit):
+        totals = DocumentRevision.objects.aggregate(full=Sum("size"), stored=Sum("stored_size"))
+        timings = []
+        for revision in DocumentRevision.objects.order_by("-depth", "-pk")[:limit]:
+            started = time.time()
+            with revisions.open_revision(revision) as content:
+                while content.read(revisions.CHUNK_SIZE):
+                    pass
+            timings.append(time.time() - started)
+        self.report(totals["full"] or 0, totals["stored"] or 0, timings)
+
+    def benchmark_files(self, paths):
+        for path in paths:
+            if not os.path.isfile(path):
+                raise CommandError("{} is not a file".format(path))
+        full = stored = 0
+        timings = []
+        with tempfile.TemporaryDirectory() as tmp:
+            keyframe = None
+            deltas = []
+            for number, path in enumerate(paths):
+                size = os.path.getsize(path)
+                full += size
+                delta_size = None
+                if number and len(deltas) + 1 < revisions.KEYFRAME_INTERVAL:
+                    delta_path = os.path.join(tmp, "{}.delta".format(number))
+                    with open(paths[number - 1], "rb") as base, open(path, "rb") as target:
+                        base, target = base.read(), target.read()
+                    started = time.time()
+                    with gzip.open(delta_path, "wb", compresslevel=6) as delta:
+                        revisions.encode(base, target, delta)
+                    encoded = time.time() - started
+                    delta_size = os.path.getsize(delta_path)
+                if delta_size is None or delta_size >= size:
+                    keyframe, deltas = path, []
+                    stored += size
+                    self.stdout.write("{}: full copy, {}".format(path, size_text(size)))
+                    continue
+                deltas.append(delta_path)
+                stored += delta_size
+                started = time.time()
+                current = keyframe
+                for step, delta_path in enumerate(deltas):
+                    out_path = os.path.join(tmp, "rebuilt-{}".format(step % 2))
+                    with gzip.open(delta_path, "rb") as delta, open(current, "rb") as base, \
+                            open(out_path, "wb") as out:
+                        revisions.decode(delta, base, out)
+                    current = out_path
+                timings.append(time.time() - started)
+                self.stdout.write("{}: delta {} of {} ({} deep), encoded in {:.1f} ms, rebuilt in {:.1f} ms".format(
+                    path, size_text(delta_size), size_text(size), len(deltas), 1000 * encoded, 1000 * timings[-1]
+                ))
+        self.report(full, stored, timings)
@@ -0,0 +1,13 @@
+from core import revisions
+from core.management.base import QueueCommand
+
+
+class Command(QueueCommand):
+    help = "Replaces the document revisions saved as full copies with deltas against the previous revision."
+    noun = "revisions"
+    done = "compacted"
+    workers_help = "encoding processes, one per CPU by default"
+    backfill_help = None
+
+    def process(self, workers, batch_size):
+        return revisions.compact(workers, batch_size)
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from core import addresses
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the canonical key of every address and merges duplicates, "
+        "repointing their contractor and contact links."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        merged = addresses.dedupe(batch_size=options["batch_size"], report=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS("{} duplicate addresses merged".format(merged)))
@@ -0,0 +1,13 @@
+from core import contents
+from core.management.base import QueueCommand
+
+
+class Command(QueueCommand):
+    help = "Extracts the text of queued note and document attachments into the search index."
+    queue = contents.queue
+    done = "extracted"
+    workers_help = "extraction processes, one per CPU by default"
+
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+        parser.add_argument("--scan", action="store_true", dest="backfill", help="same as --backfill")
@@ -0,0 +1,16 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from core import blobs
+
+
+class Command(BaseCommand):
+    help = "Deletes attachment blobs that no note or document has referred to for the grace period."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--grace-hours", type=float, default=24)
+
+    def handle(self, *args, **options):
+        freed, size = blobs.collect(grace=datetime.timedelta(hours=options["grace_hours"]))
+        self.stdout.write("{} blobs deleted, {} bytes freed".format(freed, size))
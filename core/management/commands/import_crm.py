@@ -0,0 +1,46 @@
+import io
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importer import Checkpoint, CrmImporter, read_records
+
+
+class Command(BaseCommand):
+    help = (
+        "Streams contractors and contacts from a CSV or JSONL file into the database. "
+        "Every record has a \"type\" (contractor or contact), an optional legacy \"id\", "
+        "the model fields, \"emails\" and \"addresses\"; a contact refers to its contractor "
+        "by the legacy id in \"contractor\", a contractor to its parent by the one in \"parent\", "
+        "listed earlier. Rerunning with the same checkpoint resumes after the last committed batch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="input file, - for stdin")
+        parser.add_argument("--user", required=True, help="username written to created_by/updated_by")
+        parser.add_argument("--format", choices=("csv", "jsonl"), default=None)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--checkpoint", default=None, help="name of the batch journal in the database, <path>.checkpoint by default"
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        format = options["format"] or ("csv" if path.endswith(".csv") else "jsonl")
+        checkpoint_name = options["checkpoint"] or ("import_crm.checkpoint" if path == "-" else path + ".checkpoint")
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError("no user {}".format(options["user"]))
+        checkpoint = Checkpoint(checkpoint_name)
+        if checkpoint.position:
+            self.stdout.write("resuming after record {}".format(checkpoint.position))
+        importer = CrmImporter(user, checkpoint, batch_size=options["batch_size"], report=self.stdout.write)
+        if path == "-":
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline="")
+        else:
+            stream = open(path, encoding="utf-8", newline="")
+        with stream:
+            total = importer.run(read_records(stream, format))
+        self.stdout.write(self.style.SUCCESS("{} records imported".format(total)))
@@ -0,0 +1,99 @@
+from django.contrib import admin
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.admin import PrototypeAdmin
+
+SCAN_MARKERS = {
+    "sqlite": ("SCAN ", ),
+    "postgresql": ("Seq Scan", ),
+}
+SORT_MARKERS = {
+    "sqlite": ("USE TEMP B-TREE", ),
+    "postgresql": ("Sort  (", ),
+}
+INDEXED_MARKERS = ("USING INDEX", "USING COVERING INDEX", "USING INTEGER PRIMARY KEY")
+
+
+def sample_value(model, name):
+    field = model._meta.get_field(name)
+    if field.choices:
+        return field.choices[0][0]
+    if field.is_relation:
+        return 1
+    return ""
+
+
+def changelist_queries(model, model_admin):
+    """
+    Yields (label, queryset, may_scan) for the queries a changelist of
+    ``model_admin`` runs: the bare listing, one per list_filter value and
+    the DISTINCT lookups rendering the filter sidebar. The bare listing is
+    paged with LIMIT, so only an unindexed sort is reported for it.
+    """
+    ordering = tuple(model_admin.get_ordering(None) or ()) + ("-pk", )
+    queryset = model._default_manager.all()
+    yield "list", queryset.order_by(*ordering), True
+    for name in model_admin.list_filter:
+        if not isinstance(name, str):
+            continue
+        value = sample_value(model, name)
+        yield "filter {}".format(name), queryset.filter(**{name: value}).order_by(*ordering), False
+        if not model._meta.get_field(name).is_relation:
+            yield "facet {}".format(name), queryset.values_list(name).distinct().order_by(name), False
+
+
+def explain(connection, sql, params):
+    if connection.vendor == "sqlite":
+        statement = "EXPLAIN QUERY PLAN " + sql
+    elif connection.vendor == "postgresql":
+        statement = "EXPLAIN " + sql
+    else:
+        raise CommandError("EXPLAIN is not supported for {}".format(connection.vendor))
+    with connection.cursor() as cursor:
+        cursor.execute(statement, params)
+        return [str(row[-1]) for row in cursor.fetchall()]
+
+
+def unindexed(vendor, line, may_scan=False):
+    if any(marker in line for marker in INDEXED_MARKERS):
+        return False
+    markers = SORT_MARKERS[vendor]
+    if not may_scan:
+        markers += SCAN_MARKERS[vendor]
+    return any(marker in line for marker in markers)
+
+
+class Command(BaseCommand):
+    help = "Replays admin changelist queries under EXPLAIN and reports scans with no index behind them."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            "--verbose-plans", action="store_true", default=False,
+            help="print every query plan, not only the unindexed ones"
+        )
+
+    def handle(self, *args, **options):
+        alias = options["database"]
+        connection = connections[alias]
+        registry = sorted(admin.site._registry.items(), key=lambda item: item[0]._meta.label)
+        problems = 0
+        for model, model_admin in registry:
+            if not isinstance(model_admin, PrototypeAdmin):
+                continue
+            for label, queryset, may_scan in changelist_queries(model, model_admin):
+                sql, params = queryset.using(alias).query.sql_with_params()
+                plan = explain(connection, sql, params)
+                scans = [line for line in plan if unindexed(connection.vendor, line, may_scan)]
+                problems += len(scans)
+                if not (scans or options["verbose_plans"]):
+                    continue
+                self.stdout.write("{} [{}]".format(model._meta.label, label))
+                for line in (plan if options["verbose_plans"] else scans):
+                    style = self.style.WARNING if line in scans else self.style.SQL_KEYWORD
+                    self.stdout.write("    " + style(line))
+        if problems:
+            self.stdout.write(self.style.WARNING("{} unindexed scan(s) found".format(problems)))
+        else:
+            self.stdout.write(self.style.SUCCESS("no unindexed scans found"))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core import intervals
+from core.models import BusyInterval
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the busy intervals of phone calls, meetings and tasks."
+
+    def handle(self, *args, **options):
+        intervals.rebuild()
+        self.stdout.write("{} busy intervals".format(BusyInterval.objects.count()))
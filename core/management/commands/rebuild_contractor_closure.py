@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core import hierarchy
+from core.models import ContractorClosure
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the closure table of the contractor hierarchy from Contractor.parent."
+
+    def handle(self, *args, **options):
+        hierarchy.rebuild()
+        self.stdout.write("{} closure rows".format(ContractorClosure.objects.count()))
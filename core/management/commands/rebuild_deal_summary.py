@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core import summary
+from core.models import DealSummary
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the deal pipeline summary from the deals table."
+
+    def handle(self, *args, **options):
+        summary.rebuild()
+        self.stdout.write("{} summary rows".format(DealSummary.objects.count()))
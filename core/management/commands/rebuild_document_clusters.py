@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from core import clusters
+from core.models import DocumentComponent
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the connected components of Document.related_documents."
+
+    def handle(self, *args, **options):
+        clusters.rebuild()
+        self.stdout.write("{} documents in {} clusters".format(
+            DocumentComponent.objects.count(),
+            DocumentComponent.objects.values("root").annotate(size=Count("pk")).count()
+        ))
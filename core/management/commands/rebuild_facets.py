@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core import facets
+
+
+class Command(BaseCommand):
+    help = "Recounts the cached list filter facets of every admin that opts into them."
+
+    def handle(self, *args, **options):
+        for model, fields in sorted(facets.FACETS.items(), key=lambda item: item[0]._meta.label):
+            facets.rebuild(model)
+            self.stdout.write("{}: {}".format(model._meta.label, ", ".join(sorted(fields))))
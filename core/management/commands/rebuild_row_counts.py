@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core import counts
+
+
+class Command(BaseCommand):
+    help = "Recounts the rows of every admin that opts into estimated changelist counts."
+
+    def handle(self, *args, **options):
+        for model in sorted(counts.COUNTED, key=lambda model: model._meta.label):
+            counts.rebuild(model)
+            self.stdout.write("{}: {}".format(model._meta.label, counts.total(model)))
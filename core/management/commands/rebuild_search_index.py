@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core import search
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the full-text search index of contacts, contractors and addresses."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        backend = search.get_backend()
+        if not backend.supports(connection):
+            raise CommandError("{} does not support {}".format(type(backend).__name__, connection.vendor))
+        for index in search.SEARCH_INDEXES:
+            with transaction.atomic():
+                backend.rebuild(index, batch_size=options["batch_size"])
+            self.stdout.write("{}: {} rows indexed".format(
+                index.model._meta.label, index.model._default_manager.count()
+            ))
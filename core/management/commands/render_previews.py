@@ -0,0 +1,9 @@
+from core import previews
+from core.management.base import QueueCommand
+
+
+class Command(QueueCommand):
+    help = "Renders the previews and thumbnails of queued note and document attachments."
+    queue = previews.queue
+    done = "rendered"
+    workers_help = "rendering processes, CORE_PREVIEW_WORKERS by default"
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 15:07
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_auto_20160619_2200'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='address',
+            name='city',
+            field=models.CharField(db_index=True, max_length=128, verbose_name='город'),
+        ),
+        migrations.AlterField(
+            model_name='address',
+            name='region',
+            field=models.CharField(blank=True, db_index=True, max_length=128, null=True, verbose_name='область'),
+        ),
+        migrations.AlterField(
+            model_name='circulation',
+            name='priority',
+            field=models.IntegerField(choices=[(0, 'Низкий'), (1, 'Средний'), (2, 'Высокий')], db_index=True, verbose_name='приоритет'),
+        ),
+        migrations.AlterField(
+            model_name='deal',
+            name='closing_date',
+            field=models.DateField(db_index=True, verbose_name='ожидаемая дата закрытия'),
+        ),
+        migrations.AlterField(
+            model_name='meeting',
+            name='starting_datetime',
+            field=models.DateTimeField(db_index=True, verbose_name='время начала'),
+        ),
+        migrations.AlterField(
+            model_name='phonecall',
+            name='starting_datetime',
+            field=models.DateTimeField(db_index=True, verbose_name='время начала'),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='starting_datetime',
+            field=models.DateTimeField(db_index=True, verbose_name='время начала'),
+        ),
+        migrations.AlterIndexTogether(
+            name='address',
+            index_together=set([('country', 'region', 'city')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='circulation',
+            index_together=set([('status', 'priority')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='deal',
+            index_together=set([('stage', 'closing_date'), ('responsible', 'closing_date')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='meeting',
+            index_together=set([('status', 'starting_datetime'), ('responsible', 'starting_datetime')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='task',
+            index_together=set([('status', 'contact'), ('status', 'starting_datetime'), ('responsible', 'starting_datetime')]),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+SEARCH_TABLES = (
+    (
+        "core_search_contact",
+        ("first_name", "last_name", "department", "position", "phone_work", "phone_mobile", "skype", "emails"),
+        "SELECT c.id, c.first_name, c.last_name, c.department, c.position, c.phone_work, c.phone_mobile, c.skype,"
+        " (SELECT group_concat(e.email, ' ') FROM core_contact_emails ce"
+        " JOIN core_emailtocontractor e ON e.id = ce.emailtocontractor_id WHERE ce.contact_id = c.id)"
+        " FROM core_contact c",
+    ),
+    (
+        "core_search_contractor",
+        ("name", "phone", "fax", "cite", "sic", "stock_code", "emails"),
+        "SELECT c.id, c.name, c.phone, c.fax, c.cite, c.sic, c.stock_code,"
+        " (SELECT group_concat(e.email, ' ') FROM core_contractor_emails ce"
+        " JOIN core_emailtocontractor e ON e.id = ce.emailtocontractor_id WHERE ce.contractor_id = c.id)"
+        " FROM core_contractor c",
+    ),
+    (
+        "core_search_address",
+        ("desc", "zipcode", "country", "region", "city", "street"),
+        "SELECT a.id, a.desc, a.zipcode, a.country, a.region, a.city, a.street FROM core_address a",
+    ),
+)
+
+
+def create_search_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for table, columns, select in SEARCH_TABLES:
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE {} USING fts5({}, prefix='2 3')".format(
+                table, ", ".join('"{}"'.format(column) for column in columns)
+            )
+        )
+        schema_editor.execute(
+            "INSERT INTO {} (rowid, {}) {}".format(
+                table, ", ".join('"{}"'.format(column) for column in columns), select
+            )
+        )
+
+
+def drop_search_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for table, columns, select in SEARCH_TABLES:
+        schema_editor.execute("DROP TABLE {}".format(table))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_auto_20261018_1507'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_tables, drop_search_tables),
+    ]
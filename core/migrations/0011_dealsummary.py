@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 15:14
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from decimal import Decimal
+
+
+def fill_summary(apps, schema_editor):
+    Deal = apps.get_model("core", "Deal")
+    DealSummary = apps.get_model("core", "DealSummary")
+    totals = {}
+    for stage, currency, responsible_id, closing_date, amount in Deal.objects.values_list(
+            "stage", "currency", "responsible_id", "closing_date", "amount").iterator():
+        key = (stage, currency, responsible_id, closing_date.replace(day=1))
+        total, count = totals.get(key, (Decimal(0), 0))
+        totals[key] = (total + amount, count + 1)
+    DealSummary.objects.bulk_create(
+        DealSummary(stage=stage, currency=currency, responsible_id=responsible_id, month=month, amount=total, count=count)
+        for (stage, currency, responsible_id, month), (total, count) in totals.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0010_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DealSummary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(choices=[('Account is liquidated', 'Счёт оплачен'), ('Assembling', 'Сборка заказа / Счёт оплачен'), ('Assembling1', 'Сборка заказа / Счёт частично оплачен'), ('Assembling2', 'Сборка заказа / Счёт не оплачен'), ('Shipping0', 'Частичная готовность к отгрузке'), ('Shipping', 'Готовность к отгрузке'), ('Shipping1', 'Заказ отгружен / Счёт частично оплачен'), ('Shipping2', 'Заказ отгружен / Счёт не оплачен'), ('Prospecting', 'Разведка'), ('Qualification', 'Оценка'), ('Needs Analysis', 'Анализ потребностей'), ('Value Proposition', 'Предложение ценности'), ('Id. Decision Makers', 'Опред. лиц, принимающих решения'), ('Perception Analysis', 'Анализ реакции'), ('Proposal/Price Quote', 'Ком. предложение /Выставление счёта'), ('Negotiation/Review', 'Согласование / Пересмотр'), ('Closed Won', 'Закрыто с успехом / Товар отгружен'), ('Closed Lost', 'Закрыто с потерями / Товар возвращён')], max_length=32, verbose_name='стадия продаж')),
+                ('currency', models.CharField(blank=True, choices=[('rubles', 'рубли')], max_length=16, null=True, verbose_name='валюта')),
+                ('month', models.DateField(verbose_name='месяц закрытия')),
+                ('amount', models.DecimalField(decimal_places=8, default=0, max_digits=32, verbose_name='сумма сделок')),
+                ('count', models.IntegerField(default=0, verbose_name='число сделок')),
+                ('responsible', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='ответственный')),
+            ],
+            options={
+                'verbose_name': 'сводка по сделкам',
+                'verbose_name_plural': 'сводки по сделкам',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='dealsummary',
+            unique_together=set([('stage', 'currency', 'responsible', 'month')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='dealsummary',
+            index_together=set([('month', 'stage')]),
+        ),
+        migrations.RunPython(fill_summary, migrations.RunPython.noop),
+    ]
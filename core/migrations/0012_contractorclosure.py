@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 15:15
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_closure(apps, schema_editor):
+    schema_editor.execute(
+        "INSERT INTO core_contractorclosure (ancestor_id, descendant_id, depth) SELECT id, id, 0 FROM core_contractor"
+    )
+    depth = 0
+    with schema_editor.connection.cursor() as cursor:
+        while True:
+            cursor.execute(
+                "INSERT INTO core_contractorclosure (ancestor_id, descendant_id, depth)"
+                " SELECT c.parent_id, l.descendant_id, l.depth + 1"
+                " FROM core_contractorclosure l JOIN core_contractor c ON c.id = l.ancestor_id"
+                " WHERE l.depth = %s AND c.parent_id IS NOT NULL",
+                [depth]
+            )
+            if not cursor.rowcount:
+                break
+            depth += 1
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_dealsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContractorClosure',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.IntegerField(verbose_name='глубина')),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='core.Contractor', verbose_name='предок')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='core.Contractor', verbose_name='потомок')),
+            ],
+            options={
+                'verbose_name': 'связь контрагентов',
+                'verbose_name_plural': 'связи контрагентов',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='contractorclosure',
+            unique_together=set([('ancestor', 'descendant')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='contractorclosure',
+            index_together=set([('descendant', 'depth')]),
+        ),
+        migrations.RunPython(fill_closure, migrations.RunPython.noop),
+    ]
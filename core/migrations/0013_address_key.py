@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 15:17
+from __future__ import unicode_literals
+
+import hashlib
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+SPACES_RE = re.compile(r"\s+", re.UNICODE)
+DIGITS_RE = re.compile(r"\D+")
+OWNERS = (
+    ("core_contact", "core_contact_addresses", "contact_id"),
+    ("core_contractor", "core_contractor_addresses", "contractor_id"),
+)
+
+
+def address_key(zipcode, *fields):
+    parts = [DIGITS_RE.sub("", str(zipcode)) if zipcode is not None else ""]
+    for value in fields:
+        value = unicodedata.normalize("NFKC", value or "").casefold().replace("ё", "е")
+        parts.append(SPACES_RE.sub(" ", value).strip(" ,.;"))
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def dedupe_addresses(apps, schema_editor):
+    Address = apps.get_model("core", "Address")
+    holders = {}
+    duplicates = {}
+    for pk, zipcode, country, region, city, street in Address.objects.order_by("pk").values_list(
+            "pk", "zipcode", "country", "region", "city", "street").iterator():
+        key = address_key(zipcode, country, region, city, street)
+        if key in holders:
+            duplicates[pk] = holders[key]
+        else:
+            holders[key] = pk
+            Address.objects.filter(pk=pk).update(key=key)
+    merge(schema_editor, duplicates)
+
+
+def merge(schema_editor, duplicates):
+    """
+    Repoints the links of the ``duplicates`` address pks to the pks they
+    map to and deletes them.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        for duplicate, target in duplicates.items():
+            for table, through, owner in OWNERS:
+                cursor.execute(
+                    "UPDATE {through} SET address_id = %s WHERE address_id = %s AND {owner} NOT IN"
+                    " (SELECT {owner} FROM {through} WHERE address_id = %s)".format(through=through, owner=owner),
+                    [target, duplicate, target]
+                )
+                cursor.execute("DELETE FROM {} WHERE address_id = %s".format(through), [duplicate])
+                cursor.execute(
+                    "UPDATE {} SET primary_address_id = %s WHERE primary_address_id = %s".format(table),
+                    [target, duplicate]
+                )
+            if schema_editor.connection.vendor == "sqlite":
+                cursor.execute("DELETE FROM core_search_address WHERE rowid = %s", [duplicate])
+            cursor.execute("DELETE FROM core_address WHERE id = %s", [duplicate])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_contractorclosure'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='address',
+            name='key',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='хеш канонической формы адреса, см. core.addresses', max_length=40, null=True, verbose_name='ключ'),
+        ),
+        migrations.RunPython(dedupe_addresses, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 15:17
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_address_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='address',
+            name='key',
+            field=models.CharField(blank=True, editable=False, help_text='хеш канонической формы адреса, см. core.addresses', max_length=40, null=True, unique=True, verbose_name='ключ'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 15:18
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+FACETS = (
+    ("address", ("country", "region", "city")),
+    ("meeting", ("status", "responsible")),
+)
+
+
+def fill_facets(apps, schema_editor):
+    FacetCount = apps.get_model("core", "FacetCount")
+    for model_name, fields in FACETS:
+        model = apps.get_model("core", model_name)
+        for name in fields:
+            column = model._meta.get_field(name).attname
+            FacetCount.objects.bulk_create(
+                FacetCount(model="core." + model_name, field=name,
+                           value=None if value is None else str(value), count=count)
+                for value, count in model.objects.values_list(column).annotate(
+                    count=models.Count("pk")
+                ).order_by()
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_address_key_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100, verbose_name='модель')),
+                ('field', models.CharField(max_length=64, verbose_name='поле')),
+                ('value', models.CharField(max_length=255, null=True, verbose_name='значение')),
+                ('count', models.IntegerField(default=0, verbose_name='количество')),
+            ],
+            options={
+                'verbose_name': 'счётчик фильтра',
+                'verbose_name_plural': 'счётчики фильтров',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='facetcount',
+            unique_together=set([('model', 'field', 'value')]),
+        ),
+        migrations.RunPython(fill_facets, migrations.RunPython.noop),
+    ]
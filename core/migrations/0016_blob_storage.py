@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 15:20
+from __future__ import unicode_literals
+
+import hashlib
+import os
+
+import core.storage
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+CHUNK_SIZE = 64 * 1024
+MAX_LENGTH = 100
+
+
+def cas_name(digest, name):
+    """
+    Content-addressed name of the file ``name``, its root shortened to fit
+    the attach column.
+    """
+    prefix = "cas/{}/".format(digest)
+    file_name = os.path.basename(name)
+    room = MAX_LENGTH - len(prefix)
+    if len(file_name) > room:
+        root, ext = os.path.splitext(file_name)
+        file_name = root[:room - len(ext)] + ext if len(ext) < room else file_name[:room]
+    return prefix + file_name
+
+
+def legacy_path(name):
+    path = os.path.join(settings.MEDIA_ROOT, name)
+    if not os.path.exists(path):
+        path = os.path.join(settings.BASE_DIR, name)
+    return path
+
+
+def convert_attachments(apps, schema_editor):
+    """
+    Copies the plain files behind the attachments into content-addressed
+    blobs and renames the attachments accordingly. The original files are
+    left in place.
+    """
+    Blob = apps.get_model("core", "Blob")
+    for model in (apps.get_model("core", "Note"), apps.get_model("core", "Document")):
+        for pk, name in model.objects.exclude(attach="").exclude(attach=None).values_list("pk", "attach"):
+            if name.startswith("cas/"):
+                continue
+            path = legacy_path(name)
+            if not os.path.exists(path):
+                continue
+            sha = hashlib.sha256()
+            with open(path, "rb") as source:
+                for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                    sha.update(chunk)
+            digest = sha.hexdigest()
+            target = os.path.join(settings.MEDIA_ROOT, "blobs", digest[:2], digest[2:4], digest)
+            if not os.path.exists(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with open(path, "rb") as source, open(target, "wb") as copy:
+                    for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                        copy.write(chunk)
+            Blob.objects.get_or_create(
+                digest=digest, defaults={"size": os.path.getsize(path), "touched_at": timezone.now()}
+            )
+            Blob.objects.filter(digest=digest).update(refcount=models.F("refcount") + 1)
+            model.objects.filter(pk=pk).update(attach=cas_name(digest, name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_facetcount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('digest', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='sha-256')),
+                ('size', models.BigIntegerField(verbose_name='размер')),
+                ('refcount', models.IntegerField(default=0, verbose_name='число ссылок')),
+                ('touched_at', models.DateTimeField(verbose_name='время последнего обращения')),
+            ],
+            options={
+                'verbose_name': 'содержимое файла',
+                'verbose_name_plural': 'содержимое файлов',
+            },
+        ),
+        migrations.AlterField(
+            model_name='document',
+            name='attach',
+            field=models.FileField(storage=core.storage.ContentAddressedStorage(), upload_to='attachs/documents', verbose_name='вложение'),
+        ),
+        migrations.AlterField(
+            model_name='note',
+            name='attach',
+            field=models.FileField(blank=True, null=True, storage=core.storage.ContentAddressedStorage(), upload_to='attachs/notes', verbose_name='вложение'),
+        ),
+        migrations.AlterIndexTogether(
+            name='blob',
+            index_together=set([('refcount', 'touched_at')]),
+        ),
+        migrations.RunPython(convert_attachments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 15:21
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0016_blob_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.CharField(max_length=32, primary_key=True, serialize=False, verbose_name='идентификатор')),
+                ('filename', models.CharField(max_length=255, verbose_name='имя файла')),
+                ('size', models.BigIntegerField(verbose_name='размер')),
+                ('received', models.BigIntegerField(default=0, verbose_name='получено байт')),
+                ('name', models.CharField(blank=True, max_length=255, null=True, verbose_name='сохранённый файл')),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True, verbose_name='время изменения')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='создал')),
+            ],
+            options={
+                'verbose_name': 'загрузка файла',
+                'verbose_name_plural': 'загрузки файлов',
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 15:25
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_components(apps, schema_editor):
+    from core.clusters import components
+
+    Document = apps.get_model("core", "Document")
+    DocumentComponent = apps.get_model("core", "DocumentComponent")
+    Through = Document._meta.get_field("related_documents").remote_field.through
+    mapping = components(
+        Document.objects.values_list("pk", flat=True),
+        Through.objects.values_list("from_document_id", "to_document_id")
+    )
+    DocumentComponent.objects.bulk_create(
+        (DocumentComponent(document_id=node, root=root) for node, root in mapping.items()),
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_uploadsession'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentComponent',
+            fields=[
+                ('document', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='component', serialize=False, to='core.Document', verbose_name='документ')),
+                ('root', models.IntegerField(db_index=True, verbose_name='компонента')),
+            ],
+            options={
+                'verbose_name': 'компонента связанных документов',
+                'verbose_name_plural': 'компоненты связанных документов',
+            },
+        ),
+        migrations.RunPython(fill_components, migrations.RunPython.noop),
+    ]
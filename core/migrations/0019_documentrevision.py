@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 15:27
+from __future__ import unicode_literals
+
+import core.storage
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def first_revisions(apps, schema_editor):
+    import os
+    from core.storage import digest_of
+
+    Document = apps.get_model("core", "Document")
+    DocumentRevision = apps.get_model("core", "DocumentRevision")
+    Blob = apps.get_model("core", "Blob")
+    for pk, version, name in Document.objects.values_list("pk", "version", "attach"):
+        digest = digest_of(name)
+        if digest is None:
+            continue
+        size = Blob.objects.filter(digest=digest).values_list("size", flat=True).first() or 0
+        DocumentRevision.objects.create(
+            document_id=pk, number=version, kind="full", depth=0, payload=name,
+            filename=os.path.basename(name), digest=digest, size=size, stored_size=size
+        )
+        Blob.objects.filter(digest=digest).update(refcount=models.F("refcount") + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_documentcomponent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentRevision',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.IntegerField(verbose_name='версия')),
+                ('kind', models.CharField(choices=[('full', 'полная копия'), ('delta', 'дельта')], max_length=8, verbose_name='способ хранения')),
+                ('depth', models.IntegerField(default=0, verbose_name='дельт от полной копии')),
+                ('payload', models.FileField(max_length=255, storage=core.storage.ContentAddressedStorage(), upload_to='revisions', verbose_name='содержимое')),
+                ('filename', models.CharField(max_length=255, verbose_name='имя файла')),
+                ('digest', models.CharField(max_length=64, verbose_name='sha-256')),
+                ('size', models.BigIntegerField(verbose_name='размер')),
+                ('stored_size', models.BigIntegerField(verbose_name='размер при хранении')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='время создания')),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='core.Document', verbose_name='документ')),
+            ],
+            options={
+                'verbose_name': 'версия документа',
+                'verbose_name_plural': 'версии документов',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='documentrevision',
+            unique_together=set([('document', 'number')]),
+        ),
+        migrations.RunPython(first_revisions, migrations.RunPython.noop),
+    ]
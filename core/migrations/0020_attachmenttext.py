@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 15:32
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+SEARCH_TABLES = (
+    ("core_search_document", "SELECT d.id, d.name, d.desc, '' FROM core_document d"),
+    ("core_search_note", "SELECT n.id, n.name, n.desc, '' FROM core_note n"),
+)
+SEARCH_COLUMNS = ("name", "desc", "content")
+
+
+def create_search_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    columns = ", ".join('"{}"'.format(column) for column in SEARCH_COLUMNS)
+    for table, select in SEARCH_TABLES:
+        schema_editor.execute("CREATE VIRTUAL TABLE {} USING fts5({}, prefix='2 3')".format(table, columns))
+        schema_editor.execute("INSERT INTO {} (rowid, {}) {}".format(table, columns, select))
+
+
+def drop_search_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for table, select in SEARCH_TABLES:
+        schema_editor.execute("DROP TABLE {}".format(table))
+
+
+def queue_attachments(apps, schema_editor):
+    import os
+    from core.storage import digest_of
+
+    AttachmentText = apps.get_model("core", "AttachmentText")
+    for model_name in ("Note", "Document"):
+        model = apps.get_model("core", model_name)
+        for name in model.objects.exclude(attach="").exclude(attach=None).values_list("attach", flat=True):
+            digest = digest_of(name)
+            if digest is not None:
+                AttachmentText.objects.get_or_create(digest=digest, defaults={"filename": os.path.basename(name)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_documentrevision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttachmentText',
+            fields=[
+                ('digest', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='sha-256')),
+                ('filename', models.CharField(max_length=255, verbose_name='имя файла')),
+                ('status', models.CharField(choices=[('pending', 'ожидает'), ('done', 'извлечён'), ('failed', 'ошибка')], db_index=True, default='pending', max_length=8, verbose_name='статус')),
+                ('text', models.TextField(blank=True, default='', verbose_name='текст')),
+                ('error', models.TextField(blank=True, default='', verbose_name='ошибка')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='время изменения')),
+            ],
+            options={
+                'verbose_name': 'текст вложения',
+                'verbose_name_plural': 'тексты вложений',
+            },
+        ),
+        migrations.RunPython(create_search_tables, drop_search_tables),
+        migrations.RunPython(queue_attachments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 15:33
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def queue_attachments(apps, schema_editor):
+    import os
+    from core.storage import digest_of
+
+    AttachmentPreview = apps.get_model("core", "AttachmentPreview")
+    for model_name in ("Note", "Document"):
+        model = apps.get_model("core", model_name)
+        for name in model.objects.exclude(attach="").exclude(attach=None).values_list("attach", flat=True):
+            digest = digest_of(name)
+            if digest is not None:
+                AttachmentPreview.objects.get_or_create(digest=digest, defaults={"filename": os.path.basename(name)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_attachmenttext'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttachmentPreview',
+            fields=[
+                ('digest', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='sha-256')),
+                ('filename', models.CharField(max_length=255, verbose_name='имя файла')),
+                ('status', models.CharField(choices=[('pending', 'ожидает'), ('done', 'готово'), ('none', 'нечего показать'), ('failed', 'ошибка')], db_index=True, default='pending', max_length=8, verbose_name='статус')),
+                ('error', models.TextField(blank=True, default='', verbose_name='ошибка')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='время изменения')),
+            ],
+            options={
+                'verbose_name': 'превью вложения',
+                'verbose_name_plural': 'превью вложений',
+            },
+        ),
+        migrations.RunPython(queue_attachments, migrations.RunPython.noop),
+    ]
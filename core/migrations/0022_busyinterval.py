@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 15:37
+from __future__ import unicode_literals
+
+import math
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_intervals(apps, schema_editor):
+    from core.intervals import level
+
+    BusyInterval = apps.get_model("core", "BusyInterval")
+    for model_name, free in (("PhoneCall", ("not held", )), ("Meeting", ("not held", )), ("Task", ("Deferred", ))):
+        model = apps.get_model("core", model_name)
+        rows = []
+        for instance in model.objects.exclude(responsible=None).exclude(status__in=free).iterator():
+            span = int(math.ceil((instance.finishing_datetime - instance.starting_datetime).total_seconds()))
+            if span > 0:
+                rows.append(BusyInterval(
+                    model=model._meta.label_lower, object_id=instance.pk, user_id=instance.responsible_id,
+                    name=instance.name, start=instance.starting_datetime, finish=instance.finishing_datetime,
+                    span=span, level=level(span)
+                ))
+        BusyInterval.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0021_attachmentpreview'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusyInterval',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100, verbose_name='модель')),
+                ('object_id', models.IntegerField(verbose_name='запись')),
+                ('name', models.CharField(max_length=192, verbose_name='название')),
+                ('start', models.DateTimeField(verbose_name='время начала')),
+                ('finish', models.DateTimeField(verbose_name='время окончания')),
+                ('span', models.IntegerField(verbose_name='длительность, с')),
+                ('level', models.SmallIntegerField(verbose_name='класс длительности')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='ответственный')),
+            ],
+            options={
+                'verbose_name': 'занятое время',
+                'verbose_name_plural': 'занятое время',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='busyinterval',
+            unique_together=set([('model', 'object_id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='busyinterval',
+            index_together=set([('level', 'span'), ('user', 'level', 'start')]),
+        ),
+        migrations.RunPython(fill_intervals, migrations.RunPython.noop),
+    ]
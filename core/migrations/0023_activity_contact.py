@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 15:40
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_busyinterval'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meeting',
+            name='contact',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.Contact', verbose_name='контактное лицо'),
+        ),
+        migrations.AddField(
+            model_name='phonecall',
+            name='contact',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.Contact', verbose_name='контактное лицо'),
+        ),
+        migrations.AlterIndexTogether(
+            name='circulation',
+            index_together=set([('status', 'priority'), ('contractor', 'created_at', 'id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='deal',
+            index_together=set([('stage', 'closing_date'), ('contractor', 'created_at', 'id'), ('responsible', 'closing_date')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='meeting',
+            index_together=set([('contact', 'starting_datetime', 'id'), ('responsible', 'starting_datetime'), ('status', 'starting_datetime')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='note',
+            index_together=set([('contact', 'created_at', 'id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='phonecall',
+            index_together=set([('contact', 'starting_datetime', 'id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='task',
+            index_together=set([('contact', 'starting_datetime', 'id'), ('responsible', 'starting_datetime'), ('status', 'contact'), ('status', 'starting_datetime')]),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 15:42
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_activity_contact'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='contact',
+            index_together=set([('updated_at', 'id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='task',
+            index_together=set([('starting_datetime', 'id'), ('status', 'starting_datetime'), ('responsible', 'starting_datetime'), ('status', 'contact'), ('contact', 'starting_datetime', 'id')]),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 15:44
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RowCount',
+            fields=[
+                ('model', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='модель')),
+                ('count', models.BigIntegerField(default=0, verbose_name='количество')),
+            ],
+            options={
+                'verbose_name': 'число записей',
+                'verbose_name_plural': 'числа записей',
+            },
+        ),
+    ]
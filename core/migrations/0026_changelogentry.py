@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 15:46
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0025_rowcount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100, verbose_name='модель')),
+                ('object_id', models.IntegerField(verbose_name='запись')),
+                ('action', models.CharField(choices=[('create', 'создание'), ('change', 'изменение'), ('delete', 'удаление')], max_length=8, verbose_name='действие')),
+                ('field', models.CharField(blank=True, default='', max_length=64, verbose_name='поле')),
+                ('old', models.TextField(blank=True, null=True, verbose_name='было')),
+                ('new', models.TextField(blank=True, null=True, verbose_name='стало')),
+                ('changed_at', models.DateTimeField(verbose_name='время изменения')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='пользователь')),
+            ],
+            options={
+                'verbose_name': 'изменение записи',
+                'verbose_name_plural': 'журнал изменений',
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='changelogentry',
+            index_together=set([('model', 'object_id', 'changed_at', 'id')]),
+        ),
+    ]
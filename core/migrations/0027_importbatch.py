@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 16:08
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_changelogentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportBatch',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checkpoint', models.CharField(max_length=255, verbose_name='контрольная точка')),
+                ('position', models.BigIntegerField(verbose_name='позиция')),
+                ('contractors', models.TextField(default='{}', verbose_name='контрагенты')),
+            ],
+            options={
+                'verbose_name': 'пакет импорта',
+                'verbose_name_plural': 'пакеты импорта',
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='importbatch',
+            index_together=set([('checkpoint', 'position')]),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 16:40
+from __future__ import unicode_literals
+
+import hashlib
+import json
+
+from django.db import migrations, models
+
+
+def row_key(stage, currency, responsible_id, month):
+    parts = [stage, currency, responsible_id, month.isoformat()]
+    return hashlib.sha1(json.dumps(parts).encode("utf-8")).hexdigest()
+
+
+def fill_keys(apps, schema_editor):
+    DealSummary = apps.get_model("core", "DealSummary")
+    holders = {}
+    for row in DealSummary.objects.order_by("pk").iterator():
+        key = row_key(row.stage, row.currency, row.responsible_id, row.month)
+        holder = holders.get(key)
+        if holder is None:
+            holders[key] = row
+            DealSummary.objects.filter(pk=row.pk).update(key=key)
+            continue
+        # Rows with a NULL currency or responsible escaped the unique
+        # constraint and may have been created twice.
+        DealSummary.objects.filter(pk=holder.pk).update(
+            amount=models.F("amount") + row.amount, count=models.F("count") + row.count
+        )
+        row.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_importbatch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dealsummary',
+            name='key',
+            field=models.CharField(editable=False, max_length=40, null=True, verbose_name='ключ'),
+        ),
+        migrations.RunPython(fill_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='dealsummary',
+            name='key',
+            field=models.CharField(editable=False, help_text='хеш стадии, валюты, ответственного и месяца, см. core.summary', max_length=40, unique=True, verbose_name='ключ'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 16:55
+from __future__ import unicode_literals
+
+import hashlib
+import json
+
+from django.db import migrations, models
+
+
+def row_key(model, field, value):
+    return hashlib.sha1(json.dumps([model, field, value]).encode("utf-8")).hexdigest()
+
+
+def fill_keys(apps, schema_editor):
+    FacetCount = apps.get_model("core", "FacetCount")
+    holders = {}
+    for row in FacetCount.objects.order_by("pk").iterator():
+        key = row_key(row.model, row.field, row.value)
+        holder = holders.get(key)
+        if holder is None:
+            holders[key] = row
+            FacetCount.objects.filter(pk=row.pk).update(key=key)
+            continue
+        # NULL values escaped the unique constraint and may have been
+        # counted in two rows.
+        FacetCount.objects.filter(pk=holder.pk).update(count=models.F("count") + row.count)
+        row.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0028_dealsummary_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='facetcount',
+            name='key',
+            field=models.CharField(editable=False, max_length=40, null=True, verbose_name='ключ'),
+        ),
+        migrations.RunPython(fill_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='facetcount',
+            name='key',
+            field=models.CharField(editable=False, help_text='хеш модели, поля и значения, см. core.facets', max_length=40, unique=True, verbose_name='ключ'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 16:16
+from __future__ import unicode_literals
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_facetcount_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='document',
+            name='attach',
+            field=models.FileField(max_length=255, storage=core.storage.ContentAddressedStorage(), upload_to='attachs/documents', verbose_name='вложение'),
+        ),
+        migrations.AlterField(
+            model_name='note',
+            name='attach',
+            field=models.FileField(blank=True, max_length=255, null=True, storage=core.storage.ContentAddressedStorage(), upload_to='attachs/notes', verbose_name='вложение'),
+        ),
+    ]
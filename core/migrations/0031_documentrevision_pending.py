@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 16:20
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0030_attach_max_length'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentrevision',
+            name='pending',
+            field=models.BooleanField(db_index=True, default=False, help_text='полная копия, которую compact_revisions заменит дельтой', verbose_name='ожидает сжатия'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 16:23
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_contractors(apps, schema_editor):
+    quote = schema_editor.quote_name
+    contacts = apps.get_model("core", "Contact")._meta.db_table
+    for name in ("PhoneCall", "Meeting", "Task", "Note"):
+        table = apps.get_model("core", name)._meta.db_table
+        schema_editor.execute(
+            "UPDATE {table} SET contractor_id = (SELECT {contacts}.contractor_id FROM {contacts} "
+            "WHERE {contacts}.id = {table}.contact_id) WHERE contact_id IS NOT NULL".format(
+                table=quote(table), contacts=quote(contacts)
+            )
+        )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0031_documentrevision_pending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meeting',
+            name='contractor',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.Contractor', verbose_name='контрагент'),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='contractor',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.Contractor', verbose_name='контрагент'),
+        ),
+        migrations.AddField(
+            model_name='phonecall',
+            name='contractor',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.Contractor', verbose_name='контрагент'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='contractor',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.Contractor', verbose_name='контрагент'),
+        ),
+        migrations.AlterIndexTogether(
+            name='meeting',
+            index_together=set([('contractor', 'starting_datetime', 'id'), ('responsible', 'starting_datetime'), ('status', 'starting_datetime'), ('contact', 'starting_datetime', 'id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='note',
+            index_together=set([('contact', 'created_at', 'id'), ('contractor', 'created_at', 'id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='phonecall',
+            index_together=set([('contractor', 'starting_datetime', 'id'), ('contact', 'starting_datetime', 'id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='task',
+            index_together=set([('contractor', 'starting_datetime', 'id'), ('status', 'contact'), ('starting_datetime', 'id'), ('status', 'starting_datetime'), ('contact', 'starting_datetime', 'id'), ('responsible', 'starting_datetime')]),
+        ),
+        migrations.RunPython(fill_contractors, migrations.RunPython.noop),
+    ]
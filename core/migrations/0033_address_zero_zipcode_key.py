@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from importlib import import_module
+
+from django.db import migrations
+
+address_key_migration = import_module("core.migrations.0013_address_key")
+
+
+def rekey_zero_zipcodes(apps, schema_editor):
+    """
+    Saves used to key a zipcode of 0 like a missing one, unlike 0013 and
+    core.addresses now; recomputes those keys, merging into the rows that
+    hold them already.
+    """
+    Address = apps.get_model("core", "Address")
+    duplicates = {}
+    for pk, zipcode, country, region, city, street in Address.objects.filter(zipcode=0).order_by("pk").values_list(
+            "pk", "zipcode", "country", "region", "city", "street"):
+        key = address_key_migration.address_key(zipcode, country, region, city, street)
+        holder = Address.objects.filter(key=key).exclude(pk=pk).values_list("pk", flat=True).first()
+        if holder is None:
+            Address.objects.filter(pk=pk).update(key=key)
+        else:
+            duplicates[pk] = holder
+    address_key_migration.merge(schema_editor, duplicates)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0032_activity_contractor'),
+    ]
+
+    operations = [
+        migrations.RunPython(rekey_zero_zipcodes, migrations.RunPython.noop),
+    ]
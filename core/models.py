@@ -1,6 +1,8 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth.models import User, Group
 from django.utils.translation import ugettext_lazy as _
+from .storage import attachment_storage
 
 
 class Prototype(models.Model):
@@ -79,12 +81,14 @@ class Address(Desc, Prototype):
         verbose_name=_("город"),
         blank=False,
         null=False,
+        db_index=True
     )
     region = models.CharField(
         max_length=128,
         verbose_name=_("область"),
         blank=True,
-        null=True
+        null=True,
+        db_index=True
     )
     zipcode = models.IntegerField(
         verbose_name=_("индекс"),
@@ -97,6 +101,19 @@ class Address(Desc, Prototype):
         blank=True,
         null=True
     )
+    key = models.CharField(
+        max_length=40,
+        verbose_name=_("ключ"),
+        blank=True,
+        null=True,
+        editable=False,
+        unique=True,
+        help_text=_("хеш канонической формы адреса, см. core.addresses")
+    )
+
+    def save(self, *args, **kwargs):
+        from .addresses import store
+        store(self, super(Address, self).save, *args, **kwargs)
 
     def __str__(self):
         return ", ".join(
@@ -118,6 +135,9 @@ class Address(Desc, Prototype):
     class Meta:
         verbose_name = _("адрес")
         verbose_name_plural = _("адреса")
+        index_together = (
+            ("country", "region", "city"),
+        )
 
 
 class GeoDestination(models.Model):
@@ -284,6 +304,24 @@ class MarketingCampaign(Named, Responsible, Prototype):
         verbose_name_plural = _("маркетинговые кампании")
 
 
+class ContractorQuerySet(models.QuerySet):
+    def subtree(self, contractor, include_self=True):
+        """
+        ``contractor`` and all its subsidiaries at any depth, in one query
+        over ContractorClosure.
+        """
+        return self.filter(ancestor_links__ancestor=contractor, ancestor_links__depth__gte=0 if include_self else 1)
+
+    def ancestors(self, contractor, include_self=False):
+        """
+        The holdings ``contractor`` belongs to, nearest first.
+        """
+        return self.filter(
+            descendant_links__descendant=contractor,
+            descendant_links__depth__gte=0 if include_self else 1
+        ).order_by("descendant_links__depth")
+
+
 class Contractor(Named, GeoDestination, EmailDestination, Responsible, Prototype):
     cite = models.URLField(
         verbose_name=_("сайт"),
@@ -367,6 +405,13 @@ class Contractor(Named, GeoDestination, EmailDestination, Responsible, Prototype
         verbose_name=_("рейтинг")
     )
 
+    objects = ContractorQuerySet.as_manager()
+
+    def clean(self):
+        if self.pk is not None and self.parent_id is not None and ContractorClosure.objects.filter(
+                ancestor_id=self.pk, descendant_id=self.parent_id).exists():
+            raise ValidationError({"parent": _("контрагент не может состоять в своём подразделении.")})
+
     def __str__(self):
         return self.name
 
@@ -375,6 +420,38 @@ class Contractor(Named, GeoDestination, EmailDestination, Responsible, Prototype
         verbose_name_plural = _("контрагенты")
 
 
+class ContractorClosure(models.Model):
+    """
+    Closure table of Contractor.parent: one row per ancestor/descendant
+    pair, including every contractor paired with itself at depth 0.
+    Maintained by core.hierarchy.
+    """
+    ancestor = models.ForeignKey(
+        Contractor,
+        related_name="descendant_links",
+        verbose_name=_("предок")
+    )
+    descendant = models.ForeignKey(
+        Contractor,
+        related_name="ancestor_links",
+        verbose_name=_("потомок")
+    )
+    depth = models.IntegerField(
+        null=False,
+        verbose_name=_("глубина")
+    )
+
+    class Meta:
+        verbose_name = _("связь контрагентов")
+        verbose_name_plural = _("связи контрагентов")
+        unique_together = (
+            ("ancestor", "descendant"),
+        )
+        index_together = (
+            ("descendant", "depth"),
+        )
+
+
 SRC = (
     ('phone', _("холодный прозвон")),
     ('existing_client', _("существующий клиент")),
@@ -490,6 +567,9 @@ class Contact(Desc, GeoDestination, EmailDestination, WithSrc, Responsible, Prot
     class Meta:
         verbose_name = _("контакт")
         verbose_name_plural = _("контакты")
+        index_together = (
+            ("updated_at", "id"),
+        )
 
 
 PRELIMINARY_CONTACT_STATUS = (
@@ -602,7 +682,8 @@ class Deal(Named, WithSrc, Responsible, Prototype):
     closing_date = models.DateField(
         null=False,
         blank=False,
-        verbose_name=_("ожидаемая дата закрытия")
+        verbose_name=_("ожидаемая дата закрытия"),
+        db_index=True
     )
     kind = models.CharField(
         max_length=16,
@@ -624,6 +705,74 @@ class Deal(Named, WithSrc, Responsible, Prototype):
     class Meta:
         verbose_name = _("сделка")
         verbose_name_plural = _("сделки")
+        index_together = (
+            ("stage", "closing_date"),
+            ("responsible", "closing_date"),
+            ("contractor", "created_at", "id"),
+        )
+
+
+class DealSummary(models.Model):
+    """
+    Deal amounts summed by stage, currency, responsible and closing month.
+    Kept up to date by deltas from Deal saves and deletes, see core.summary.
+    """
+    key = models.CharField(
+        max_length=40,
+        null=False,
+        editable=False,
+        unique=True,
+        verbose_name=_("ключ"),
+        help_text=_("хеш стадии, валюты, ответственного и месяца, см. core.summary")
+    )
+    stage = models.CharField(
+        max_length=32,
+        null=False,
+        blank=False,
+        choices=STAGE,
+        verbose_name=_("стадия продаж")
+    )
+    currency = models.CharField(
+        max_length=16,
+        null=True,
+        blank=True,
+        choices=CURRENCY,
+        verbose_name=_("валюта")
+    )
+    responsible = models.ForeignKey(
+        User,
+        blank=True,
+        null=True,
+        verbose_name=_("ответственный"),
+        related_name="+"
+    )
+    month = models.DateField(
+        null=False,
+        blank=False,
+        verbose_name=_("месяц закрытия")
+    )
+    amount = models.DecimalField(
+        max_digits=32,
+        decimal_places=8,
+        null=False,
+        default=0,
+        verbose_name=_("сумма сделок")
+    )
+    count = models.IntegerField(
+        null=False,
+        default=0,
+        verbose_name=_("число сделок")
+    )
+
+    class Meta:
+        verbose_name = _("сводка по сделкам")
+        verbose_name_plural = _("сводки по сделкам")
+        unique_together = (
+            ("stage", "currency", "responsible", "month"),
+        )
+        index_together = (
+            ("month", "stage"),
+        )
 
 
 PRIORITY = (
@@ -652,7 +801,8 @@ class Circulation(Named, Responsible, Prototype):
         choices=PRIORITY,
         null=False,
         blank=False,
-        verbose_name=_("приоритет")
+        verbose_name=_("приоритет"),
+        db_index=True
     )
     status = models.CharField(
         max_length=32,
@@ -686,13 +836,18 @@ class Circulation(Named, Responsible, Prototype):
     class Meta:
         verbose_name = _("обращение")
         verbose_name_plural = _("обращения")
+        index_together = (
+            ("status", "priority"),
+            ("contractor", "created_at", "id"),
+        )
 
 
 class StartAndDuration(models.Model):
     starting_datetime = models.DateTimeField(
         null=False,
         blank=False,
-        verbose_name=_("время начала")
+        verbose_name=_("время начала"),
+        db_index=True
     )
     finishing_datetime = models.DateTimeField(
         null=False,
@@ -744,6 +899,21 @@ class PhoneCall(Relation, StartAndDuration):
         choices=PHONE_STATUS,
         verbose_name=_("статус")
     )
+    contact = models.ForeignKey(
+        Contact,
+        null=True,
+        blank=True,
+        verbose_name=_("контактное лицо")
+    )
+    contractor = models.ForeignKey(
+        Contractor,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="+",
+        on_delete=models.SET_NULL,
+        verbose_name=_("контрагент")
+    )
 
     def __str__(self):
         return self.name
@@ -751,6 +921,10 @@ class PhoneCall(Relation, StartAndDuration):
     class Meta:
         verbose_name = _("звонок")
         verbose_name_plural = _("звонки")
+        index_together = (
+            ("contact", "starting_datetime", "id"),
+            ("contractor", "starting_datetime", "id"),
+        )
 
 
 MEETING_STATUS = PHONE_STATUS
@@ -770,6 +944,21 @@ class Meeting(Relation, StartAndDuration):
         blank=True,
         verbose_name=_("место встречи")
     )
+    contact = models.ForeignKey(
+        Contact,
+        null=True,
+        blank=True,
+        verbose_name=_("контактное лицо")
+    )
+    contractor = models.ForeignKey(
+        Contractor,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="+",
+        on_delete=models.SET_NULL,
+        verbose_name=_("контрагент")
+    )
 
     def __str__(self):
         return self.name
@@ -777,6 +966,12 @@ class Meeting(Relation, StartAndDuration):
     class Meta:
         verbose_name = _("встреча")
         verbose_name_plural = _("встречи")
+        index_together = (
+            ("status", "starting_datetime"),
+            ("responsible", "starting_datetime"),
+            ("contact", "starting_datetime", "id"),
+            ("contractor", "starting_datetime", "id"),
+        )
 
 
 TASK_STATUS = (
@@ -808,6 +1003,15 @@ class Task(Relation, StartAndDuration):
         blank=True,
         verbose_name=_("контактное лицо")
     )
+    contractor = models.ForeignKey(
+        Contractor,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="+",
+        on_delete=models.SET_NULL,
+        verbose_name=_("контрагент")
+    )
 
     def __str__(self):
         return self.name
@@ -815,6 +1019,14 @@ class Task(Relation, StartAndDuration):
     class Meta:
         verbose_name = _("задача")
         verbose_name_plural = _("задачи")
+        index_together = (
+            ("status", "contact"),
+            ("status", "starting_datetime"),
+            ("responsible", "starting_datetime"),
+            ("contact", "starting_datetime", "id"),
+            ("contractor", "starting_datetime", "id"),
+            ("starting_datetime", "id"),
+        )
 
 
 class Note(Relation):
@@ -824,9 +1036,20 @@ class Note(Relation):
         blank=True,
         verbose_name=_("контактное лицо")
     )
+    contractor = models.ForeignKey(
+        Contractor,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="+",
+        on_delete=models.SET_NULL,
+        verbose_name=_("контрагент")
+    )
     attach = models.FileField(
         verbose_name=_("вложение"),
         upload_to="attachs/notes",
+        max_length=255,
+        storage=attachment_storage,
         null=True,
         blank=True
     )
@@ -837,6 +1060,10 @@ class Note(Relation):
     class Meta:
         verbose_name = _("заметка")
         verbose_name_plural = _("заметки")
+        index_together = (
+            ("contact", "created_at", "id"),
+            ("contractor", "created_at", "id"),
+        )
 
 
 DOCUMENT_TYPE = (
@@ -856,10 +1083,22 @@ DOCUMENT_STATUS = (
 )
 
 
+class DocumentQuerySet(models.QuerySet):
+    def cluster(self, document, include_self=True):
+        """
+        The documents ``document`` is linked to through related_documents
+        at any distance, in one query over DocumentComponent.
+        """
+        qs = self.filter(component__root__in=DocumentComponent.objects.filter(document=document).values("root"))
+        return qs if include_self else qs.exclude(pk=getattr(document, "pk", document))
+
+
 class Document(Named, Responsible, Prototype):
     attach = models.FileField(
         verbose_name=_("вложение"),
         upload_to="attachs/documents",
+        max_length=255,
+        storage=attachment_storage,
         null=False,
         blank=False,
     )
@@ -905,6 +1144,8 @@ class Document(Named, Responsible, Prototype):
         verbose_name=_("актуален до")
     )
 
+    objects = DocumentQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
@@ -913,6 +1154,110 @@ class Document(Named, Responsible, Prototype):
         verbose_name_plural = _("документы")
 
 
+class DocumentComponent(models.Model):
+    """
+    Connected component of a document in the related_documents graph:
+    documents linked at any distance share the same ``root``. Maintained
+    by core.clusters.
+    """
+    document = models.OneToOneField(
+        Document,
+        primary_key=True,
+        related_name="component",
+        verbose_name=_("документ")
+    )
+    root = models.IntegerField(
+        null=False,
+        db_index=True,
+        verbose_name=_("компонента")
+    )
+
+    class Meta:
+        verbose_name = _("компонента связанных документов")
+        verbose_name_plural = _("компоненты связанных документов")
+
+
+REVISION_KIND = (
+    ("full", _("полная копия")),
+    ("delta", _("дельта")),
+)
+
+
+class DocumentRevision(models.Model):
+    """
+    A version of Document.attach: either the full content or a binary delta
+    against the previous revision, see core.revisions. Revisions are saved
+    as full copies and compacted into deltas in the background.
+    """
+    document = models.ForeignKey(
+        Document,
+        related_name="revisions",
+        verbose_name=_("документ")
+    )
+    number = models.IntegerField(
+        null=False,
+        verbose_name=_("версия")
+    )
+    kind = models.CharField(
+        max_length=8,
+        null=False,
+        choices=REVISION_KIND,
+        verbose_name=_("способ хранения")
+    )
+    depth = models.IntegerField(
+        null=False,
+        default=0,
+        verbose_name=_("дельт от полной копии")
+    )
+    payload = models.FileField(
+        upload_to="revisions",
+        storage=attachment_storage,
+        max_length=255,
+        null=False,
+        verbose_name=_("содержимое")
+    )
+    filename = models.CharField(
+        max_length=255,
+        null=False,
+        verbose_name=_("имя файла")
+    )
+    digest = models.CharField(
+        max_length=64,
+        null=False,
+        verbose_name=_("sha-256")
+    )
+    size = models.BigIntegerField(
+        null=False,
+        verbose_name=_("размер")
+    )
+    stored_size = models.BigIntegerField(
+        null=False,
+        verbose_name=_("размер при хранении")
+    )
+    pending = models.BooleanField(
+        null=False,
+        default=False,
+        db_index=True,
+        verbose_name=_("ожидает сжатия"),
+        help_text=_("полная копия, которую compact_revisions заменит дельтой")
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        null=False,
+        verbose_name=_("время создания")
+    )
+
+    def __str__(self):
+        return "{} v{}".format(self.filename, self.number)
+
+    class Meta:
+        verbose_name = _("версия документа")
+        verbose_name_plural = _("версии документов")
+        unique_together = (
+            ("document", "number"),
+        )
+
+
 PROJECT_STATUS = (
     ("Draft", _("Черновик")),
     ("In Review", _("На рассмотрении")),
@@ -953,4 +1298,399 @@ class Project(Named, Responsible, Prototype):
         verbose_name_plural = _("проекты")
 
 
+class FacetCount(models.Model):
+    """
+    Number of rows of ``model`` having ``value`` in ``field``, kept up to
+    date from model signals for the admin list filters, see core.facets.
+    """
+    key = models.CharField(
+        max_length=40,
+        null=False,
+        editable=False,
+        unique=True,
+        verbose_name=_("ключ"),
+        help_text=_("хеш модели, поля и значения, см. core.facets")
+    )
+    model = models.CharField(
+        max_length=100,
+        null=False,
+        verbose_name=_("модель")
+    )
+    field = models.CharField(
+        max_length=64,
+        null=False,
+        verbose_name=_("поле")
+    )
+    value = models.CharField(
+        max_length=255,
+        null=True,
+        verbose_name=_("значение")
+    )
+    count = models.IntegerField(
+        null=False,
+        default=0,
+        verbose_name=_("количество")
+    )
+
+    class Meta:
+        verbose_name = _("счётчик фильтра")
+        verbose_name_plural = _("счётчики фильтров")
+        unique_together = (
+            ("model", "field", "value"),
+        )
+
+
+class RowCount(models.Model):
+    """
+    Number of rows of ``model``, kept up to date from model signals for
+    the admin changelists, see core.counts.
+    """
+    model = models.CharField(
+        max_length=100,
+        primary_key=True,
+        verbose_name=_("модель")
+    )
+    count = models.BigIntegerField(
+        null=False,
+        default=0,
+        verbose_name=_("количество")
+    )
+
+    class Meta:
+        verbose_name = _("число записей")
+        verbose_name_plural = _("числа записей")
+
+
+class ImportBatch(models.Model):
+    """
+    Batch of records committed by the import_crm command, written in the
+    transaction of the batch: the records consumed so far and the legacy
+    ids of the contractors created, see core.importer.Checkpoint.
+    """
+    checkpoint = models.CharField(
+        max_length=255,
+        null=False,
+        verbose_name=_("контрольная точка")
+    )
+    position = models.BigIntegerField(
+        null=False,
+        verbose_name=_("позиция")
+    )
+    contractors = models.TextField(
+        null=False,
+        default="{}",
+        verbose_name=_("контрагенты")
+    )
+
+    class Meta:
+        verbose_name = _("пакет импорта")
+        verbose_name_plural = _("пакеты импорта")
+        index_together = (
+            ("checkpoint", "position"),
+        )
+
+
+AUDIT_ACTION = (
+    ("create", _("создание")),
+    ("change", _("изменение")),
+    ("delete", _("удаление")),
+)
+
+
+class ChangeLogEntry(models.Model):
+    """
+    Change of one field of a row, or its creation or deletion, written in
+    batches by the background writer of core.audit.
+    """
+    model = models.CharField(
+        max_length=100,
+        null=False,
+        verbose_name=_("модель")
+    )
+    object_id = models.IntegerField(
+        null=False,
+        verbose_name=_("запись")
+    )
+    action = models.CharField(
+        max_length=8,
+        null=False,
+        choices=AUDIT_ACTION,
+        verbose_name=_("действие")
+    )
+    field = models.CharField(
+        max_length=64,
+        null=False,
+        blank=True,
+        default="",
+        verbose_name=_("поле")
+    )
+    old = models.TextField(
+        null=True,
+        blank=True,
+        verbose_name=_("было")
+    )
+    new = models.TextField(
+        null=True,
+        blank=True,
+        verbose_name=_("стало")
+    )
+    user = models.ForeignKey(
+        User,
+        null=True,
+        blank=True,
+        related_name="+",
+        on_delete=models.SET_NULL,
+        verbose_name=_("пользователь")
+    )
+    changed_at = models.DateTimeField(
+        null=False,
+        verbose_name=_("время изменения")
+    )
+
+    class Meta:
+        verbose_name = _("изменение записи")
+        verbose_name_plural = _("журнал изменений")
+        index_together = (
+            ("model", "object_id", "changed_at", "id"),
+        )
+
+
+class Blob(models.Model):
+    """
+    A file content stored once by ContentAddressedStorage, with the number
+    of attachments referring to it, see core.blobs.
+    """
+    digest = models.CharField(
+        max_length=64,
+        primary_key=True,
+        verbose_name=_("sha-256")
+    )
+    size = models.BigIntegerField(
+        null=False,
+        verbose_name=_("размер")
+    )
+    refcount = models.IntegerField(
+        null=False,
+        default=0,
+        verbose_name=_("число ссылок")
+    )
+    touched_at = models.DateTimeField(
+        null=False,
+        verbose_name=_("время последнего обращения")
+    )
+
+    class Meta:
+        verbose_name = _("содержимое файла")
+        verbose_name_plural = _("содержимое файлов")
+        index_together = (
+            ("refcount", "touched_at"),
+        )
+
+
+TEXT_STATUS = (
+    ("pending", _("ожидает")),
+    ("done", _("извлечён")),
+    ("failed", _("ошибка")),
+)
+
+
+class AttachmentText(models.Model):
+    """
+    Text extracted from a file content, keyed by its digest so that a
+    content is extracted once however many attachments share it, see
+    core.contents.
+    """
+    digest = models.CharField(
+        max_length=64,
+        primary_key=True,
+        verbose_name=_("sha-256")
+    )
+    filename = models.CharField(
+        max_length=255,
+        null=False,
+        verbose_name=_("имя файла")
+    )
+    status = models.CharField(
+        max_length=8,
+        null=False,
+        default="pending",
+        choices=TEXT_STATUS,
+        db_index=True,
+        verbose_name=_("статус")
+    )
+    text = models.TextField(
+        null=False,
+        blank=True,
+        default="",
+        verbose_name=_("текст")
+    )
+    error = models.TextField(
+        null=False,
+        blank=True,
+        default="",
+        verbose_name=_("ошибка")
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        null=False,
+        verbose_name=_("время изменения")
+    )
+
+    class Meta:
+        verbose_name = _("текст вложения")
+        verbose_name_plural = _("тексты вложений")
+
+
+PREVIEW_STATUS = (
+    ("pending", _("ожидает")),
+    ("done", _("готово")),
+    ("none", _("нечего показать")),
+    ("failed", _("ошибка")),
+)
+
+
+class AttachmentPreview(models.Model):
+    """
+    Preview rendering of a file content, keyed by its digest. The images
+    are cached on disk, see core.previews.
+    """
+    digest = models.CharField(
+        max_length=64,
+        primary_key=True,
+        verbose_name=_("sha-256")
+    )
+    filename = models.CharField(
+        max_length=255,
+        null=False,
+        verbose_name=_("имя файла")
+    )
+    status = models.CharField(
+        max_length=8,
+        null=False,
+        default="pending",
+        choices=PREVIEW_STATUS,
+        db_index=True,
+        verbose_name=_("статус")
+    )
+    error = models.TextField(
+        null=False,
+        blank=True,
+        default="",
+        verbose_name=_("ошибка")
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        null=False,
+        verbose_name=_("время изменения")
+    )
+
+    class Meta:
+        verbose_name = _("превью вложения")
+        verbose_name_plural = _("превью вложений")
+
+
+class UploadSession(models.Model):
+    """
+    A chunked upload of an attachment in progress, see core.uploads.
+    """
+    id = models.CharField(
+        max_length=32,
+        primary_key=True,
+        verbose_name=_("идентификатор")
+    )
+    created_by = models.ForeignKey(
+        User,
+        null=False,
+        verbose_name=_("создал"),
+        related_name="+"
+    )
+    filename = models.CharField(
+        max_length=255,
+        null=False,
+        verbose_name=_("имя файла")
+    )
+    size = models.BigIntegerField(
+        null=False,
+        verbose_name=_("размер")
+    )
+    received = models.BigIntegerField(
+        null=False,
+        default=0,
+        verbose_name=_("получено байт")
+    )
+    name = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        verbose_name=_("сохранённый файл")
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        null=False,
+        db_index=True,
+        verbose_name=_("время изменения")
+    )
+
+    class Meta:
+        verbose_name = _("загрузка файла")
+        verbose_name_plural = _("загрузки файлов")
+
+
+
+class BusyInterval(models.Model):
+    """
+    Time a user is taken by a phone call, meeting or task, copied from the
+    StartAndDuration models into one table so overlaps are found with a
+    range scan per ``level``: the class of lengths the interval falls in,
+    whose longest ``span`` in seconds bounds how far back before the
+    queried period the scan of that level starts.
+    """
+    model = models.CharField(
+        max_length=100,
+        null=False,
+        verbose_name=_("модель")
+    )
+    object_id = models.IntegerField(
+        null=False,
+        verbose_name=_("запись")
+    )
+    user = models.ForeignKey(
+        User,
+        null=False,
+        related_name="+",
+        verbose_name=_("ответственный")
+    )
+    name = models.CharField(
+        max_length=192,
+        null=False,
+        verbose_name=_("название")
+    )
+    start = models.DateTimeField(
+        null=False,
+        verbose_name=_("время начала")
+    )
+    finish = models.DateTimeField(
+        null=False,
+        verbose_name=_("время окончания")
+    )
+    span = models.IntegerField(
+        null=False,
+        verbose_name=_("длительность, с")
+    )
+    level = models.SmallIntegerField(
+        null=False,
+        verbose_name=_("класс длительности")
+    )
+
+    class Meta:
+        verbose_name = _("занятое время")
+        verbose_name_plural = _("занятое время")
+        unique_together = (
+            ("model", "object_id"),
+        )
+        index_together = (
+            ("user", "level", "start"),
+            ("level", "span"),
+        )
+
 # TODO addresses lists and emails
\ No newline at end of file
@@ -0,0 +1,160 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import textwrap
+from xml.sax.saxutils import escape
+
+from .extraction import ExtractionError, extract
+from .models import AttachmentPreview
+from .queues import DigestQueue
+from .storage import attachment_storage
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+SIZES = {"thumb": 160, "page": 800}
+FORMATS = ("png", "svg")
+CONTENT_TYPES = {".png": "image/png", ".svg": "image/svg+xml"}
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".bmp", ".tif", ".tiff", ".webp")
+PAGE_RATIO = 1.414
+PAGE_LINES = 48
+LINE_WIDTH = 72
+RENDER_TIMEOUT = 60
+
+
+class PreviewError(Exception):
+    pass
+
+
+def preview_name(digest, size, format):
+    return "/".join(("previews", digest[:2], "{}-{}.{}".format(digest, size, format)))
+
+
+def find(digest, size, storage=attachment_storage):
+    """
+    Name of the cached ``size`` preview of the content ``digest``, None if
+    there is none yet.
+    """
+    for format in FORMATS:
+        name = preview_name(digest, size, format)
+        if os.path.exists(storage.path(name)):
+            return name
+    return None
+
+
+def render_image(path, width, out):
+    with Image.open(path) as image:
+        image.thumbnail((width, int(width * PAGE_RATIO)))
+        if image.mode not in ("RGB", "RGBA", "L"):
+            image = image.convert("RGBA")
+        image.save(out, "PNG")
+
+
+def render_pdf(path, width, out):
+    """
+    First page of a PDF through pdftoppm of poppler-utils.
+    """
+    prefix = out[:-len(".png")]
+    try:
+        subprocess.run(
+            ["pdftoppm", "-png", "-f", "1", "-l", "1", "-singlefile", "-scale-to", str(width), path, prefix],
+            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=RENDER_TIMEOUT
+        )
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        raise PreviewError(str(e))
+
+
+def text_page(text, width):
+    """
+    SVG page showing the beginning of ``text``, for formats there is no
+    renderer for.
+    """
+    lines = []
+    for paragraph in text.splitlines() or [""]:
+        lines.extend(textwrap.wrap(paragraph, LINE_WIDTH) or [""])
+        if len(lines) >= PAGE_LINES:
+            break
+    height = int(width * PAGE_RATIO)
+    rows = "".join(
+        '<text x="40" y="{}">{}</text>'.format(60 + 22 * number, escape(line))
+        for number, line in enumerate(lines[:PAGE_LINES])
+    )
+    return (
+        '<svg xmlns="http://www.w3.org/2000/svg" width="{}" height="{}" viewBox="0 0 800 1131">'
+        '<rect width="800" height="1131" fill="#fff" stroke="#ccc"/>'
+        '<g font-family="sans-serif" font-size="14" fill="#333">{}</g></svg>'
+    ).format(width, height, rows)
+
+
+def renderer(filename):
+    """
+    The function rendering files named ``filename`` to PNG, None for the
+    formats shown as the text extracted from them.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in IMAGE_EXTENSIONS and Image is not None:
+        return render_image
+    if extension == ".pdf" and shutil.which("pdftoppm"):
+        return render_pdf
+    return None
+
+
+def render(path, render_png, text, size, tmp_dir):
+    """
+    Renders the ``size`` preview of the file at ``path`` with
+    ``render_png``, or of ``text`` when there is none, into a temporary
+    file in ``tmp_dir``. Returns its path and format.
+    """
+    width = SIZES[size]
+    fd, out = tempfile.mkstemp(suffix=".png", dir=tmp_dir)
+    os.close(fd)
+    try:
+        if render_png is not None:
+            render_png(path, width, out)
+            return out, "png"
+        with open(out, "w", encoding="utf-8") as svg:
+            svg.write(text_page(text, width))
+        return out, "svg"
+    except Exception:
+        os.remove(out)
+        raise
+
+
+def render_job(job):
+    """
+    Pool entry point: ``job`` is (digest, path, filename, media root), the
+    result (digest, rendered, error). Files without a renderer have their
+    text extracted once for all sizes, and nothing to show without any.
+    """
+    digest, path, filename, root = job
+    tmp_dir = os.path.join(root, "blobs", "tmp")
+    try:
+        render_png = renderer(filename)
+        text = extract(path, filename) if render_png is None else None
+        if render_png is None and not text:
+            return digest, False, None
+        os.makedirs(tmp_dir, exist_ok=True)
+        for size in SIZES:
+            out, format = render(path, render_png, text, size, tmp_dir)
+            target = os.path.join(root, preview_name(digest, size, format))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(out, target)
+    except (PreviewError, ExtractionError, OSError) as e:
+        return digest, False, str(e) or e.__class__.__name__
+    except Exception as e:
+        return digest, False, "{}: {}".format(e.__class__.__name__, e)
+    return digest, True, None
+
+
+def store(digest, rendered, error):
+    AttachmentPreview.objects.filter(digest=digest).update(
+        status="failed" if error else "done" if rendered else "none", error=error or ""
+    )
+
+
+# Previews of the queued contents, rendered by the render_previews command
+# in CORE_PREVIEW_WORKERS processes.
+queue = DigestQueue(AttachmentPreview, render_job, store, workers_setting="CORE_PREVIEW_WORKERS", batch_size=50)
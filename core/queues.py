@@ -0,0 +1,80 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+from .models import Note, Document
+from .storage import attachment_storage, blob_name, digest_of
+
+ATTACHMENT_MODELS = (Note, Document)
+
+
+class DigestQueue(object):
+    """
+    Work queue of attachment contents: one ``model`` row per digest, with
+    the file name and a ``status`` that stays "pending" until ``job`` ran
+    over the content in a pool of processes.
+
+    ``job`` takes (digest, path, filename, media root) and returns a tuple
+    starting with the digest, which ``done`` stores. The pool has as many
+    processes as the ``workers_setting`` setting says, one per CPU without
+    one.
+    """
+
+    def __init__(self, model, job, done, workers_setting=None, batch_size=100):
+        self.model = model
+        self.job = job
+        self.done = done
+        self.workers_setting = workers_setting
+        self.batch_size = batch_size
+
+    def enqueue(self, name):
+        """
+        Queues the content of the attachment ``name`` unless it is queued
+        or processed already.
+        """
+        digest = digest_of(name)
+        if digest is not None:
+            self.model.objects.get_or_create(digest=digest, defaults={"filename": os.path.basename(name)})
+
+    def saved(self, instance):
+        self.enqueue(instance.attach.name)
+
+    def backfill(self):
+        """
+        Queues the attachments stored before the queue was introduced.
+        Returns the number of contents queued.
+        """
+        queued = 0
+        for model in ATTACHMENT_MODELS:
+            names = model._default_manager.exclude(attach="").exclude(attach=None).values_list("attach", flat=True)
+            for name in names.distinct().iterator():
+                digest = digest_of(name)
+                if digest is not None and not self.model.objects.filter(digest=digest).exists():
+                    self.enqueue(name)
+                    queued += 1
+        return queued
+
+    def process(self, workers=None, batch_size=None, storage=attachment_storage):
+        """
+        Runs the job over the pending contents in a pool of ``workers``
+        processes, a batch at a time. Returns the number of contents
+        processed.
+        """
+        if workers is None and self.workers_setting is not None:
+            workers = getattr(settings, self.workers_setting, None)
+        processed = 0
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            while True:
+                batch = list(self.model.objects.filter(status="pending").order_by("updated_at").values_list(
+                    "digest", "filename"
+                )[:batch_size or self.batch_size])
+                if not batch:
+                    return processed
+                jobs = [
+                    (digest, storage.path(blob_name(digest)), filename, storage.location)
+                    for digest, filename in batch
+                ]
+                for result in pool.map(self.job, jobs):
+                    self.done(*result)
+                processed += len(batch)
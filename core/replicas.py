@@ -0,0 +1,181 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+LAG_CACHE_TIMEOUT = 5
+PIN_SESSION_KEY = "core_replicas_pinned_until"
+
+state = threading.local()
+
+
+def names():
+    return list(getattr(settings, "CORE_REPLICA_DATABASES", ()))
+
+
+def measure(alias):
+    """
+    Seconds the ``alias`` replica is behind the primary, None when it does
+    not replicate. Backends without a notion of lag report none.
+    """
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            # The age of the last replayed transaction grows while the
+            # primary is idle, so a replica streaming from the primary
+            # that replayed all it received is up to date whatever its
+            # age. A disconnected one stops receiving and only seems
+            # caught up. The status needs pg_read_all_stats; without it
+            # the age is all there is.
+            cursor.execute(
+                "SELECT pg_is_in_recovery(), pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() AND EXISTS("
+                "SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming'), "
+                "EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())"
+            )
+            recovery, caught_up, seconds = cursor.fetchone()
+            if not recovery or caught_up:
+                return 0.0
+            return None if seconds is None else max(0.0, float(seconds))
+        if connection.vendor == "mysql":
+            cursor.execute("SHOW SLAVE STATUS")
+            row = cursor.fetchone()
+            if row is None:
+                return 0.0
+            seconds = dict(zip([column[0] for column in cursor.description], row))["Seconds_Behind_Master"]
+            return None if seconds is None else float(seconds)
+    return 0.0
+
+
+def lags(refresh=False):
+    """
+    Maps each replica to its lag in seconds, None when it is down or not
+    replicating. Measured at most every LAG_CACHE_TIMEOUT seconds.
+    """
+    result = None if refresh else cache.get("core.replicas.lags")
+    if result is None:
+        result = {}
+        for alias in names():
+            try:
+                result[alias] = measure(alias)
+            except DatabaseError:
+                result[alias] = None
+        cache.set("core.replicas.lags", result, LAG_CACHE_TIMEOUT)
+    return result
+
+
+def usable():
+    limit = getattr(settings, "CORE_REPLICA_MAX_LAG", 30)
+    return sorted(alias for alias, seconds in lags().items() if seconds is not None and seconds <= limit)
+
+
+def pinned(request):
+    session = getattr(request, "session", None)
+    return session is not None and session.get(PIN_SESSION_KEY, 0) > time.time()
+
+
+def pin(request):
+    request.session[PIN_SESSION_KEY] = time.time() + getattr(settings, "CORE_REPLICA_PIN_SECONDS", 10)
+
+
+def choose(request):
+    """
+    Database the reads of ``request`` may go to: a replica lagging less
+    than CORE_REPLICA_MAX_LAG, unless the user wrote lately.
+    """
+    if not names() or pinned(request) or getattr(state, "wrote", False):
+        return DEFAULT_DB_ALIAS
+    aliases = usable()
+    return random.choice(aliases) if aliases else DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def reading(request):
+    """
+    Sends the reads of the current thread to choose() of ``request``, see
+    ReplicaRouter. Writes go to the primary all the same.
+    """
+    alias = choose(request)
+    previous, state.alias = getattr(state, "alias", None), alias
+    try:
+        yield alias
+    finally:
+        state.alias = previous
+
+
+def reads(view):
+    """
+    Runs a GET ``view``, rendering of its template included, in reading().
+    """
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return view(request, *args, **kwargs)
+        with reading(request):
+            response = view(request, *args, **kwargs)
+            if hasattr(response, "render"):
+                response.render()
+        return response
+    return wrapped
+
+
+def started():
+    state.alias = None
+    state.wrote = False
+
+
+def written():
+    state.wrote = True
+
+
+def wrote():
+    return getattr(state, "wrote", False)
+
+
+class ReplicaRouter(object):
+    """
+    Reads from the replica picked by reading(), if any, until the thread
+    writes; everything else, migrations included, uses the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if wrote():
+            return None
+        return getattr(state, "alias", None)
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label != "sessions":
+            written()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = [DEFAULT_DB_ALIAS] + names()
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in names():
+            return False
+        return None
+
+
+class ReplicaPinMiddleware(object):
+    """
+    Keeps the reads of a user on the primary for CORE_REPLICA_PIN_SECONDS
+    after a request of theirs wrote, so that they see their own changes.
+    """
+
+    def process_request(self, request):
+        started()
+
+    def process_response(self, request, response):
+        if wrote() and hasattr(request, "session") and getattr(request, "user", None) is not None:
+            if request.user.is_authenticated():
+                pin(request)
+        started()
+        return response
@@ -0,0 +1,350 @@
+import gzip
+import hashlib
+import os
+import tempfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files import File
+from django.db import transaction
+
+from .blobs import acquire, release
+from .models import Document, DocumentRevision
+from .storage import attachment_storage, blob_name, digest_of
+
+MAGIC = b"TCRD1"
+BLOCK_SIZE = 32
+CHUNK_SIZE = 64 * 1024
+KEYFRAME_INTERVAL = 10
+# encode() holds both contents in memory and runs in pure Python, at a few
+# MB a second: larger revisions stay full copies.
+MAX_DELTA_SIZE = 8 * 1024 * 1024
+BATCH_SIZE = 20
+
+COPY = b"C"
+INSERT = b"I"
+
+
+class CorruptRevision(Exception):
+    pass
+
+
+def write_varint(out, value):
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            out.write(bytes((byte | 0x80, )))
+        else:
+            out.write(bytes((byte, )))
+            return
+
+
+def read_varint(stream):
+    value = shift = 0
+    while True:
+        byte = stream.read(1)
+        if not byte:
+            raise CorruptRevision("truncated delta")
+        value |= (byte[0] & 0x7f) << shift
+        if not byte[0] & 0x80:
+            return value
+        shift += 7
+
+
+def match_length(base, base_offset, target, target_offset):
+    """
+    Length of the common prefix of ``base[base_offset:]`` and
+    ``target[target_offset:]``, compared a slice at a time.
+    """
+    length = 0
+    step = CHUNK_SIZE
+    while step:
+        part = base[base_offset + length:base_offset + length + step]
+        if part and part == target[target_offset + length:target_offset + length + step]:
+            length += len(part)
+        else:
+            step //= 2
+    return length
+
+
+def encode(base, target, out):
+    """
+    Writes to ``out`` the instructions rebuilding ``target`` from ``base``:
+    copies of base ranges found through an index of its BLOCK_SIZE blocks,
+    and inserts of the bytes in between.
+    """
+    index = {}
+    for offset in range(0, len(base) - BLOCK_SIZE + 1, BLOCK_SIZE):
+        index.setdefault(base[offset:offset + BLOCK_SIZE], offset)
+    out.write(MAGIC)
+    write_varint(out, len(target))
+    pending = position = 0
+    last = len(target) - BLOCK_SIZE
+    while position <= last:
+        offset = index.get(target[position:position + BLOCK_SIZE])
+        if offset is None:
+            position += 1
+            continue
+        start = position
+        while start > pending and offset > 0 and target[start - 1] == base[offset - 1]:
+            start -= 1
+            offset -= 1
+        length = match_length(base, offset, target, start)
+        if start > pending:
+            out.write(INSERT)
+            write_varint(out, start - pending)
+            out.write(target[pending:start])
+        out.write(COPY)
+        write_varint(out, offset)
+        write_varint(out, length)
+        pending = position = start + length
+    if pending < len(target):
+        out.write(INSERT)
+        write_varint(out, len(target) - pending)
+        out.write(target[pending:])
+
+
+def decode(delta, base, out):
+    """
+    Rebuilds into ``out`` the content the ``delta`` stream describes,
+    seeking in the ``base`` file for copies. Reads and writes CHUNK_SIZE
+    bytes at a time, whatever the sizes involved. Returns the SHA-256 of
+    the content.
+    """
+    if delta.read(len(MAGIC)) != MAGIC:
+        raise CorruptRevision("not a delta")
+    size = read_varint(delta)
+    sha = hashlib.sha256()
+    written = 0
+    while True:
+        op = delta.read(1)
+        if not op:
+            break
+        if op == COPY:
+            source = base
+            source.seek(read_varint(delta))
+        elif op == INSERT:
+            source = delta
+        else:
+            raise CorruptRevision("unknown instruction")
+        remaining = read_varint(delta)
+        while remaining:
+            data = source.read(min(CHUNK_SIZE, remaining))
+            if not data:
+                raise CorruptRevision("truncated delta")
+            sha.update(data)
+            out.write(data)
+            remaining -= len(data)
+            written += len(data)
+    if written != size:
+        raise CorruptRevision("expected {} bytes, rebuilt {}".format(size, written))
+    return sha.hexdigest()
+
+
+def chain(revision):
+    """
+    The revisions to read to rebuild ``revision``: the full copy it
+    depends on, then its deltas in order.
+    """
+    return list(reversed(
+        DocumentRevision.objects.filter(
+            document_id=revision.document_id, number__lte=revision.number
+        ).order_by("-number")[:revision.depth + 1]
+    ))
+
+
+def tmp_dir(storage=attachment_storage):
+    path = storage.path(os.path.join("blobs", "tmp"))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def open_revision(revision, storage=attachment_storage):
+    """
+    File object reading the content of ``revision``. Deltas are applied
+    one after the other from the full copy, each into a temporary file,
+    so memory use does not depend on file sizes or chain length. The
+    temporary file is removed when the returned file is closed.
+    """
+    revisions = chain(revision)
+    if not revisions or revisions[0].kind != "full" or len(revisions) != revision.depth + 1:
+        raise CorruptRevision("broken chain for {}".format(revision))
+    current = revisions[0].payload.path
+    if len(revisions) == 1:
+        try:
+            return open(current, "rb")
+        except OSError as e:
+            raise CorruptRevision("unreadable full copy for {}: {}".format(revision, e))
+    previous = None
+    try:
+        for step in revisions[1:]:
+            out = tempfile.NamedTemporaryFile(dir=tmp_dir(storage), prefix="revision-")
+            try:
+                with gzip.open(step.payload.path, "rb") as delta, open(current, "rb") as base:
+                    digest = decode(delta, base, out)
+                if digest != step.digest:
+                    raise CorruptRevision("digest mismatch for {}".format(step))
+            except (OSError, EOFError, zlib.error) as e:
+                out.close()
+                raise CorruptRevision("unreadable delta for {}: {}".format(step, e))
+            except CorruptRevision:
+                out.close()
+                raise
+            if previous is not None:
+                previous.close()
+            out.flush()
+            previous = out
+            current = out.name
+    except CorruptRevision:
+        if previous is not None:
+            previous.close()
+        raise
+    previous.seek(0)
+    return previous
+
+
+def content_path(revision, storage=attachment_storage):
+    """
+    Path of a file holding the content of ``revision``: the blob of that
+    content when it is still stored, else a temporary rebuild of it,
+    returned with the file object to close once done.
+    """
+    path = storage.path(blob_name(revision.digest))
+    if os.path.exists(path):
+        return path, None
+    rebuilt = open_revision(revision, storage)
+    return rebuilt.name, rebuilt
+
+
+def saved(document, storage=attachment_storage):
+    """
+    Records the attachment of ``document`` as a new revision unless it is
+    the content of the latest one or its file is missing. The revision
+    shares the attachment blob as a full copy and, unless it is the
+    first, is left pending for compact() to replace with a delta.
+    """
+    name = document.attach.name
+    digest = digest_of(name)
+    if digest is None:
+        return None
+    last = DocumentRevision.objects.filter(document=document).order_by("-number").first()
+    if last is not None and last.digest == digest:
+        return None
+    try:
+        size = os.path.getsize(storage.path(name))
+    except OSError:
+        # The blob is missing, e.g. a name restored from a backup of the
+        # database alone: there is no content to keep.
+        return None
+    number = max(last.number + 1 if last is not None else 1, document.version)
+    revision = DocumentRevision(
+        document=document, number=number, filename=os.path.basename(name), digest=digest, size=size,
+        kind="full", depth=0, payload=name, stored_size=size, pending=last is not None
+    )
+    with transaction.atomic():
+        revision.save()
+        acquire(revision.payload.name)
+        if document.version != number:
+            Document.objects.filter(pk=document.pk).update(version=number)
+            document.version = number
+    return revision
+
+
+def delta_job(job):
+    """
+    Pool entry point: ``job`` is (revision pk, base path, target path,
+    temporary directory), the result (pk, path of the gzipped delta, None
+    when it would not pay off, error).
+    """
+    pk, base_path, target_path, tmp = job
+    try:
+        with open(base_path, "rb") as base_file, open(target_path, "rb") as target_file:
+            base, target = base_file.read(), target_file.read()
+        fd, out = tempfile.mkstemp(dir=tmp, prefix="delta-")
+        with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) as delta:
+            encode(base, target, delta)
+        if os.path.getsize(out) >= len(target):
+            os.remove(out)
+            return pk, None, None
+        return pk, out, None
+    except Exception as e:
+        return pk, None, "{}: {}".format(e.__class__.__name__, e)
+
+
+def store_delta(revision, previous, delta_path, storage=attachment_storage):
+    """
+    Replaces the full copy of ``revision`` with the delta at ``delta_path``
+    against ``previous``, unless the revision changed meanwhile.
+    """
+    with open(delta_path, "rb") as delta:
+        name = storage.save("revisions/{}-{}.delta".format(revision.document_id, revision.number), File(delta))
+    with transaction.atomic():
+        if DocumentRevision.objects.filter(pk=revision.pk, pending=True).update(
+            kind="delta", depth=previous.depth + 1, payload=name, stored_size=os.path.getsize(delta_path)
+        ):
+            acquire(name)
+            release(revision.payload.name)
+
+
+def pending(batch_size):
+    """
+    The oldest pending revision of up to ``batch_size`` documents. A delta
+    depends on the revisions before it, so those are compacted first.
+    """
+    batch, documents = [], set()
+    for revision in DocumentRevision.objects.filter(pending=True).order_by("number", "pk").iterator():
+        if revision.document_id not in documents:
+            documents.add(revision.document_id)
+            batch.append(revision)
+            if len(batch) >= batch_size:
+                break
+    return batch
+
+
+def compact(workers=None, batch_size=None, storage=attachment_storage):
+    """
+    Replaces the pending full copies with deltas against the previous
+    revision in a pool of ``workers`` processes. A full copy is kept every
+    KEYFRAME_INTERVAL revisions, above MAX_DELTA_SIZE and whenever a delta
+    would not pay off. Returns the number of revisions processed.
+    """
+    processed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            batch = pending(batch_size or BATCH_SIZE)
+            if not batch:
+                return processed
+            jobs, bases, rebuilt = [], {}, []
+            try:
+                for revision in batch:
+                    previous = DocumentRevision.objects.filter(
+                        document_id=revision.document_id, number__lt=revision.number
+                    ).order_by("-number").first()
+                    if previous is None or previous.depth + 1 >= KEYFRAME_INTERVAL or \
+                            max(revision.size, previous.size) > MAX_DELTA_SIZE:
+                        continue
+                    try:
+                        base_path, base_file = content_path(previous, storage)
+                    except CorruptRevision:
+                        continue
+                    if base_file is not None:
+                        rebuilt.append(base_file)
+                    bases[revision.pk] = revision, previous
+                    jobs.append((revision.pk, base_path, revision.payload.path, tmp_dir(storage)))
+                for pk, delta_path, error in pool.map(delta_job, jobs):
+                    if delta_path is None:
+                        continue
+                    try:
+                        store_delta(bases[pk][0], bases[pk][1], delta_path, storage)
+                    finally:
+                        os.remove(delta_path)
+            finally:
+                for base_file in rebuilt:
+                    base_file.close()
+            DocumentRevision.objects.filter(pk__in=[revision.pk for revision in batch]).update(pending=False)
+            processed += len(batch)
+
+
+def deleted(revision):
+    release(revision.payload.name)
@@ -0,0 +1,295 @@
+import re
+
+from django.conf import settings
+from django.db import connections, router
+from django.utils.module_loading import import_string
+
+from .models import Contact, Contractor, Address, Note, Document, AttachmentText
+from .storage import digest_of
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def attachment_text(instance):
+    """
+    Text extracted from the attachment of ``instance``, empty until
+    extract_attachments has processed it.
+    """
+    digest = digest_of(instance.attach.name)
+    if digest is None:
+        return ""
+    return AttachmentText.objects.filter(digest=digest, status="done").values_list("text", flat=True).first() or ""
+
+
+class SearchIndex(object):
+    """
+    Describes what gets indexed for a model: its own text ``fields``, the
+    string values of its ``related`` many-to-many fields and the
+    ``computed`` (column, function of the instance) values.
+    """
+
+    def __init__(self, model, fields, related=(), computed=()):
+        self.model = model
+        self.fields = tuple(fields)
+        self.related = tuple(related)
+        self.computed = tuple(computed)
+
+    @property
+    def table(self):
+        return "core_search_{}".format(self.model._meta.model_name)
+
+    @property
+    def columns(self):
+        return self.fields + self.related + tuple(name for name, function in self.computed)
+
+    def document(self, instance):
+        values = [getattr(instance, name) for name in self.fields]
+        values += [" ".join(map(str, getattr(instance, name).all())) for name in self.related]
+        values += [function(instance) for name, function in self.computed]
+        return ["" if value is None else str(value) for value in values]
+
+
+SEARCH_INDEXES = (
+    SearchIndex(
+        Contact,
+        ("first_name", "last_name", "department", "position", "phone_work", "phone_mobile", "skype"),
+        ("emails", )
+    ),
+    SearchIndex(
+        Contractor,
+        ("name", "phone", "fax", "cite", "sic", "stock_code"),
+        ("emails", )
+    ),
+    SearchIndex(
+        Address,
+        ("desc", "zipcode", "country", "region", "city", "street")
+    ),
+    SearchIndex(
+        Document,
+        ("name", "desc"),
+        computed=(("content", attachment_text), )
+    ),
+    SearchIndex(
+        Note,
+        ("name", "desc"),
+        computed=(("content", attachment_text), )
+    ),
+)
+
+
+def get_index(model):
+    for index in SEARCH_INDEXES:
+        if issubclass(model, index.model):
+            return index
+    return None
+
+
+class SearchBackend(object):
+    """
+    Base class of search backends. A backend keeps the index tables of
+    ``SEARCH_INDEXES`` up to date and narrows querysets down to the rows
+    matching a search term, annotated with ``search_rank`` (lower is better).
+    ``filter`` returns None for terms the backend can not serve.
+
+    The index tables are written through the database ``using`` gives,
+    that of the writes of the indexed model by default.
+    """
+
+    def supports(self, connection):
+        return False
+
+    def connection(self, index, using=None):
+        return connections[using or router.db_for_write(index.model)]
+
+    def update(self, index, instances, using=None):
+        raise NotImplementedError
+
+    def delete(self, index, pks, using=None):
+        raise NotImplementedError
+
+    def filter(self, index, queryset, term):
+        raise NotImplementedError
+
+    def rebuild(self, index, batch_size=2000, using=None):
+        self.clear(index, using)
+        queryset = index.model._default_manager.db_manager(using).order_by("pk")
+        if index.related:
+            queryset = queryset.prefetch_related(*index.related)
+        last_pk = None
+        while True:
+            batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            batch = list(batch[:batch_size])
+            if not batch:
+                break
+            self.update(index, batch, using)
+            last_pk = batch[-1].pk
+
+    def clear(self, index, using=None):
+        raise NotImplementedError
+
+
+class Fts5SearchBackend(SearchBackend):
+    """
+    SQLite FTS5 backend: one virtual table per index keyed by the rowid of
+    the indexed row, with prefix indexes for 2 and 3 character prefixes.
+    """
+
+    def supports(self, connection):
+        return connection.vendor == "sqlite"
+
+    def update(self, index, instances, using=None):
+        rows = [(instance.pk, ) + tuple(index.document(instance)) for instance in instances]
+        if not rows:
+            return
+        connection = self.connection(index, using)
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                "DELETE FROM {} WHERE rowid = %s".format(index.table),
+                [(row[0], ) for row in rows]
+            )
+            cursor.executemany(
+                "INSERT INTO {} (rowid, {}) VALUES (%s, {})".format(
+                    index.table,
+                    ", ".join(map(connection.ops.quote_name, index.columns)),
+                    ", ".join(["%s"] * len(index.columns))
+                ),
+                rows
+            )
+
+    def delete(self, index, pks, using=None):
+        with self.connection(index, using).cursor() as cursor:
+            cursor.executemany(
+                "DELETE FROM {} WHERE rowid = %s".format(index.table),
+                [(pk, ) for pk in pks]
+            )
+
+    def clear(self, index, using=None):
+        with self.connection(index, using).cursor() as cursor:
+            cursor.execute("DELETE FROM {}".format(index.table))
+
+    def expression(self, term):
+        tokens = TOKEN_RE.findall(term)
+        return " ".join('"{}"*'.format(token) for token in tokens)
+
+    def filter(self, index, queryset, term):
+        expression = self.expression(term)
+        if not expression:
+            return None
+        opts = queryset.model._meta
+        return queryset.extra(
+            select={"search_rank": "{}.rank".format(index.table)},
+            tables=[index.table],
+            where=[
+                "{}.rowid = {}.{}".format(index.table, opts.db_table, opts.pk.column),
+                "{} MATCH %s".format(index.table),
+            ],
+            params=[expression]
+        )
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(getattr(settings, "CORE_SEARCH_BACKEND", "core.search.Fts5SearchBackend"))()
+    return _backend
+
+
+def indexed(model, using=None):
+    """
+    Returns the index serving ``model`` when the configured backend can run
+    on the database ``using``, that of the writes of ``model`` by default,
+    None otherwise.
+    """
+    index = get_index(model)
+    if index is None or not get_backend().supports(connections[using or router.db_for_write(model)]):
+        return None
+    return index
+
+
+def search(queryset, term):
+    index = indexed(queryset.model, queryset.db)
+    if index is None:
+        return None
+    return get_backend().filter(index, queryset, term)
+
+
+def update(instance):
+    using = instance._state.db
+    index = indexed(type(instance), using)
+    if index is not None:
+        get_backend().update(index, [instance], using)
+
+
+def delete(instance):
+    using = instance._state.db
+    index = indexed(type(instance), using)
+    if index is not None:
+        get_backend().delete(index, [instance.pk], using)
+
+
+def reindex(model, pks, using=None):
+    """
+    Re-indexes the rows of ``model`` with ``pks``.
+    """
+    index = indexed(model, using)
+    if index is None or not pks:
+        return
+    instances = model._default_manager.db_manager(using).filter(pk__in=set(pks)).prefetch_related(*index.related)
+    get_backend().update(index, instances, using)
+
+
+def owners(field, pks, using=None):
+    """
+    Pks of the rows linked to ``pks`` of the target model of the
+    many-to-many ``field``.
+    """
+    return list(field.remote_field.through._default_manager.db_manager(using).filter(
+        **{"{}__in".format(field.m2m_reverse_field_name()): pks}
+    ).values_list(field.m2m_field_name(), flat=True))
+
+
+def update_related(model, related, pks, using=None):
+    """
+    Re-indexes the rows of ``model`` linked to ``pks`` of the target model
+    of its ``related`` many-to-many field.
+    """
+    index = indexed(model, using)
+    if index is None or related not in index.related:
+        return
+    reindex(model, owners(model._meta.get_field(related), pks, using), using)
+
+
+def update_email(email):
+    for model in (Contact, Contractor):
+        update_related(model, "emails", [email.pk], email._state.db)
+
+
+def related_changed(sender, instance, action, reverse, model, pk_set):
+    """
+    Follows m2m_changed: the indexed row itself changed, or, seen from the
+    other side, the indexed rows in ``pk_set``. A reverse clear names no
+    rows, so they are looked up before it.
+    """
+    using = instance._state.db
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            update(instance)
+        return
+    index = indexed(model, using)
+    if index is None:
+        return
+    fields = [
+        model._meta.get_field(name) for name in index.related
+        if model._meta.get_field(name).remote_field.through is sender
+    ]
+    if not fields:
+        return
+    if action == "pre_clear":
+        instance._search_cleared = owners(fields[0], [instance.pk], using)
+    elif action in ("post_add", "post_remove"):
+        reindex(model, pk_set, using)
+    elif action == "post_clear":
+        reindex(model, instance.__dict__.pop("_search_cleared", []), using)
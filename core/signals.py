@@ -0,0 +1,249 @@
+from django.core.signals import request_started
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from . import search, summary, hierarchy, facets, blobs, clusters, revisions, contents, previews, intervals, counts, audit, dashboard, health, timeline,\
+    stored
+from .models import EmailToContractor, Deal, Contractor, Contact, Note, Document, DocumentRevision, PhoneCall, Meeting, Task
+
+
+@receiver(post_save, dispatch_uid="core.search.post_save")
+def search_post_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if isinstance(instance, EmailToContractor):
+        search.update_email(instance)
+    else:
+        search.update(instance)
+
+
+@receiver(post_delete, dispatch_uid="core.search.post_delete")
+def search_post_delete(sender, instance, **kwargs):
+    search.delete(instance)
+
+
+@receiver(m2m_changed, dispatch_uid="core.search.m2m_changed")
+def search_m2m_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    search.related_changed(sender, instance, action, reverse, model, pk_set)
+
+
+# The pre_save handlers below compare the stored row of the instance with
+# its new values. This one, registered first, reads the row once for all of
+# them, for these models and the ones registered with facets, audit and
+# dashboard.
+STORED = (Deal, Contractor, Note, Document, Contact)
+
+
+@receiver(pre_save, dispatch_uid="core.stored.pre_save")
+def stored_pre_save(sender, instance, raw=False, **kwargs):
+    model = instance._meta.concrete_model
+    if not raw and (
+            model in STORED or type(instance) in facets.FACETS or model in dashboard.WATCHED or
+            model in audit.AUDITED and not hasattr(instance, "_audit_changes")):
+        stored.load(instance)
+
+
+@receiver(pre_save, sender=Deal, dispatch_uid="core.summary.pre_save")
+def summary_pre_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        summary.stash(instance)
+
+
+@receiver(post_save, sender=Deal, dispatch_uid="core.summary.post_save")
+def summary_post_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        summary.saved(instance)
+
+
+@receiver(post_delete, sender=Deal, dispatch_uid="core.summary.post_delete")
+def summary_post_delete(sender, instance, **kwargs):
+    summary.deleted(instance)
+
+
+@receiver(pre_save, sender=Contractor, dispatch_uid="core.hierarchy.pre_save")
+def hierarchy_pre_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        hierarchy.stash(instance)
+
+
+@receiver(post_save, sender=Contractor, dispatch_uid="core.hierarchy.post_save")
+def hierarchy_post_save(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        hierarchy.saved(instance, created)
+
+
+@receiver(pre_save, dispatch_uid="core.facets.pre_save")
+def facets_pre_save(sender, instance, raw=False, **kwargs):
+    if not raw and type(instance) in facets.FACETS:
+        facets.stash(instance)
+
+
+@receiver(post_save, dispatch_uid="core.facets.post_save")
+def facets_post_save(sender, instance, raw=False, **kwargs):
+    if not raw and type(instance) in facets.FACETS:
+        facets.saved(instance)
+
+
+@receiver(post_delete, dispatch_uid="core.facets.post_delete")
+def facets_post_delete(sender, instance, **kwargs):
+    if type(instance) in facets.FACETS:
+        facets.deleted(instance)
+
+
+@receiver(pre_save, sender=Note, dispatch_uid="core.blobs.note.pre_save")
+@receiver(pre_save, sender=Document, dispatch_uid="core.blobs.document.pre_save")
+def blobs_pre_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        blobs.stash(instance)
+
+
+@receiver(post_save, sender=Note, dispatch_uid="core.blobs.note.post_save")
+@receiver(post_save, sender=Document, dispatch_uid="core.blobs.document.post_save")
+def blobs_post_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        blobs.saved(instance)
+
+
+@receiver(post_delete, sender=Note, dispatch_uid="core.blobs.note.post_delete")
+@receiver(post_delete, sender=Document, dispatch_uid="core.blobs.document.post_delete")
+def blobs_post_delete(sender, instance, **kwargs):
+    blobs.deleted(instance)
+
+
+@receiver(post_save, sender=Document, dispatch_uid="core.clusters.post_save")
+def clusters_post_save(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        clusters.created(instance)
+
+
+@receiver(pre_delete, sender=Document, dispatch_uid="core.clusters.pre_delete")
+def clusters_pre_delete(sender, instance, **kwargs):
+    instance._clusters_roots = clusters.roots([instance.pk])
+
+
+@receiver(post_delete, sender=Document, dispatch_uid="core.clusters.post_delete")
+def clusters_post_delete(sender, instance, **kwargs):
+    clusters.split(getattr(instance, "_clusters_roots", []))
+
+
+@receiver(m2m_changed, sender=clusters.THROUGH, dispatch_uid="core.clusters.m2m_changed")
+def clusters_m2m_changed(sender, instance, action, pk_set, **kwargs):
+    if action == "post_add" and pk_set:
+        clusters.joined([instance.pk] + list(pk_set))
+    elif action in ("post_remove", "post_clear"):
+        clusters.split(clusters.roots([instance.pk]))
+
+
+@receiver(post_save, sender=Document, dispatch_uid="core.revisions.post_save")
+def revisions_post_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        revisions.saved(instance)
+
+
+@receiver(post_delete, sender=DocumentRevision, dispatch_uid="core.revisions.post_delete")
+def revisions_post_delete(sender, instance, **kwargs):
+    revisions.deleted(instance)
+
+
+@receiver(post_save, sender=Note, dispatch_uid="core.contents.note.post_save")
+@receiver(post_save, sender=Document, dispatch_uid="core.contents.document.post_save")
+def contents_post_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        contents.queue.saved(instance)
+
+
+@receiver(post_save, sender=Note, dispatch_uid="core.previews.note.post_save")
+@receiver(post_save, sender=Document, dispatch_uid="core.previews.document.post_save")
+def previews_post_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        previews.queue.saved(instance)
+
+
+@receiver(post_save, sender=PhoneCall, dispatch_uid="core.intervals.phonecall.post_save")
+@receiver(post_save, sender=Meeting, dispatch_uid="core.intervals.meeting.post_save")
+@receiver(post_save, sender=Task, dispatch_uid="core.intervals.task.post_save")
+def intervals_post_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        intervals.saved(instance)
+
+
+@receiver(post_delete, sender=PhoneCall, dispatch_uid="core.intervals.phonecall.post_delete")
+@receiver(post_delete, sender=Meeting, dispatch_uid="core.intervals.meeting.post_delete")
+@receiver(post_delete, sender=Task, dispatch_uid="core.intervals.task.post_delete")
+def intervals_post_delete(sender, instance, **kwargs):
+    intervals.deleted(instance)
+
+
+@receiver(post_save, dispatch_uid="core.counts.post_save")
+def counts_post_save(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        for model in counts.counted(instance):
+            counts.add(model, 1)
+
+
+@receiver(post_delete, dispatch_uid="core.counts.post_delete")
+def counts_post_delete(sender, instance, **kwargs):
+    for model in counts.counted(instance):
+        counts.add(model, -1)
+
+
+@receiver(pre_save, dispatch_uid="core.audit.pre_save")
+def audit_pre_save(sender, instance, raw=False, **kwargs):
+    if not raw and instance._meta.concrete_model in audit.AUDITED:
+        audit.stash(instance)
+
+
+@receiver(post_save, dispatch_uid="core.audit.post_save")
+def audit_post_save(sender, instance, created, raw=False, **kwargs):
+    if not raw and instance._meta.concrete_model in audit.AUDITED:
+        audit.saved(instance, created)
+
+
+@receiver(post_delete, dispatch_uid="core.audit.post_delete")
+def audit_post_delete(sender, instance, **kwargs):
+    if instance._meta.concrete_model in audit.AUDITED:
+        audit.deleted(instance)
+
+
+@receiver(pre_save, dispatch_uid="core.dashboard.pre_save")
+def dashboard_pre_save(sender, instance, raw=False, **kwargs):
+    if not raw and instance._meta.concrete_model in dashboard.WATCHED:
+        dashboard.stash(instance)
+
+
+@receiver(post_save, dispatch_uid="core.dashboard.post_save")
+def dashboard_post_save(sender, instance, raw=False, **kwargs):
+    if not raw and instance._meta.concrete_model in dashboard.WATCHED:
+        dashboard.saved(instance)
+
+
+@receiver(post_delete, dispatch_uid="core.dashboard.post_delete")
+def dashboard_post_delete(sender, instance, **kwargs):
+    if instance._meta.concrete_model in dashboard.WATCHED:
+        dashboard.deleted(instance)
+
+
+@receiver(request_started, dispatch_uid="core.health.request_started")
+def health_request_started(sender, **kwargs):
+    health.check_connections()
+
+
+@receiver(pre_save, sender=PhoneCall, dispatch_uid="core.timeline.phonecall.pre_save")
+@receiver(pre_save, sender=Meeting, dispatch_uid="core.timeline.meeting.pre_save")
+@receiver(pre_save, sender=Task, dispatch_uid="core.timeline.task.pre_save")
+@receiver(pre_save, sender=Note, dispatch_uid="core.timeline.note.pre_save")
+def timeline_pre_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        timeline.attach(instance)
+
+
+@receiver(pre_save, sender=Contact, dispatch_uid="core.timeline.contact.pre_save")
+def timeline_contact_pre_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        timeline.stash(instance)
+
+
+@receiver(post_save, sender=Contact, dispatch_uid="core.timeline.contact.post_save")
+def timeline_contact_post_save(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        timeline.moved(instance)
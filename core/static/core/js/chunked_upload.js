@@ -0,0 +1,238 @@
+/*
+ * Uploads the file picked in a ChunkedFileInput in chunks before the form
+ * is submitted. The upload session is remembered per file in localStorage,
+ * so picking the same file again after a dropped connection resumes from
+ * the offset the server reports.
+ */
+(function () {
+    "use strict";
+
+    var CHUNK_SIZE = 8 * 1024 * 1024;
+    var RETRIES = 5;
+
+    function csrfToken() {
+        var match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+        return match ? decodeURIComponent(match[1]) : "";
+    }
+
+    function request(method, url, body, headers) {
+        return new Promise(function (resolve, reject) {
+            var xhr = new XMLHttpRequest();
+            xhr.open(method, url);
+            xhr.setRequestHeader("X-CSRFToken", csrfToken());
+            Object.keys(headers || {}).forEach(function (name) {
+                xhr.setRequestHeader(name, headers[name]);
+            });
+            xhr.onload = function () {
+                var data = {};
+                try {
+                    data = JSON.parse(xhr.responseText);
+                } catch (e) {}
+                data.status = xhr.status;
+                resolve(data);
+            };
+            xhr.onerror = function () {
+                reject(new Error("network error"));
+            };
+            xhr.send(body);
+        });
+    }
+
+    function hex(buffer) {
+        return Array.prototype.map.call(new Uint8Array(buffer), function (byte) {
+            return ("0" + byte.toString(16)).slice(-2);
+        }).join("");
+    }
+
+    var K = [
+        0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+        0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+        0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+        0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+        0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+        0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+        0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+        0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2
+    ];
+
+    /*
+     * SHA-256 of an ArrayBuffer, for the pages crypto.subtle is missing
+     * from, such as those served over plain HTTP.
+     */
+    function sha256(buffer) {
+        var bytes = new Uint8Array(buffer);
+        var length = bytes.length;
+        var padded = new Uint8Array(((length + 9 + 63) >> 6) << 6);
+        padded.set(bytes);
+        padded[length] = 0x80;
+        var view = new DataView(padded.buffer);
+        view.setUint32(padded.length - 8, Math.floor(length / 0x20000000));
+        view.setUint32(padded.length - 4, (length << 3) >>> 0);
+        var h = [0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a, 0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19];
+        var w = new Array(64);
+        function rotr(x, n) {
+            return (x >>> n) | (x << (32 - n));
+        }
+        for (var offset = 0; offset < padded.length; offset += 64) {
+            var i;
+            for (i = 0; i < 16; i++) {
+                w[i] = view.getUint32(offset + 4 * i);
+            }
+            for (i = 16; i < 64; i++) {
+                var s0 = rotr(w[i - 15], 7) ^ rotr(w[i - 15], 18) ^ (w[i - 15] >>> 3);
+                var s1 = rotr(w[i - 2], 17) ^ rotr(w[i - 2], 19) ^ (w[i - 2] >>> 10);
+                w[i] = (w[i - 16] + s0 + w[i - 7] + s1) | 0;
+            }
+            var a = h[0], b = h[1], c = h[2], d = h[3], e = h[4], f = h[5], g = h[6], k = h[7];
+            for (i = 0; i < 64; i++) {
+                var t1 = (k + (rotr(e, 6) ^ rotr(e, 11) ^ rotr(e, 25)) + ((e & f) ^ (~e & g)) + K[i] + w[i]) | 0;
+                var t2 = ((rotr(a, 2) ^ rotr(a, 13) ^ rotr(a, 22)) + ((a & b) ^ (a & c) ^ (b & c))) | 0;
+                k = g;
+                g = f;
+                f = e;
+                e = (d + t1) | 0;
+                d = c;
+                c = b;
+                b = a;
+                a = (t1 + t2) | 0;
+            }
+            h = [h[0] + a, h[1] + b, h[2] + c, h[3] + d, h[4] + e, h[5] + f, h[6] + g, h[7] + k].map(function (x) {
+                return x | 0;
+            });
+        }
+        var digest = new DataView(new ArrayBuffer(32));
+        h.forEach(function (x, i) {
+            digest.setUint32(4 * i, x >>> 0);
+        });
+        return digest.buffer;
+    }
+
+    function read(blob) {
+        return new Promise(function (resolve, reject) {
+            var reader = new FileReader();
+            reader.onload = function () {
+                resolve(reader.result);
+            };
+            reader.onerror = function () {
+                reject(reader.error);
+            };
+            reader.readAsArrayBuffer(blob);
+        });
+    }
+
+    // The server refuses chunks without their SHA-256.
+    function checksum(blob) {
+        return read(blob).then(function (buffer) {
+            if (window.crypto && window.crypto.subtle) {
+                return window.crypto.subtle.digest("SHA-256", buffer);
+            }
+            return sha256(buffer);
+        }).then(hex);
+    }
+
+    function storageKey(url, file) {
+        return "chunked-upload:" + url + ":" + [file.name, file.size, file.lastModified].join(":");
+    }
+
+    function session(url, file) {
+        var key = storageKey(url, file);
+        var id = window.localStorage.getItem(key);
+        var resumed = id ? request("GET", url + id + "/") : Promise.resolve({status: 404});
+        return resumed.then(function (state) {
+            if (state.status === 200) {
+                return state;
+            }
+            var form = new FormData();
+            form.append("filename", file.name);
+            form.append("size", file.size);
+            return request("POST", url, form).then(function (state) {
+                if (state.status !== 201) {
+                    throw new Error(state.error || "upload refused");
+                }
+                window.localStorage.setItem(key, state.id);
+                return state;
+            });
+        });
+    }
+
+    function sendChunks(url, file, state, progress, retries) {
+        if (state.offset >= file.size) {
+            return Promise.resolve(state);
+        }
+        var end = Math.min(state.offset + CHUNK_SIZE, file.size);
+        var chunk = file.slice(state.offset, end);
+        return checksum(chunk).then(function (digest) {
+            var headers = {
+                "Content-Type": "application/octet-stream",
+                "Content-Range": "bytes " + state.offset + "-" + (end - 1) + "/" + file.size,
+                "X-Content-SHA256": digest
+            };
+            return request("PUT", url + state.id + "/", chunk, headers);
+        }).then(function (next) {
+            if (next.status === 200 || next.status === 409) {
+                progress(next.offset, file.size);
+                return sendChunks(url, file, next, progress, RETRIES);
+            }
+            throw new Error(next.error || "upload failed");
+        }, function (error) {
+            if (!retries) {
+                throw error;
+            }
+            return new Promise(function (resolve) {
+                setTimeout(resolve, (RETRIES - retries + 1) * 1000);
+            }).then(function () {
+                return request("GET", url + state.id + "/");
+            }).then(function (current) {
+                return sendChunks(url, file, current.status === 200 ? current : state, progress, retries - 1);
+            }, function () {
+                return sendChunks(url, file, state, progress, retries - 1);
+            });
+        });
+    }
+
+    function upload(input) {
+        var file = input.files[0];
+        var url = input.getAttribute("data-upload-url");
+        var hidden = input.form.elements[input.getAttribute("data-upload-field")];
+        var label = input.parentNode.querySelector(".chunked-upload-progress");
+        var submits = input.form.querySelectorAll("[type=submit]");
+        function progress(offset, size) {
+            label.textContent = " " + Math.floor(100 * offset / Math.max(size, 1)) + "%";
+        }
+        function enable(enabled) {
+            Array.prototype.forEach.call(submits, function (button) {
+                button.disabled = !enabled;
+            });
+        }
+        hidden.value = "";
+        if (!file) {
+            return;
+        }
+        enable(false);
+        session(url, file).then(function (state) {
+            progress(state.offset, file.size);
+            return sendChunks(url, file, state, progress, RETRIES);
+        }).then(function (state) {
+            return request("POST", url + state.id + "/finish/");
+        }).then(function (state) {
+            if (state.status !== 200) {
+                throw new Error(state.error || "upload failed");
+            }
+            window.localStorage.removeItem(storageKey(url, file));
+            hidden.value = state.id;
+            // The file itself is already on the server.
+            input.value = "";
+            label.textContent = " " + file.name;
+            enable(true);
+        }).catch(function (error) {
+            label.textContent = " " + error.message;
+            enable(true);
+        });
+    }
+
+    document.addEventListener("change", function (event) {
+        if (event.target.hasAttribute && event.target.hasAttribute("data-upload-url")) {
+            upload(event.target);
+        }
+    });
+})();
@@ -0,0 +1,136 @@
+import hashlib
+import os
+import re
+import tempfile
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+from django.utils.encoding import filepath_to_uri
+from django.utils.six.moves.urllib.parse import urljoin
+
+NAME_RE = re.compile(r"^cas/(?P<digest>[0-9a-f]{64})/")
+# Length of the "cas/<digest>/" prefix of content-addressed names.
+PREFIX_LENGTH = len("cas/") + 64 + 1
+
+
+def blob_name(digest):
+    return "/".join(("blobs", digest[:2], digest[2:4], digest))
+
+
+def cas_name(digest, file_name):
+    return "cas/{}/{}".format(digest, file_name)
+
+
+def fit_name(file_name, max_length):
+    """
+    ``file_name`` with its root shortened, extension kept, so that its
+    content-addressed name is at most ``max_length`` long; None when no
+    root fits.
+    """
+    room = max_length - PREFIX_LENGTH
+    if len(file_name) <= room:
+        return file_name
+    root, ext = os.path.splitext(file_name)
+    if room - len(ext) < 1:
+        return None
+    return root[:room - len(ext)] + ext
+
+
+def digest_of(name):
+    """
+    The SHA-256 digest a content-addressed file name refers to, None for
+    names of plain files.
+    """
+    match = NAME_RE.match(name or "")
+    return match.group("digest") if match else None
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores each distinct content once under ``blobs/`` by its SHA-256,
+    computed while the upload is written. Files are named
+    ``cas/<digest>/<original name>``, so they keep their name while sharing
+    the blob. Names without the ``cas/`` prefix are served as plain files,
+    which keeps files uploaded before this storage readable.
+
+    Blobs are never deleted here: core.blobs counts their references and
+    gc_blobs removes the unreferenced ones.
+    """
+
+    def path(self, name):
+        digest = digest_of(name)
+        return super(ContentAddressedStorage, self).path(blob_name(digest) if digest else name)
+
+    def url(self, name):
+        digest = digest_of(name)
+        if digest is None:
+            return super(ContentAddressedStorage, self).url(name)
+        return urljoin(self.base_url, filepath_to_uri(blob_name(digest)))
+
+    def get_available_name(self, name, max_length=None):
+        """
+        ``name`` as is, since contents never overwrite each other, its file
+        name shortened for the ``cas/<digest>/`` name to fit ``max_length``.
+        """
+        if max_length is None:
+            return name
+        dir_name, file_name = os.path.split(name)
+        fitted = fit_name(file_name, max_length)
+        if fitted is None:
+            raise SuspiciousFileOperation(
+                'Storage can not find an available filename for "%s". '
+                'Please make sure that the corresponding file field '
+                'allows sufficient "max_length".' % name
+            )
+        return os.path.join(dir_name, fitted)
+
+    def delete(self, name):
+        if digest_of(name) is None:
+            super(ContentAddressedStorage, self).delete(name)
+
+    def _save(self, name, content):
+        tmp_dir = os.path.join(self.location, "blobs", "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        sha = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                for chunk in content.chunks():
+                    sha.update(chunk)
+                    size += len(chunk)
+                    tmp.write(chunk)
+            digest = sha.hexdigest()
+            self.store(tmp_path, digest, size)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return cas_name(digest, os.path.basename(name))
+
+    def link(self, tmp_path, digest):
+        full_path = super(ContentAddressedStorage, self).path(blob_name(digest))
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        try:
+            os.link(tmp_path, full_path)
+        except FileExistsError:
+            return
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+
+    def store(self, tmp_path, digest, size):
+        """
+        Links the file at ``tmp_path``, which the caller removes, as the
+        blob of ``digest`` unless that blob is already stored, and
+        registers it. gc_blobs may take the blob away until it is
+        registered, see core.blobs.collect(), so it is linked again after.
+        """
+        from .blobs import touch
+
+        self.link(tmp_path, digest)
+        touch(digest, size)
+        self.link(tmp_path, digest)
+
+
+attachment_storage = ContentAddressedStorage()
@@ -0,0 +1,19 @@
+def load(instance):
+    """
+    Reads the stored row of ``instance`` before it is overwritten, once per
+    save for every pre_save handler comparing it with the new values.
+    """
+    model = instance._meta.concrete_model
+    instance._stored_row = None
+    if instance.pk is not None:
+        instance._stored_row = model._default_manager.filter(pk=instance.pk).values(
+            *[field.attname for field in model._meta.concrete_fields]
+        ).first()
+
+
+def row(instance):
+    """
+    The field values of the stored row of ``instance`` by attname, None for
+    a row not stored yet.
+    """
+    return instance.__dict__.get("_stored_row")
@@ -0,0 +1,134 @@
+import datetime
+import hashlib
+import json
+
+from django.db import IntegrityError, connection, models, transaction
+
+from . import stored
+from .models import Deal, DealSummary
+
+KEY_FIELDS = ("stage", "currency", "responsible_id")
+
+
+def month_start(value):
+    if isinstance(value, str):
+        value = datetime.datetime.strptime(value[:10], "%Y-%m-%d")
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    return value.replace(day=1)
+
+
+def row_key(values):
+    """
+    Key of the summary row of the ``values`` mapping. Unlike the unique
+    constraint on the fields, which NULL currency and responsible escape,
+    it tells apart a row per combination.
+    """
+    parts = [values["stage"], values["currency"], values["responsible_id"], values["month"].isoformat()]
+    return hashlib.sha1(json.dumps(parts).encode("utf-8")).hexdigest()
+
+
+def snapshot(values):
+    """
+    The part of a deal the summary depends on, from a mapping of its field
+    values.
+    """
+    return dict(
+        [(name, values[name]) for name in KEY_FIELDS] +
+        [("month", month_start(values["closing_date"])), ("amount", values["amount"])]
+    )
+
+
+def apply(values, sign):
+    adjust([values], sign)
+
+
+def adjust(snapshots, sign):
+    """
+    Adds, or takes away for a negative ``sign``, the deals of
+    ``snapshots`` to their summary rows, one UPDATE per row.
+    """
+    totals = {}
+    for values in snapshots:
+        key = tuple(values[name] for name in KEY_FIELDS + ("month", ))
+        amount, count = totals.get(key, (0, 0))
+        totals[key] = amount + values["amount"], count + 1
+    for key, (amount, count) in totals.items():
+        values = dict(zip(KEY_FIELDS + ("month", ), key))
+        add(row_key(values), values, sign * amount, sign * count)
+        if sign < 0:
+            DealSummary.objects.filter(key=row_key(values), count__lte=0).delete()
+
+
+def add(key, values, amount, count):
+    """
+    Adds ``amount`` and ``count`` to the row ``key``, creating it first if
+    needed. A concurrent insert of the same row is caught by the unique
+    key and the update retried.
+    """
+    changes = dict(amount=models.F("amount") + amount, count=models.F("count") + count)
+    if DealSummary.objects.filter(key=key).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            DealSummary.objects.create(key=key, amount=amount, count=count, **values)
+    except IntegrityError:
+        DealSummary.objects.filter(key=key).update(**changes)
+
+
+def stash(deal):
+    """
+    Remembers the stored state of ``deal`` before it is overwritten.
+    """
+    previous = stored.row(deal)
+    deal._summary_previous = snapshot(previous) if previous is not None else None
+
+
+def saved(deal):
+    previous = getattr(deal, "_summary_previous", None)
+    current = snapshot(deal.__dict__)
+    if previous == current:
+        return
+    with transaction.atomic():
+        if previous is not None:
+            apply(previous, -1)
+        apply(current, 1)
+
+
+def snapshots(pks):
+    return [
+        snapshot(values)
+        for values in Deal.objects.filter(pk__in=pks).values(*(KEY_FIELDS + ("closing_date", "amount")))
+    ]
+
+
+def moved(previous, name, value):
+    """
+    Moves the deals of the ``previous`` snapshots to the summary rows of
+    ``value`` of ``name``, after an UPDATE set it on all of them.
+    """
+    with transaction.atomic():
+        adjust(previous, -1)
+        adjust([dict(values, **{name: value}) for values in previous], 1)
+
+
+def deleted(deal):
+    with transaction.atomic():
+        apply(snapshot(deal.__dict__), -1)
+
+
+def rebuild():
+    month = connection.ops.date_trunc_sql("month", Deal._meta.get_field("closing_date").column)
+    rows = Deal.objects.extra(select={"month": month}).values(*(KEY_FIELDS + ("month", ))).annotate(
+        total=models.Sum("amount"), deals=models.Count("pk")
+    ).order_by()
+    with transaction.atomic():
+        DealSummary.objects.all().delete()
+        DealSummary.objects.bulk_create(
+            DealSummary(
+                key=row_key(dict(row, month=month_start(row["month"]))),
+                stage=row["stage"], currency=row["currency"], responsible_id=row["responsible_id"],
+                month=month_start(row["month"]), amount=row["total"], count=row["deals"]
+            )
+            for row in rows
+        )
@@ -1,3 +1,1116 @@
-from django.test import TestCase
+import datetime
+import hashlib
+import os
+from importlib import import_module
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation, ValidationError
+from django.core.files.base import ContentFile
+from django.core.urlresolvers import reverse
+from django.db import DatabaseError, connection
+from django.db.models.signals import m2m_changed
+from django.db.models.query import QuerySet
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import addresses, audit, blobs, bulk, clusters, contents, counts, dashboard, facets, health, hierarchy,\
+    intervals, keyset, previews, replicas, revisions, search, summary, timeline, uploads
+from .extraction import extract_job
+from .importer import Checkpoint, CrmImporter
+from .storage import attachment_storage, cas_name
+from .models import Contractor, Contact, Task, EmailToContractor, Deal, DealSummary, Address, FacetCount,\
+    ContractorClosure, Note, Document, AttachmentText, AttachmentPreview, DocumentRevision, ChangeLogEntry, Blob,\
+    UploadSession, BusyInterval
+
+
+class ChangelistQueryCountMixin(object):
+    """
+    TestCase mixin failing when the queries of a changelist page grow with
+    the number of rows shown. The client must be logged in as a user
+    allowed to see the changelist. A first request warms up what is
+    computed once per model, such as the maintained row counts.
+    """
+
+    def assertChangelistQueriesConstant(self, model, create_row, rows=(1, 10)):
+        url = reverse("admin:{}_{}_changelist".format(model._meta.app_label, model._meta.model_name))
+        counts = []
+        created = 0
+        self.client.get(url)
+        for n in rows:
+            while created < n:
+                create_row(created)
+                created += 1
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(queries))
+        self.assertEqual(
+            len(set(counts)), 1,
+            "changelist of {} runs {} queries for {} rows".format(model._meta.label, counts, list(rows))
+        )
+
+
+class AdminTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser("admin", "admin@example.com", "password")
+        self.client.force_login(self.user)
+
+    def use_temporary_media(self):
+        """
+        Points the attachment storage at a directory removed after the test.
+        """
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        patcher = mock.patch.object(attachment_storage, "location", location)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assertSeeks(self, queryset):
+        """
+        Fails unless SQLite reads ``queryset`` from a range of an index
+        rather than walking a whole index or table.
+        """
+        if connection.vendor != "sqlite":
+            self.skipTest("query plans are checked on SQLite")
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            steps = [row[-1] for row in cursor.fetchall()]
+        self.assertRegex(steps[0], r"^SEARCH .* USING INDEX .*[<>]\?", steps)
+
+    def create_contractor(self, number, **kwargs):
+        return Contractor.objects.create(
+            name="contractor {}".format(number), created_by=self.user, updated_by=self.user, **kwargs
+        )
+
+    def create_contact(self, number, **kwargs):
+        return Contact.objects.create(
+            first_name="contact", last_name=str(number), created_by=self.user, updated_by=self.user, **kwargs
+        )
+
+    def create_task(self, number, **kwargs):
+        starting = timezone.now() + datetime.timedelta(hours=number)
+        kwargs.setdefault("responsible", self.user)
+        return Task.objects.create(
+            name="task {}".format(number), priority=1, status="Not Started",
+            starting_datetime=starting, finishing_datetime=starting + datetime.timedelta(minutes=30),
+            created_by=self.user, updated_by=self.user, **kwargs
+        )
+
+    def create_deal(self, number, **kwargs):
+        kwargs.setdefault("contractor", self.create_contractor("deal {}".format(number)))
+        kwargs.setdefault("closing_date", datetime.date(2026, 1, 15))
+        return Deal.objects.create(
+            name="deal {}".format(number), amount=Decimal(10), stage="Prospecting",
+            created_by=self.user, updated_by=self.user, **kwargs
+        )
+
+    def create_document(self, number, **kwargs):
+        return Document.objects.create(
+            name="document {}".format(number), attach="", version=1, status="Active",
+            publication_date=datetime.date(2026, 1, 1), created_by=self.user, updated_by=self.user, **kwargs
+        )
+
+
+class ChangelistQueriesTest(ChangelistQueryCountMixin, AdminTestCase):
+    def test_contractor(self):
+        parent = self.create_contractor("parent")
+
+        def create_row(number):
+            contractor = self.create_contractor(number, parent=parent, responsible=self.user)
+            contractor.emails.add(EmailToContractor.objects.create(
+                email="{}@example.com".format(number), created_by=self.user, updated_by=self.user
+            ))
+
+        self.assertChangelistQueriesConstant(Contractor, create_row)
+
+    def test_contact(self):
+        contractor = self.create_contractor("employer")
+        self.assertChangelistQueriesConstant(
+            Contact, lambda number: self.create_contact(number, contractor=contractor, responsible=self.user)
+        )
+
+    def test_task(self):
+        contact = self.create_contact("client")
+        self.assertChangelistQueriesConstant(Task, lambda number: self.create_task(number, contact=contact))
+
+
+class ImporterTest(AdminTestCase):
+    records = [
+        {"type": "contractor", "id": "c1", "name": "Acme", "emails": "info@acme.example;sales@acme.example"},
+        {"type": "contact", "contractor": "c1", "first_name": "Ann", "last_name": "Lee", "emails": "ann@acme.example"},
+        {"type": "contractor", "id": "c2", "name": "Globex", "emails": "info@acme.example"},
+        {"type": "contact", "contractor": "c2", "first_name": "Bob", "last_name": "Ray"},
+        {"type": "contact", "contractor": "c1", "first_name": "Cid", "last_name": "Moe"},
+    ]
+
+    def test_resume_after_crash(self):
+        importer = CrmImporter(self.user, Checkpoint("test"), batch_size=2)
+        index = importer.index
+        batches = []
+
+        def failing_index(model, objs):
+            if model is Contact:
+                batches.append(len(objs))
+                if len(batches) == 2:
+                    raise RuntimeError("crash")
+            index(model, objs)
+
+        importer.index = failing_index
+        with self.assertRaises(RuntimeError):
+            importer.run(iter(self.records))
+        self.assertEqual(Checkpoint("test").position, 2)
+        self.assertEqual(Contractor.objects.count(), 1)
+        self.assertEqual(CrmImporter(self.user, Checkpoint("test"), batch_size=2).run(iter(self.records)), 5)
+        self.assertEqual(Checkpoint("test").position, 5)
+        self.assertEqual(Contractor.objects.count(), 2)
+        self.assertEqual(Contact.objects.filter(contractor__name="Acme").count(), 2)
+        self.assertEqual(EmailToContractor.objects.count(), 3)
+        contractor = Contractor.objects.create(name="manual", created_by=self.user, updated_by=self.user)
+        self.assertGreater(contractor.pk, max(Contractor.objects.exclude(pk=contractor.pk).values_list("pk", flat=True)))
+
+    def test_hierarchy(self):
+        records = [
+            {"type": "contractor", "id": "c1", "name": "Holding"},
+            {"type": "contractor", "id": "c2", "name": "Branch", "parent": "c1"},
+            {"type": "contractor", "id": "c3", "name": "Office", "parent": "c2"},
+        ]
+        CrmImporter(self.user, Checkpoint("test"), batch_size=2).run(iter(records))
+        office = Contractor.objects.get(name="Office")
+        self.assertEqual(office.parent.parent.name, "Holding")
+        links = sorted(ContractorClosure.objects.values_list("ancestor_id", "descendant_id", "depth"))
+        self.assertEqual(len(links), 6)
+        hierarchy.rebuild()
+        self.assertEqual(sorted(ContractorClosure.objects.values_list("ancestor_id", "descendant_id", "depth")), links)
+
+
+class ExportTest(AdminTestCase):
+    def test_export_ignores_paging(self):
+        contact = self.create_contact("client")
+        for number in range(3):
+            self.create_task(number, contact=contact)
+        url = reverse("admin:core_task_export", kwargs={"format": "jsonl"})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"p": 5, "e": 1})
+            lines = b"".join(response.streaming_content).splitlines()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(lines), 3)
+        self.assertFalse([query for query in queries if "COUNT(" in query["sql"].upper()])
+
+
+class TimelineTest(AdminTestCase):
+    def test_contractor_timeline(self):
+        first, second = self.create_contractor(1), self.create_contractor(2)
+        contact = self.create_contact(1, contractor=first)
+        task = self.create_task(1, contact=contact)
+        deal = self.create_deal(1, contractor=first)
+        entries, cursor = timeline.page(first)
+        self.assertEqual([entry.obj for entry in entries], [task, deal])
+        self.assertIsNone(cursor)
+        contact.contractor = second
+        contact.save()
+        self.assertEqual([entry.obj for entry in timeline.page(first)[0]], [deal])
+        self.assertEqual([entry.obj for entry in timeline.page(second)[0]], [task])
+        self.assertEqual([entry.obj for entry in timeline.page(contact)[0]], [task])
+
+    def test_seek_plan(self):
+        contractor = self.create_contractor(1)
+        for queryset, field in timeline.sources(contractor):
+            cursor = timezone.now(), timeline.label(queryset.model), 5
+            self.assertSeeks(timeline.after(queryset, field, cursor).order_by("-" + field, "-pk")[:3])
+
+
+class KeysetPagingTest(AdminTestCase):
+    def setUp(self):
+        super(KeysetPagingTest, self).setUp()
+        self.model_admin = admin.site._registry[Contact]
+        self.model_admin.list_per_page = 2
+        self.url = reverse("admin:core_contact_changelist")
+
+    def tearDown(self):
+        del self.model_admin.list_per_page
+
+    def page(self, query):
+        response = self.client.get(self.url + query)
+        self.assertEqual(response.status_code, 200)
+        cl = response.context_data["cl"]
+        return [obj.pk for obj in cl.result_list], cl
+
+    def test_walk(self):
+        contacts = [self.create_contact(number) for number in range(5)]
+        Contact.objects.filter(pk=contacts[0].pk).update(updated_at=contacts[4].updated_at)
+        expected = list(Contact.objects.order_by("-updated_at", "-id").values_list("pk", flat=True))
+        seen, query, pages = [], "?", []
+        while query is not None:
+            rows, cl = self.page(query)
+            seen.extend(rows)
+            pages.append(rows)
+            query = cl.next_url
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(pages), 3)
+        rows, cl = self.page(cl.previous_url)
+        self.assertEqual(rows, pages[1])
+        rows, cl = self.page(cl.previous_url)
+        self.assertEqual(rows, pages[0])
+        self.assertIsNone(cl.previous_url)
+
+    def test_bad_cursor(self):
+        self.create_contact(1)
+        response = self.client.get(self.url, {"after": "zz"})
+        self.assertRedirects(response, self.url + "?e=1", fetch_redirect_response=False)
+        response = self.client.get(reverse("admin:core_contact_export", kwargs={"format": "csv"}), {"after": "zz"})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse("admin:core_contact_export", kwargs={"format": "csv"}), {"nosuch": "1"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_seek_plan(self):
+        now = timezone.now()
+        for model, ordering in ((Contact, ("-updated_at", "-id")), (Task, ("-starting_datetime", "-id"))):
+            for backwards in (False, True):
+                queryset = model.objects.filter(keyset.seek(model, ordering, [now, 5], backwards))
+                self.assertSeeks(queryset.order_by(*ordering)[:3])
+        ordering = ("-changed_at", "-id")
+        self.assertSeeks(ChangeLogEntry.objects.filter(model="core.task", object_id=1).filter(
+            keyset.seek(ChangeLogEntry, ordering, [now, 5])
+        ).order_by(*ordering)[:3])
+
+
+class EstimatedCountTest(AdminTestCase):
+    def setUp(self):
+        super(EstimatedCountTest, self).setUp()
+        self.model_admin = admin.site._registry[Task]
+        self.model_admin.list_per_page = 2
+        self.tasks = [self.create_task(number) for number in range(5)]
+
+    def tearDown(self):
+        del self.model_admin.list_per_page
+
+    def page(self, estimate, number):
+        # Sorting by a column pages by number rather than by cursor.
+        with mock.patch.object(counts, "estimate", return_value=(estimate, False)):
+            response = self.client.get(reverse("admin:core_task_changelist"), {
+                "status__exact": "Not Started", "o": "1", "p": number
+            })
+        self.assertEqual(response.status_code, 200)
+        return response.context_data["cl"]
+
+    def test_undercount(self):
+        cl = self.page(1, 0)
+        self.assertEqual((cl.result_count, cl.result_count_exact), (3, False))
+        cl = self.page(1, 2)
+        self.assertEqual((cl.result_count, cl.result_count_exact), (5, True))
+        self.assertEqual(len(cl.result_list), 1)
+
+    def test_overcount(self):
+        cl = self.page(100, 0)
+        self.assertEqual((cl.result_count, cl.result_count_exact), (100, False))
+        cl = self.page(100, 10)
+        self.assertEqual((cl.result_count, cl.result_count_exact, cl.page_num), (5, True, 2))
+        self.assertEqual(len(cl.result_list), 1)
+
+    def test_exact_count_not_cached(self):
+        response = self.client.get(reverse("admin:core_task_changelist"), {"status__exact": "Not Started", "exact": 1})
+        self.assertEqual(response.context_data["cl"].result_count, 5)
+        self.create_task(5)
+        response = self.client.get(reverse("admin:core_task_changelist"), {"status__exact": "Not Started", "exact": 1})
+        self.assertEqual(response.context_data["cl"].result_count, 6)
+
+
+class DealSummaryTest(AdminTestCase):
+    def rows(self):
+        return sorted(DealSummary.objects.values_list("key", "stage", "currency", "responsible_id", "amount", "count"))
+
+    def test_null_keys(self):
+        first = self.create_deal(1)
+        self.create_deal(2)
+        self.create_deal(3, responsible=self.user, currency="rubles")
+        self.assertEqual(DealSummary.objects.count(), 2)
+        self.assertEqual(DealSummary.objects.get(currency=None, responsible=None).count, 2)
+        first.delete()
+        self.assertEqual(DealSummary.objects.get(currency=None, responsible=None).count, 1)
+        kept = self.rows()
+        summary.rebuild()
+        self.assertEqual(self.rows(), kept)
+
+    def test_concurrent_insert(self):
+        self.create_deal(1)
+        row = DealSummary.objects.get()
+        values = dict(stage=row.stage, currency=None, responsible_id=None, month=row.month)
+        update = QuerySet.update
+        calls = []
+
+        def missing_update(queryset, **kwargs):
+            calls.append(kwargs)
+            return 0 if len(calls) == 1 else update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, "update", missing_update):
+            summary.add(summary.row_key(values), values, Decimal(5), 1)
+        row = DealSummary.objects.get()
+        self.assertEqual((row.amount, row.count), (Decimal(15), 2))
+
+
+class FacetCountTest(AdminTestCase):
+    def rows(self):
+        return sorted(FacetCount.objects.filter(model="core.address").values_list("key", "field", "value", "count"))
+
+    def test_import(self):
+        records = [
+            {"type": "contractor", "id": "c1", "name": "Acme", "addresses": [{"country": "RU", "city": "Moscow"}]},
+            {"type": "contractor", "id": "c2", "name": "Globex", "addresses": [{"country": "RU"}]},
+        ]
+        CrmImporter(self.user, Checkpoint("test")).run(iter(records))
+        counts = dict(
+            FacetCount.objects.filter(model="core.address", field="city").values_list("value", "count")
+        )
+        self.assertEqual(counts, {"Moscow": 1, "": 1})
+        kept = self.rows()
+        facets.rebuild(Address)
+        self.assertEqual(self.rows(), kept)
+
+    def test_concurrent_insert(self):
+        Address.objects.create(city="Moscow", created_by=self.user, updated_by=self.user)
+        update = QuerySet.update
+        calls = []
+
+        def missing_update(queryset, **kwargs):
+            calls.append(kwargs)
+            return 0 if len(calls) == 1 else update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, "update", missing_update):
+            facets.apply(Address, "city", "Moscow", 1)
+        self.assertEqual(FacetCount.objects.get(model="core.address", field="city").count, 2)
+
+
+class StorageTest(SimpleTestCase):
+    def test_long_names(self):
+        max_length = Note._meta.get_field("attach").max_length
+        name = attachment_storage.get_available_name("attachs/notes/" + "x" * 300 + ".pdf", max_length)
+        self.assertTrue(name.startswith("attachs/notes/x"))
+        full = cas_name("0" * 64, os.path.basename(name))
+        self.assertEqual(len(full), max_length)
+        self.assertTrue(full.endswith("x.pdf"))
+        self.assertEqual(attachment_storage.get_available_name("attachs/notes/a.pdf", max_length), "attachs/notes/a.pdf")
+        with self.assertRaises(SuspiciousFileOperation):
+            attachment_storage.get_available_name("attachs/notes/a." + "x" * 300, max_length)
+
+
+class BlobCollectTest(AdminTestCase):
+    def setUp(self):
+        super(BlobCollectTest, self).setUp()
+        self.use_temporary_media()
+
+    def save(self, data):
+        name = attachment_storage.save("attachs/notes/a.txt", ContentFile(data))
+        return name, attachment_storage.path(name)
+
+    def test_collect(self):
+        name, path = self.save(b"unreferenced")
+        self.assertEqual(blobs.collect(grace=datetime.timedelta(0)), (1, 12))
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(Blob.objects.exists())
+
+    def test_touched_meanwhile(self):
+        name, path = self.save(b"touched")
+        cutoff = timezone.now() - datetime.timedelta(hours=1)
+        self.assertFalse(blobs.bury(blobs.digest_of(name), cutoff))
+        self.assertTrue(os.path.exists(path))
+
+    def test_store_during_collect(self):
+        name, path = self.save(b"stored twice")
+        touch = blobs.touch
+
+        def collecting_touch(digest, size):
+            # gc_blobs runs after the blob was found stored, before it is
+            # registered again.
+            self.assertTrue(blobs.bury(digest, timezone.now()))
+            self.assertFalse(os.path.exists(path))
+            touch(digest, size)
+
+        with mock.patch.object(blobs, "touch", collecting_touch):
+            self.assertEqual(self.save(b"stored twice")[0], name)
+        self.assertTrue(os.path.exists(path))
+        self.assertTrue(Blob.objects.filter(digest=blobs.digest_of(name)).exists())
+
+
+class ChunkedUploadTest(AdminTestCase):
+    def setUp(self):
+        super(ChunkedUploadTest, self).setUp()
+        self.use_temporary_media()
+
+    def test_long_name(self):
+        url = reverse("admin:core_note_upload")
+        response = self.client.post(url, {"filename": "x" * 300 + ".pdf", "size": 3})
+        self.assertEqual(response.status_code, 201)
+        session_id = response.json()["id"]
+        self.assertEqual(self.put(session_id, b"abc").status_code, 200)
+        response = self.client.post(reverse("admin:core_note_upload_finish", args=[session_id]))
+        name = response.json()["name"]
+        self.assertEqual(len(name), Note._meta.get_field("attach").max_length)
+        self.assertTrue(name.endswith("x.pdf"))
+        response = self.client.post(url, {"filename": "a." + "x" * 300, "size": 3})
+        self.assertEqual(response.status_code, 400)
+
+    def put(self, session_id, data, checksum=None, **extra):
+        if checksum is None:
+            checksum = hashlib.sha256(data).hexdigest()
+        if checksum:
+            extra["HTTP_X_CONTENT_SHA256"] = checksum
+        return self.client.put(
+            reverse("admin:core_note_upload_chunk", args=[session_id]), data, content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE="bytes 0-{}/{}".format(len(data) - 1, len(data)), **extra
+        )
+
+    def upload(self, data):
+        session_id = self.client.post(reverse("admin:core_note_upload"), {"filename": "a.txt", "size": len(data)}).json()["id"]
+        self.assertEqual(self.put(session_id, data).status_code, 200)
+        self.client.post(reverse("admin:core_note_upload_finish", args=[session_id]))
+        return session_id
+
+    def test_checksum_required(self):
+        response = self.client.post(reverse("admin:core_note_upload"), {"filename": "a.txt", "size": 3})
+        session_id = response.json()["id"]
+        self.assertEqual(self.put(session_id, b"abc", checksum="").status_code, 400)
+        response = self.put(session_id, b"abc", checksum=hashlib.sha256(b"abd").hexdigest())
+        self.assertEqual((response.status_code, response.json()["offset"]), (400, 0))
+        self.assertEqual(self.put(session_id, b"abc").json()["offset"], 3)
+
+    def test_other_users_upload(self):
+        session_id = self.upload(b"mine")
+        name = UploadSession.objects.get(pk=session_id).name
+        field = admin.site._registry[Note].get_form(self.request()).base_fields["attach"]
+        self.assertEqual(field.clean(uploads.ChunkedUpload(session_id)), name)
+        other = User.objects.create_superuser("other", "other@example.com", "password")
+        field = admin.site._registry[Note].get_form(self.request(other)).base_fields["attach"]
+        with self.assertRaises(ValidationError):
+            field.clean(uploads.ChunkedUpload(session_id))
+
+    def request(self, user=None):
+        request = RequestFactory().get("/")
+        request.user = user or self.user
+        return request
+
+
+class DownloadTest(AdminTestCase):
+    def setUp(self):
+        super(DownloadTest, self).setUp()
+        self.use_temporary_media()
+        name = attachment_storage.save("attachs/notes/a.txt", ContentFile(b"0123456789"))
+        self.note = Note.objects.create(name="note", attach=name, created_by=self.user, updated_by=self.user)
+        self.url = reverse("admin:core_note_download", args=[self.note.pk, "attach"])
+        self.tag = '"{}"'.format(blobs.digest_of(name))
+
+    def download(self, **extra):
+        response = self.client.get(self.url, **extra)
+        response.body = b"".join(response.streaming_content) if response.streaming else response.content
+        return response
+
+    def test_whole_file(self):
+        response = self.download()
+        self.assertEqual((response.status_code, response.body), (200, b"0123456789"))
+        self.assertEqual(response["ETag"], self.tag)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["Content-Length"], "10")
+        self.assertEqual(response["Content-Disposition"], "attachment; filename=\"a.txt\"; filename*=UTF-8''a.txt")
+
+    def test_range(self):
+        response = self.download(HTTP_RANGE="bytes=2-4")
+        self.assertEqual((response.status_code, response.body), (206, b"234"))
+        self.assertEqual(response["Content-Range"], "bytes 2-4/10")
+        self.assertEqual(response["Content-Length"], "3")
+        self.assertEqual(self.download(HTTP_RANGE="bytes=7-").body, b"789")
+        self.assertEqual(self.download(HTTP_RANGE="bytes=8-100").body, b"89")
+        response = self.download(HTTP_RANGE="bytes=-3")
+        self.assertEqual((response.status_code, response.body), (206, b"789"))
+        self.assertEqual(response["Content-Range"], "bytes 7-9/10")
+        self.assertEqual(self.download(HTTP_RANGE="bytes=-20").body, b"0123456789")
+
+    def test_multiple_ranges(self):
+        response = self.download(HTTP_RANGE="bytes=0-1,4-5")
+        self.assertEqual((response.status_code, response.body), (200, b"0123456789"))
+        self.assertNotIn("Content-Range", response)
+
+    def test_unsatisfiable_range(self):
+        for header in ("bytes=20-", "bytes=5-2", "bytes=-0"):
+            response = self.download(HTTP_RANGE=header)
+            self.assertEqual(response.status_code, 416, header)
+            self.assertEqual(response["Content-Range"], "bytes */10")
+
+    def test_not_modified(self):
+        response = self.download(HTTP_IF_NONE_MATCH='"stale", ' + self.tag)
+        self.assertEqual((response.status_code, response.body), (304, b""))
+        self.assertEqual(response["ETag"], self.tag)
+        self.assertEqual(self.download(HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_if_range(self):
+        response = self.download(HTTP_RANGE="bytes=2-4", HTTP_IF_RANGE=self.tag)
+        self.assertEqual((response.status_code, response.body), (206, b"234"))
+        response = self.download(HTTP_RANGE="bytes=2-4", HTTP_IF_RANGE='"stale"')
+        self.assertEqual((response.status_code, response.body), (200, b"0123456789"))
+
+    def test_permission(self):
+        staff = User.objects.create_user("staff", "staff@example.com", "password", is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.download().status_code, 403)
+        self.client.force_login(self.user)
+        for args in ([self.note.pk, "name"], [0, "attach"]):
+            self.assertEqual(self.client.get(reverse("admin:core_note_download", args=args)).status_code, 404)
+
+    def test_sendfile(self):
+        path = self.note.attach.path
+        with override_settings(CORE_SENDFILE_HEADER="X-Sendfile"):
+            response = self.download(HTTP_RANGE="bytes=2-4")
+        self.assertEqual((response.status_code, response.body), (200, b""))
+        self.assertEqual(response["X-Sendfile"], path)
+        self.assertEqual(response["ETag"], self.tag)
+        with override_settings(CORE_SENDFILE_HEADER="X-Accel-Redirect", MEDIA_ROOT=attachment_storage.location):
+            response = self.download()
+        relative = os.path.relpath(path, attachment_storage.location)
+        self.assertEqual(response["X-Accel-Redirect"], "/protected-media/" + relative)
+        self.assertEqual(response.body, b"")
+        with override_settings(CORE_SENDFILE_HEADER="X-Sendfile"):
+            self.assertEqual(self.download(HTTP_IF_NONE_MATCH=self.tag).status_code, 304)
+
+
+class DocumentClusterTest(AdminTestCase):
+    def test_linked(self):
+        a, b, c, d = [self.create_document(number) for number in range(4)]
+        a.related_documents.add(b)
+        b.related_documents.add(c)
+        self.assertTrue(clusters.linked(a, c))
+        self.assertTrue(clusters.linked(c.pk, a.pk))
+        self.assertFalse(clusters.linked(a, d))
+        self.assertEqual(set(Document.objects.cluster(a)), {a, b, c})
+        b.related_documents.remove(c)
+        self.assertFalse(clusters.linked(a, c))
+        c.component.delete()
+        d.component.delete()
+        self.assertFalse(clusters.linked(c, d))
+        self.assertFalse(clusters.linked(a, c))
+
+
+class ExtractionTest(TestCase):
+    def test_unexpected_error(self):
+        AttachmentText.objects.create(digest="0" * 64, filename="broken.docx")
+        with mock.patch("core.extraction.extract", side_effect=ValueError("boom")):
+            digest, text, error = extract_job(("0" * 64, "/nonexistent", "broken.docx", "/nonexistent"))
+        self.assertEqual((digest, text, error), ("0" * 64, None, "ValueError: boom"))
+        contents.store(digest, text, error)
+        self.assertEqual(AttachmentText.objects.get().status, "failed")
+
+
+class AttachmentQueueTest(AdminTestCase):
+    def test_process(self):
+        self.use_temporary_media()
+        name = attachment_storage.save("attachs/notes/hello.txt", ContentFile(b"hello world"))
+        Note.objects.create(name="note", attach=name, created_by=self.user, updated_by=self.user)
+        self.assertEqual(AttachmentText.objects.get().status, "pending")
+        self.assertEqual(AttachmentPreview.objects.get().status, "pending")
+        self.assertEqual(contents.queue.process(workers=1), 1)
+        self.assertEqual(previews.queue.process(workers=1), 1)
+        self.assertEqual(AttachmentText.objects.get().text, "hello world")
+        self.assertEqual(AttachmentPreview.objects.get().status, "done")
+        self.assertTrue(previews.find(AttachmentPreview.objects.get().digest, "thumb"))
+        self.assertEqual(contents.queue.backfill(), 0)
+
+
+    def test_render_text_once(self):
+        self.use_temporary_media()
+        name = attachment_storage.save("attachs/notes/hello.txt", ContentFile(b"hello world"))
+        digest, path = blobs.digest_of(name), attachment_storage.path(name)
+        job = (digest, path, "hello.txt", attachment_storage.location)
+        with mock.patch.object(previews, "extract", return_value="hello world") as extract:
+            self.assertEqual(previews.render_job(job), (digest, True, None))
+        self.assertEqual(extract.call_count, 1)
+        self.assertEqual([previews.find(digest, size) is not None for size in previews.SIZES], [True, True])
+        with mock.patch.object(previews, "extract", return_value=""):
+            self.assertEqual(previews.render_job(job), (digest, False, None))
+
+class DocumentRevisionTest(AdminTestCase):
+    def setUp(self):
+        super(DocumentRevisionTest, self).setUp()
+        self.use_temporary_media()
+
+    def save_version(self, document, content):
+        document.attach = attachment_storage.save("attachs/documents/contract.txt", ContentFile(content))
+        document.save()
+
+    def download(self, document, number):
+        return self.client.get(reverse("admin:core_document_revision", args=[document.pk, number]))
+
+    def test_compact(self):
+        versions = [
+            b"".join(b"clause %d of the contract\n" % number for number in range(2000)),
+        ]
+        versions.append(versions[0].replace(b"clause 1000 ", b"amended clause 1000 "))
+        versions.append(versions[1] + b"signed\n")
+        document = self.create_document(1)
+        for content in versions:
+            self.save_version(document, content)
+        self.assertEqual(
+            list(DocumentRevision.objects.order_by("number").values_list("kind", "pending")),
+            [("full", False), ("full", True), ("full", True)]
+        )
+        self.assertEqual(revisions.compact(workers=1), 2)
+        stored = list(DocumentRevision.objects.order_by("number"))
+        self.assertEqual([(revision.kind, revision.depth) for revision in stored], [("full", 0), ("delta", 1), ("delta", 2)])
+        self.assertLess(stored[2].stored_size, 1000)
+        for revision, content in zip(stored, versions):
+            with revisions.open_revision(revision) as rebuilt:
+                self.assertEqual(rebuilt.read(), content)
+        response = self.download(document, 3)
+        self.assertEqual(b"".join(response.streaming_content), versions[2])
+        with open(stored[1].payload.path, "wb") as delta:
+            delta.write(b"garbage")
+        self.assertEqual(self.download(document, 3).status_code, 404)
+
+
+    def test_missing_file(self):
+        document = self.create_document(1)
+        self.save_version(document, b"first")
+        document.attach = cas_name("0" * 64, "contract.txt")
+        document.save()
+        self.assertEqual(list(DocumentRevision.objects.values_list("number", flat=True)), [1])
+        self.assertEqual(Document.objects.get(pk=document.pk).attach.name, document.attach.name)
+
+class BusyIntervalTest(AdminTestCase):
+    def setUp(self):
+        super(BusyIntervalTest, self).setUp()
+        self.nine = timezone.make_aware(datetime.datetime(2026, 3, 2, 9))
+
+    def at(self, hours, seconds=0):
+        return self.nine + datetime.timedelta(hours=hours, seconds=seconds)
+
+    def book(self, start, finish, status="Not Started"):
+        task = self.create_task(0)
+        task.starting_datetime, task.finishing_datetime, task.status = start, finish, status
+        task.save()
+        return task
+
+    def found(self, start, finish):
+        return sorted(interval.object_id for interval in intervals.overlapping([self.user.pk], start, finish))
+
+    def test_levels(self):
+        self.assertEqual(
+            [intervals.level(span) for span in (1, 3600, 3601, 24 * 3600, 24 * 3600 + 1, 7 * 24 * 3600 + 1)],
+            [0, 0, 1, 1, 2, 3]
+        )
+        half = self.book(self.at(0), self.at(0, 0.5))
+        self.assertEqual(BusyInterval.objects.get(object_id=half.pk).span, 1)
+
+    def test_touching(self):
+        first = self.book(self.at(0), self.at(1))
+        second = self.book(self.at(1), self.at(2))
+        self.assertEqual(self.found(self.at(1), self.at(2)), [second.pk])
+        self.assertEqual(self.found(self.at(0), self.at(1)), [first.pk])
+        self.assertEqual(list(intervals.conflicts(second)), [])
+        entry = intervals.free_busy([self.user.pk], self.at(-1), self.at(3))[self.user.pk]
+        self.assertEqual(entry["busy"], [(self.at(0), self.at(2))])
+        self.assertEqual(entry["free"], [(self.at(-1), self.at(0)), (self.at(2), self.at(3))])
+        self.assertEqual(entry["conflicts"], [])
+
+    def test_zero_length(self):
+        task = self.book(self.at(0), self.at(0))
+        self.assertFalse(BusyInterval.objects.filter(object_id=task.pk).exists())
+        self.assertEqual(list(intervals.conflicts(task)), [])
+        self.book(self.at(-1), self.at(0))
+        around = self.book(self.at(-1), self.at(1))
+        self.assertEqual(self.found(self.at(0), self.at(0)), [around.pk])
+        entry = intervals.free_busy([self.user.pk], self.at(0), self.at(0))[self.user.pk]
+        self.assertEqual((entry["busy"], entry["free"]), ([(self.at(0), self.at(0))], []))
+
+    def test_level_boundary(self):
+        hour = self.book(self.at(0), self.at(1))
+        longer = self.book(self.at(0), self.at(1, 1))
+        week = self.book(self.at(-7 * 24), self.at(0, 1))
+        month = self.book(self.at(-30 * 24), self.at(1))
+        self.assertEqual(
+            [BusyInterval.objects.get(object_id=task.pk).level for task in (hour, longer, week, month)], [0, 1, 3, 3]
+        )
+        self.assertEqual(self.found(self.at(1), self.at(2)), [longer.pk])
+        self.assertEqual(self.found(self.at(0, 1), self.at(2)), sorted([hour.pk, longer.pk, month.pk]))
+        self.assertEqual(self.found(self.at(0), self.at(0, 1)), sorted([hour.pk, longer.pk, week.pk, month.pk]))
+
+    def test_free_busy(self):
+        other = User.objects.create_user("other", "other@example.com", "password")
+        first = self.book(self.at(0), self.at(2))
+        second = self.book(self.at(1), self.at(3))
+        self.book(self.at(5), self.at(6), status="Deferred")
+        schedule = intervals.free_busy([self.user.pk, other.pk], self.at(-1), self.at(4))
+        entry = schedule[self.user.pk]
+        self.assertEqual([interval.object_id for interval in entry["intervals"]], [first.pk, second.pk])
+        self.assertEqual(entry["busy"], [(self.at(0), self.at(3))])
+        self.assertEqual(entry["free"], [(self.at(-1), self.at(0)), (self.at(3), self.at(4))])
+        self.assertEqual([(a.object_id, b.object_id) for a, b in entry["conflicts"]], [(first.pk, second.pk)])
+        self.assertEqual(schedule[other.pk]["free"], [(self.at(-1), self.at(4))])
+        entry = intervals.free_busy([self.user.pk], self.at(0, 1800), self.at(1))[self.user.pk]
+        self.assertEqual(entry["busy"], [(self.at(0, 1800), self.at(1))])
+        self.assertEqual(entry["free"], [])
+
+    def test_rebuild(self):
+        tasks = [self.book(self.at(hour), self.at(hour + 1)) for hour in range(5)]
+        self.book(self.at(0), self.at(1), status="Deferred")
+        expected = set(BusyInterval.objects.values_list("object_id", "start", "finish", "level"))
+        BusyInterval.objects.all().delete()
+        bulk_create = BusyInterval.objects.bulk_create
+        with mock.patch.object(intervals, "BATCH_SIZE", 2),\
+                mock.patch.object(BusyInterval.objects, "bulk_create", wraps=bulk_create) as created:
+            intervals.rebuild()
+            self.assertEqual(set(BusyInterval.objects.values_list("object_id", "start", "finish", "level")), expected)
+            Task.objects.filter(pk__in=[task.pk for task in tasks[:3]]).update(status="Deferred")
+            intervals.refreshed(Task, [task.pk for task in tasks])
+        self.assertEqual(max(len(args[0]) for args, kwargs in created.call_args_list), 2)
+        remaining = BusyInterval.objects.values_list("object_id", flat=True)
+        self.assertEqual(sorted(remaining), [task.pk for task in tasks[3:]])
+
+
+class AuditTest(AdminTestCase):
+    def setUp(self):
+        super(AuditTest, self).setUp()
+        # The test transaction never commits, so run the commit hooks now.
+        patcher = mock.patch("django.db.transaction.on_commit", lambda func: func())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_bulk_update(self):
+        tasks = [self.create_task(number) for number in range(3)]
+        ChangeLogEntry.objects.all().delete()
+        self.assertEqual(bulk.update(Task.objects.all(), Task._meta.get_field("status"), "Completed", self.user), 3)
+        self.assertEqual(
+            sorted(ChangeLogEntry.objects.values_list("object_id", "action", "field", "old", "new", "user")),
+            [(task.pk, "change", "status", "Not Started", "Completed", self.user.pk) for task in tasks]
+        )
+
+    def test_write_fallback(self):
+        now = timezone.now()
+        items = [
+            ChangeLogEntry(model=model, object_id=number, action="delete", changed_at=now)
+            for number, model in enumerate(("core.task", None, "core.task"), 1)
+        ]
+        with mock.patch.object(QuerySet, "bulk_create", side_effect=DatabaseError) as bulk_create, \
+                self.assertLogs("core.audit", "WARNING") as logs:
+            audit.write(items)
+        self.assertIn("lost 1 of 3 change log entries", logs.output[-1])
+        self.assertEqual(bulk_create.call_count, 2)
+        self.assertEqual(sorted(ChangeLogEntry.objects.values_list("object_id", flat=True)), [1, 3])
+
+
+    def test_stored_row_read_once(self):
+        deal = self.create_deal(1)
+        contact = self.create_contact(1)
+        for instance, field, value in ((deal, "stage", "Closed Won"), (contact, "last_name", "renamed")):
+            setattr(instance, field, value)
+            table = connection.ops.quote_name(instance._meta.db_table)
+            with CaptureQueriesContext(connection) as queries:
+                instance.save()
+            reads = [
+                query["sql"] for query in queries if query["sql"].startswith("SELECT") and "FROM " + table in query["sql"]
+            ]
+            self.assertEqual(len(reads), 1, reads)
+            self.assertTrue(ChangeLogEntry.objects.filter(object_id=instance.pk, field=field, new=value).exists())
+
+class BulkUpdateTest(AdminTestCase):
+    def test_chunks(self):
+        tasks = [self.create_task(number) for number in range(5)]
+        Task.objects.filter(pk=tasks[0].pk).update(status="Completed")
+        with mock.patch.object(bulk, "CHUNK_SIZE", 2):
+            count = bulk.update(Task.objects.all(), Task._meta.get_field("status"), "Completed", self.user)
+        self.assertEqual(count, 4)
+        self.assertEqual(set(Task.objects.values_list("status", flat=True)), {"Completed"})
+
+    def test_deal_summary(self):
+        self.create_deal(1)
+        self.create_deal(2, responsible=self.user)
+        bulk.update(Deal.objects.all(), Deal._meta.get_field("stage"), "Closed Won", self.user)
+        kept = sorted(DealSummary.objects.filter(count__gt=0).values_list("key", "stage", "amount", "count"))
+        summary.rebuild()
+        self.assertEqual(sorted(DealSummary.objects.values_list("key", "stage", "amount", "count")), kept)
+        self.assertEqual({row[1] for row in kept}, {"Closed Won"})
+
+    def test_admin_action(self):
+        tasks = [self.create_task(number) for number in range(3)]
+        url = reverse("admin:core_task_changelist")
+        data = {
+            "action": "bulk_update_status", "index": 0, "select_across": 0,
+            "_selected_action": [task.pk for task in tasks[:2]], "value": "Completed",
+        }
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.context_data["selected_count"], response.context_data["changed_count"]), (2, 2))
+        self.assertEqual(Task.objects.filter(status="Completed").count(), 0)
+        response = self.client.post(url, dict(data, apply=1, checked="Deferred"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Task.objects.filter(status="Completed").count(), 0)
+        response = self.client.post(url, dict(data, apply=1, checked="Completed"))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            sorted(Task.objects.filter(status="Completed").values_list("pk", flat=True)),
+            [task.pk for task in tasks[:2]]
+        )
+
+
+# Worker threads would not see the rows of the test transaction.
+@override_settings(CORE_DASHBOARD_WORKERS=1)
+class DashboardTest(AdminTestCase):
+    def setUp(self):
+        super(DashboardTest, self).setUp()
+        patcher = mock.patch("django.db.transaction.on_commit", lambda func: func())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tasks(self):
+        response = self.client.get(reverse("core_my_work"))
+        self.assertEqual(response.status_code, 200)
+        return [section for section in response.context_data["sections"] if section["model"] == "task"][0]["count"]
+
+    def test_invalidation(self):
+        task = self.create_task(1)
+        self.assertEqual(self.tasks(), 1)
+        self.create_task(2)
+        self.assertEqual(self.tasks(), 2)
+        task.status = "Completed"
+        task.save()
+        self.assertEqual(self.tasks(), 1)
+        bulk.update(Task.objects.all(), Task._meta.get_field("status"), "Completed", self.user)
+        self.assertEqual(self.tasks(), 0)
+
+    def test_save_during_build(self):
+        build = dashboard.build
+
+        def racing_build(user_id):
+            result = build(user_id)
+            self.create_task(1)
+            return result
+
+        with mock.patch.object(dashboard, "build", racing_build):
+            self.assertEqual(self.tasks(), 0)
+        self.assertEqual(self.tasks(), 1)
+
+
+@override_settings(CORE_REPLICA_DATABASES=["replica1"], CORE_REPLICA_MAX_LAG=30, CORE_MONITORING_TOKEN="secret")
+class ReplicaRouterTest(AdminTestCase):
+    def setUp(self):
+        super(ReplicaRouterTest, self).setUp()
+        self.router = replicas.ReplicaRouter()
+        self.request = RequestFactory().get("/")
+        self.request.session = {}
+        replicas.started()
+        self.addCleanup(replicas.started)
+
+    def lags(self, seconds):
+        patcher = mock.patch.object(replicas, "lags", return_value={"replica1": seconds})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reads(self):
+        self.lags(1.0)
+        with replicas.reading(self.request) as alias:
+            self.assertEqual(alias, "replica1")
+            self.assertEqual(self.router.db_for_read(Task), "replica1")
+            self.assertEqual(self.router.db_for_write(Task), "default")
+            self.assertIsNone(self.router.db_for_read(Task))
+        self.assertFalse(self.router.allow_migrate("replica1", "core"))
+        self.assertIsNone(self.router.allow_migrate("default", "core"))
+
+    def test_lagging_and_pinned(self):
+        self.lags(60.0)
+        self.assertEqual(replicas.choose(self.request), "default")
+        replicas.lags.return_value = {"replica1": None}
+        self.assertEqual(replicas.choose(self.request), "default")
+        replicas.lags.return_value = {"replica1": 1.0}
+        replicas.pin(self.request)
+        self.assertEqual(replicas.choose(self.request), "default")
+
+    def test_pin_after_write(self):
+        middleware = replicas.ReplicaPinMiddleware()
+        self.request.user = self.user
+        middleware.process_request(self.request)
+        self.router.db_for_write(Task)
+        middleware.process_response(self.request, None)
+        self.assertTrue(replicas.pinned(self.request))
+        self.assertFalse(replicas.wrote())
+
+    def test_postgresql_lag(self):
+        cursor = mock.MagicMock()
+        database = mock.MagicMock(vendor="postgresql")
+        database.cursor.return_value.__enter__.return_value = cursor
+        with mock.patch.object(replicas, "connections", {"replica1": database}):
+            cursor.fetchone.return_value = (True, True, 600.0)
+            self.assertEqual(replicas.measure("replica1"), 0.0)
+            cursor.fetchone.return_value = (True, False, 12.5)
+            self.assertEqual(replicas.measure("replica1"), 12.5)
+            # Disconnected: replay caught up with what was received, but
+            # the receiver is not streaming.
+            cursor.fetchone.return_value = (True, False, 600.0)
+            self.assertEqual(replicas.measure("replica1"), 600.0)
+            self.assertIn("pg_stat_wal_receiver WHERE status = 'streaming'", cursor.execute.call_args[0][0])
+            cursor.fetchone.return_value = (False, None, None)
+            self.assertEqual(replicas.measure("replica1"), 0.0)
+
+    def test_metrics_restricted(self):
+        self.lags(1.0)
+        url = reverse("core_replica_lag")
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.client.logout()
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+        response = self.client.get(url, HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'core_replica_lag_seconds{database="replica1"} 1.0', response.content)
+
+
+class DatabaseHealthTest(TestCase):
+    def test_status_only(self):
+        url = reverse("core_database_health")
+        response = self.client.get(url)
+        self.assertEqual((response.status_code, response.content), (200, b"ok\n"))
+        with mock.patch.object(health, "unreachable", return_value=["replica1"]), \
+                self.assertLogs("core.views", "WARNING"):
+            response = self.client.get(url)
+        self.assertEqual((response.status_code, response.content), (503, b"unavailable\n"))
+
+
+class SearchTest(AdminTestCase):
+    def setUp(self):
+        super(SearchTest, self).setUp()
+        if not search.get_backend().supports(connection):
+            self.skipTest("the search backend does not run on this database")
+
+    def found(self, term):
+        return list(search.search(Contact.objects.order_by("pk"), term))
+
+    def create_email(self, address):
+        return EmailToContractor.objects.create(email=address, created_by=self.user, updated_by=self.user)
+
+    def test_save_and_delete(self):
+        contact = self.create_contact(1, department="Бухгалтерия")
+        self.assertEqual(self.found("бухг"), [contact])
+        contact.department = "Склад"
+        contact.save()
+        self.assertEqual(self.found("бухг"), [])
+        self.assertEqual(self.found("склад"), [contact])
+        contact.delete()
+        self.assertEqual(self.found("склад"), [])
+
+    def test_related(self):
+        contact = self.create_contact(1)
+        email = self.create_email("ivanov@example.com")
+        contact.emails.add(email)
+        self.assertEqual(self.found("ivanov"), [contact])
+        email.email = "petrov@example.com"
+        email.save()
+        self.assertEqual(self.found("ivanov"), [])
+        self.assertEqual(self.found("petrov"), [contact])
+        contact.emails.clear()
+        self.assertEqual(self.found("petrov"), [])
+
+    def test_reverse_related(self):
+        contact = self.create_contact(1)
+        email = self.create_email("sidorov@example.com")
+        through = Contact.emails.through
+        # The emails have no reverse accessor, so the changes seen from
+        # their side are sent the way a related manager would.
+        through.objects.create(contact=contact, emailtocontractor=email)
+        m2m_changed.send(
+            sender=through, instance=email, action="post_add", reverse=True, model=Contact, pk_set={contact.pk},
+            using="default"
+        )
+        self.assertEqual(self.found("sidorov"), [contact])
+        m2m_changed.send(
+            sender=through, instance=email, action="pre_clear", reverse=True, model=Contact, pk_set=None,
+            using="default"
+        )
+        through.objects.filter(emailtocontractor=email).delete()
+        m2m_changed.send(
+            sender=through, instance=email, action="post_clear", reverse=True, model=Contact, pk_set=None,
+            using="default"
+        )
+        self.assertEqual(self.found("sidorov"), [])
+
+    def test_ranking(self):
+        once = self.create_contact(1, department="Логистика")
+        twice = self.create_contact(2, department="Логистика", position="Логистика")
+        response = self.client.get(reverse("admin:core_contact_changelist"), {"q": "логист"})
+        self.assertEqual(list(response.context_data["cl"].result_list), [twice, once])
+
+    def test_like_fallback(self):
+        contact = self.create_contact(1, department="Бухгалтерия")
+        self.create_contact(2, department="Склад")
+        with mock.patch.object(type(search.get_backend()), "supports", return_value=False):
+            self.assertIsNone(search.search(Contact.objects.all(), "бухг"))
+            response = self.client.get(reverse("admin:core_contact_changelist"), {"q": "Бухг"})
+        self.assertEqual(list(response.context_data["cl"].result_list), [contact])
+
+
+class AddressTest(AdminTestCase):
+    def create_address(self, **kwargs):
+        kwargs.setdefault("city", "Москва")
+        return Address.objects.create(created_by=self.user, updated_by=self.user, **kwargs)
+
+    def test_normalization(self):
+        key = addresses.address_key(dict(zipcode="101-000", city=" МОСКВА ", street="Ул. Тверская,  д. 1."))
+        self.assertEqual(key, addresses.address_key(dict(zipcode=101000, city="москва", street="ул. тверская, д. 1")))
+        self.assertEqual(addresses.address_key(dict(city="Орёл")), addresses.address_key(dict(city="орел")))
+        self.assertNotEqual(addresses.address_key(dict(zipcode=0, city="Орел")), addresses.address_key(dict(city="Орел")))
+        frozen = import_module("core.migrations.0013_address_key").address_key
+        for zipcode in (None, 0, 7, 101000):
+            values = dict(zipcode=zipcode, country="Россия", region=None, city="Москва ", street="Тверская, 1")
+            self.assertEqual(
+                addresses.address_key(values),
+                frozen(*[values[name] for name in addresses.KEY_FIELDS])
+            )
+
+    def test_dedupe_on_save(self):
+        first = self.create_address(zipcode=101000, street="Тверская, 1")
+        second = self.create_address(zipcode=101000, city="москва", street="тверская,  1")
+        self.assertEqual(second.pk, first.pk)
+        self.assertEqual(Address.objects.count(), 1)
+
+    def test_concurrent_insert(self):
+        first = self.create_address(street="Тверская, 1")
+        resolve = addresses.resolve
+        calls = []
+
+        def missing_resolve(address):
+            # The first lookup ran before the other insert committed.
+            calls.append(address)
+            if len(calls) == 1:
+                address.key = addresses.address_key(addresses.instance_values(address))
+                return False
+            return resolve(address)
+
+        with mock.patch.object(addresses, "resolve", missing_resolve):
+            second = self.create_address(street="тверская, 1")
+        self.assertEqual((second.pk, len(calls)), (first.pk, 2))
+        self.assertEqual(Address.objects.count(), 1)
+
+    def test_merge(self):
+        first = self.create_address(street="Тверская, 1")
+        second = self.create_address(street="Тверская, 2")
+        contact = self.create_contact(1, primary_address=second)
+        contact.addresses.add(first, second)
+        contractor = self.create_contractor(1)
+        contractor.addresses.add(second)
+        second.street = "тверская, 1"
+        second.save()
+        self.assertEqual(second.pk, first.pk)
+        self.assertEqual(list(Address.objects.values_list("pk", flat=True)), [first.pk])
+        self.assertEqual(list(contact.addresses.values_list("pk", flat=True)), [first.pk])
+        self.assertEqual(Contact.objects.get(pk=contact.pk).primary_address_id, first.pk)
+        self.assertEqual(list(contractor.addresses.values_list("pk", flat=True)), [first.pk])
+
+    def test_dedupe(self):
+        first = self.create_address(street="Тверская, 1")
+        second = self.create_address(street="Тверская, 2")
+        contact = self.create_contact(1)
+        contact.addresses.add(second)
+        Address.objects.filter(pk=second.pk).update(street="ТВЕРСКАЯ, 1")
+        self.assertEqual(addresses.dedupe(), 1)
+        self.assertEqual(list(contact.addresses.values_list("pk", flat=True)), [first.pk])
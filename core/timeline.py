@@ -0,0 +1,146 @@
+import heapq
+from collections import namedtuple
+from itertools import islice
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from . import stored
+from .models import Contact, PhoneCall, Meeting, Task, Note, Deal, Circulation
+
+PAGE_SIZE = 50
+CONTACT_SOURCES = (
+    (PhoneCall, "starting_datetime"),
+    (Meeting, "starting_datetime"),
+    (Task, "starting_datetime"),
+    (Note, "created_at"),
+)
+CONTRACTOR_SOURCES = (
+    (Deal, "created_at"),
+    (Circulation, "created_at"),
+)
+
+Entry = namedtuple("Entry", "timestamp label pk obj")
+
+
+def attach(activity):
+    """
+    Copies the contractor of the contact of ``activity`` to the activity.
+    """
+    if activity.contact_id is None:
+        activity.contractor_id = None
+    else:
+        activity.contractor_id = Contact.objects.filter(pk=activity.contact_id).values_list(
+            "contractor", flat=True
+        ).first()
+
+
+def stash(contact):
+    row = stored.row(contact)
+    contact._timeline_contractor = row["contractor_id"] if row is not None else None
+
+
+def moved(contact):
+    """
+    Moves the activities of ``contact`` along when it changed contractor.
+    """
+    previous = getattr(contact, "_timeline_contractor", None)
+    if previous != contact.contractor_id:
+        for model, field in CONTACT_SOURCES:
+            model._default_manager.filter(contact=contact).update(contractor=contact.contractor_id)
+
+
+def label(model):
+    return model._meta.label_lower
+
+
+def cursor_text(entry):
+    return "|".join((entry.timestamp.isoformat(), entry.label, str(entry.pk)))
+
+
+def parse_cursor(value):
+    """
+    (timestamp, model label, pk) of a cursor_text(), None if ``value`` is
+    not one.
+    """
+    try:
+        timestamp, model_label, pk = value.split("|")
+        timestamp, pk = parse_datetime(timestamp), int(pk)
+    except (AttributeError, ValueError):
+        return None
+    return (timestamp, model_label, pk) if timestamp is not None else None
+
+
+def after(queryset, field, cursor):
+    """
+    Rows of ``queryset`` coming after ``cursor`` in the timeline, which is
+    ordered by ``field``, model label and pk, all descending.
+    """
+    if cursor is None:
+        return queryset
+    timestamp, cursor_label, pk = cursor
+    model_label = label(queryset.model)
+    if model_label < cursor_label:
+        return queryset.filter(**{field + "__lte": timestamp})
+    if model_label == cursor_label:
+        # The bound on the field alone keeps it a range of the index.
+        return queryset.filter(
+            Q(**{field + "__lte": timestamp}),
+            Q(**{field + "__lt": timestamp}) | Q(**{field: timestamp, "pk__lt": pk})
+        )
+    return queryset.filter(**{field + "__lt": timestamp})
+
+
+def stream(queryset, field, cursor, chunk_size):
+    """
+    Lazy timeline entries of ``queryset`` after ``cursor``, read
+    ``chunk_size`` rows at a time, each chunk by a keyset query picking
+    up after the last row of the previous one.
+    """
+    model_label = label(queryset.model)
+    while True:
+        rows = list(after(queryset, field, cursor).order_by("-" + field, "-pk")[:chunk_size])
+        for row in rows:
+            cursor = getattr(row, field), model_label, row.pk
+            yield Entry(cursor[0], model_label, row.pk, row)
+        if len(rows) < chunk_size:
+            return
+
+
+def sources(obj):
+    """
+    (queryset, timestamp field) of the activities of a contact, or of a
+    contractor and its contacts.
+    """
+    if isinstance(obj, Contact):
+        return [
+            (model._default_manager.filter(contact=obj).select_related("contact"), field)
+            for model, field in CONTACT_SOURCES
+        ]
+    # The activities carry the contractor of their contact, see attach(),
+    # so that each source is one range of its (contractor, field, id) index.
+    return [
+        (model._default_manager.filter(contractor=obj).select_related("contact"), field)
+        for model, field in CONTACT_SOURCES
+    ] + [
+        (model._default_manager.filter(contractor=obj), field)
+        for model, field in CONTRACTOR_SOURCES
+    ]
+
+
+def page(obj, cursor=None, size=PAGE_SIZE):
+    """
+    ``size`` timeline entries of ``obj`` after ``cursor``, newest first,
+    and the cursor of the next page, None on the last one. The sources
+    are k-way merged lazily, so a page reads at most ``size`` + 1 rows of
+    each through one keyset query, however far back it is.
+    """
+    merged = heapq.merge(
+        *[stream(queryset, field, cursor, size + 1) for queryset, field in sources(obj)],
+        key=lambda entry: (entry.timestamp, entry.label, entry.pk),
+        reverse=True
+    )
+    entries = list(islice(merged, size + 1))
+    if len(entries) > size:
+        return entries[:size], cursor_text(entries[size - 1])
+    return entries, None
@@ -0,0 +1,183 @@
+import hashlib
+import os
+import re
+import uuid
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.utils.html import conditional_escape, format_html
+from django.utils.translation import ugettext_lazy as _
+
+from .models import UploadSession
+from .storage import attachment_storage, cas_name, fit_name
+
+CHUNK_READ = 64 * 1024
+CONTENT_RANGE_RE = re.compile(r"^bytes (?P<start>\d+)-(?P<end>\d+)/(?P<total>\d+)$")
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super(UploadError, self).__init__(message)
+        self.status = status
+
+
+def part_path(session, storage=attachment_storage):
+    return storage.path(os.path.join("blobs", "tmp", "upload-{}.part".format(session.pk)))
+
+
+def start(user, filename, size, max_length=None):
+    """
+    Opens an upload session for ``filename``, shortened so that the name
+    stored once the upload finishes fits ``max_length``.
+    """
+    filename = os.path.basename(filename)
+    if max_length is not None:
+        filename = fit_name(filename, max_length)
+        if filename is None:
+            raise UploadError("file name too long")
+    session = UploadSession.objects.create(id=uuid.uuid4().hex, created_by=user, filename=filename, size=size)
+    path = part_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "wb").close()
+    return session
+
+
+def write_chunk(session, stream, content_range, checksum):
+    """
+    Writes the chunk read from ``stream`` at the offset given by the
+    ``Content-Range`` header, checked against its SHA-256 ``checksum``
+    on the way. Chunks must come in order: a chunk starting anywhere but
+    at the received offset is refused, so that a client resumes from the
+    offset the session reports.
+    """
+    match = CONTENT_RANGE_RE.match(content_range or "")
+    if match is None:
+        raise UploadError("Content-Range required")
+    if not checksum:
+        raise UploadError("X-Content-SHA256 required")
+    start, end, total = (int(match.group(name)) for name in ("start", "end", "total"))
+    if total != session.size or end < start or end >= total:
+        raise UploadError("invalid Content-Range")
+    if start != session.received:
+        raise UploadError("expected offset {}".format(session.received), status=409)
+    sha = hashlib.sha256()
+    remaining = end - start + 1
+    with open(part_path(session), "r+b") as part:
+        part.seek(start)
+        while remaining:
+            data = stream.read(min(CHUNK_READ, remaining))
+            if not data:
+                break
+            sha.update(data)
+            part.write(data)
+            remaining -= len(data)
+        if remaining or checksum.lower() != sha.hexdigest():
+            part.truncate(start)
+            raise UploadError("chunk incomplete" if remaining else "checksum mismatch")
+        part.truncate(end + 1)
+    session.received = end + 1
+    session.save(update_fields=["received", "updated_at"])
+    return session
+
+
+def finish(session, storage=attachment_storage):
+    """
+    Moves a fully received upload into the content-addressed storage and
+    returns the name to store in the attachment field.
+    """
+    if session.name:
+        return session.name
+    if session.received != session.size:
+        raise UploadError("expected {} bytes, received {}".format(session.size, session.received))
+    path = part_path(session, storage)
+    sha = hashlib.sha256()
+    with open(path, "rb") as part:
+        for data in iter(lambda: part.read(CHUNK_READ), b""):
+            sha.update(data)
+    digest = sha.hexdigest()
+    storage.store(path, digest, session.size)
+    os.remove(path)
+    session.name = cas_name(digest, session.filename)
+    session.save(update_fields=["name", "updated_at"])
+    return session.name
+
+
+def state(session):
+    return {"id": session.pk, "offset": session.received, "size": session.size, "name": session.name}
+
+
+class ChunkedUpload(object):
+    """
+    Form data standing for a file uploaded in chunks beforehand.
+    """
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+
+
+class ChunkedFileInput(forms.ClearableFileInput):
+    """
+    File input that uploads the chosen file in chunks through
+    ``upload_url`` and posts only the upload session id with the form.
+    The current file links to ``download_url`` when it is set.
+    """
+    download_url = None
+
+    class Media:
+        js = ("core/js/chunked_upload.js", )
+
+    def __init__(self, upload_url, attrs=None):
+        super(ChunkedFileInput, self).__init__(attrs)
+        self.upload_url = upload_url
+
+    def upload_name(self, name):
+        return name + "_upload"
+
+    def render(self, name, value, attrs=None):
+        attrs = dict(attrs or {}, **{"data-upload-url": str(self.upload_url), "data-upload-field": self.upload_name(name)})
+        return format_html(
+            '{}<input type="hidden" name="{}" value=""><span class="chunked-upload-progress"></span>',
+            super(ChunkedFileInput, self).render(name, value, attrs),
+            self.upload_name(name)
+        )
+
+    def get_template_substitution_values(self, value):
+        values = super(ChunkedFileInput, self).get_template_substitution_values(value)
+        if self.download_url:
+            values["initial_url"] = conditional_escape(self.download_url)
+        return values
+
+    def value_from_datadict(self, data, files, name):
+        session_id = data.get(self.upload_name(name))
+        if session_id:
+            return ChunkedUpload(session_id)
+        return super(ChunkedFileInput, self).value_from_datadict(data, files, name)
+
+
+class ChunkedFileField(forms.FileField):
+    """
+    File field also taking the finished uploads of ``user``; the uploads
+    of other users are refused like unfinished ones.
+    """
+
+    def __init__(self, user=None, *args, **kwargs):
+        super(ChunkedFileField, self).__init__(*args, **kwargs)
+        self.user = user
+
+    def to_python(self, data):
+        if not isinstance(data, ChunkedUpload):
+            return super(ChunkedFileField, self).to_python(data)
+        session = None
+        if self.user is not None and self.user.is_authenticated():
+            session = UploadSession.objects.filter(pk=data.session_id, created_by=self.user).exclude(
+                name=None
+            ).first()
+        if session is None:
+            raise ValidationError(_("загрузка файла не завершена."), code="incomplete")
+        if self.max_length is not None and len(session.name) > self.max_length:
+            params = {"max": self.max_length, "length": len(session.name)}
+            raise ValidationError(self.error_messages["max_length"], code="max_length", params=params)
+        return session.name
+
+    def has_changed(self, initial, data):
+        return isinstance(data, ChunkedUpload) or super(ChunkedFileField, self).has_changed(initial, data)
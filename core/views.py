@@ -1,3 +1,73 @@
-from django.shortcuts import render
+import logging
+from functools import wraps
 
-# Create your views here.
+from django.conf import settings
+from django.contrib import admin
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template.response import TemplateResponse
+from django.utils.crypto import constant_time_compare
+from django.utils.translation import ugettext_lazy as _
+
+from . import dashboard, replicas, health
+
+logger = logging.getLogger(__name__)
+
+
+def my_work(request):
+    """
+    Open tasks, meetings, calls, deals, circulations and preliminary
+    contacts the user is responsible for.
+    """
+    context = dict(
+        admin.site.each_context(request),
+        title=_("Мои дела"),
+        sections=dashboard.sections(request.user.pk),
+    )
+    return TemplateResponse(request, "admin/core/dashboard.html", context)
+
+
+def monitoring(view):
+    """
+    Lets staff users through to ``view``, and the scrapers sending the
+    CORE_MONITORING_TOKEN setting as a bearer token; 403 for the others.
+    """
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        token = getattr(settings, "CORE_MONITORING_TOKEN", "")
+        authorization = request.META.get("HTTP_AUTHORIZATION", "")
+        if token and constant_time_compare(authorization, "Bearer {}".format(token)):
+            return view(request, *args, **kwargs)
+        user = getattr(request, "user", None)
+        if user is not None and user.is_active and user.is_staff:
+            return view(request, *args, **kwargs)
+        return HttpResponseForbidden("forbidden\n", content_type="text/plain")
+    return wrapped
+
+
+@monitoring
+def replica_lag(request):
+    """
+    Lag of each read replica in seconds, in the Prometheus text format;
+    NaN when the replica is down or not replicating.
+    """
+    lines = [
+        "# HELP core_replica_lag_seconds Seconds a read replica is behind the primary database.",
+        "# TYPE core_replica_lag_seconds gauge",
+    ]
+    for alias, seconds in sorted(replicas.lags(refresh=True).items()):
+        lines.append('core_replica_lag_seconds{{database="{}"}} {}'.format(
+            alias, "NaN" if seconds is None else seconds
+        ))
+    return HttpResponse("\n".join(lines) + "\n", content_type="text/plain; version=0.0.4")
+
+
+def database_health(request):
+    """
+    200 when every database answers, else 503. The databases that do not
+    are logged rather than told to whoever asks.
+    """
+    failed = health.unreachable()
+    if failed:
+        logger.warning("unreachable databases: %s", ", ".join(failed))
+        return HttpResponse("unavailable\n", content_type="text/plain", status=503)
+    return HttpResponse("ok\n", content_type="text/plain")
@@ -49,6 +49,7 @@ MIDDLEWARE_CLASSES = [
     'django.contrib.auth.middleware.SessionAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.replicas.ReplicaPinMiddleware',
 ]
 
 ROOT_URLCONF = 'telepathycrm.urls'
@@ -75,11 +76,37 @@ WSGI_APPLICATION = 'telepathycrm.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/1.9/ref/settings/#databases
 from telepathycrm.dbconf import DBCONF
+DBCONF = dict(DBCONF)
+REPLICAS = DBCONF.pop('REPLICAS', ())
 DATABASES = {
     'default': DBCONF,
 }
+# Read replicas, each given by the keys that differ from the primary.
+# Changelists, reports and exports read from them, see core.replicas.
+CORE_REPLICA_DATABASES = []
+for number, replica in enumerate(REPLICAS, 1):
+    alias = 'replica{}'.format(number)
+    DATABASES[alias] = dict(DBCONF, **replica)
+    DATABASES[alias].setdefault('TEST', {'MIRROR': 'default'})
+    CORE_REPLICA_DATABASES.append(alias)
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
 ### END DB BLOCK
 
+# Cache shared by all the processes of the host, which the dashboards,
+# counts and replica lags rely on to see each other's invalidations.
+# Point CACHE_BACKEND and CACHE_LOCATION at memcached to share it across
+# hosts, e.g. django.core.cache.backends.memcached.PyLibMCCache and
+# 127.0.0.1:11211.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')),
+    }
+}
+
+# Full-text search backend of the admin search boxes, see core.search
+CORE_SEARCH_BACKEND = 'core.search.Fts5SearchBackend'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/1.9/ref/settings/#auth-password-validators
@@ -121,3 +148,39 @@ STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Attachment downloads are handed to the front-end server when this is
+# 'X-Sendfile' (Apache, lighttpd) or 'X-Accel-Redirect' (nginx, with an
+# internal location at CORE_SENDFILE_URL aliased to MEDIA_ROOT).
+CORE_SENDFILE_HEADER = None
+CORE_SENDFILE_URL = '/protected-media/'
+
+# Processes rendering attachment previews in the render_previews command.
+CORE_PREVIEW_WORKERS = 2
+
+# Seconds the admin changelists cache estimated filtered counts; exact
+# counts are never cached.
+CORE_COUNT_CACHE_TIMEOUT = 300
+
+# Field changes are written to the change log by a background thread
+# through a queue of at most CORE_AUDIT_QUEUE_SIZE entries; when it is
+# full, or CORE_AUDIT_ASYNC is False, the saving request writes them. On
+# SQLite, the default DATABASE_URL, the saving request always writes
+# them, as the thread would only wait for the same database lock.
+CORE_AUDIT_ASYNC = True
+CORE_AUDIT_QUEUE_SIZE = 10000
+
+# Threads querying the sources of the "my work" dashboard at once, and
+# seconds it stays cached at most. Saves move the dashboards they affect
+# to a new generation in the shared cache, see CACHES.
+CORE_DASHBOARD_WORKERS = 6
+CORE_DASHBOARD_CACHE_TIMEOUT = 3600
+
+# Replicas lagging more than CORE_REPLICA_MAX_LAG seconds are not read
+# from, nor are any for CORE_REPLICA_PIN_SECONDS after a user writes.
+CORE_REPLICA_MAX_LAG = 30
+CORE_REPLICA_PIN_SECONDS = 10
+
+# Bearer token of the monitoring scrapers allowed to read /metrics/replicas
+# besides staff users; none unless CORE_MONITORING_TOKEN is set.
+CORE_MONITORING_TOKEN = os.environ.get('CORE_MONITORING_TOKEN', '')
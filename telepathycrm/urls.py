@@ -15,8 +15,12 @@ Including another URLconf
 """
 from django.conf.urls import url
 from django.contrib import admin
+from core import views
 admin.autodiscover()
 
 urlpatterns = [
+    url(r'^admin/my-work/$', admin.site.admin_view(views.my_work), name='core_my_work'),
     url(r'^admin/', admin.site.urls),
+    url(r'^metrics/replicas$', views.replica_lag, name='core_replica_lag'),
+    url(r'^health/database$', views.database_health, name='core_database_health'),
 ]